@@ -0,0 +1,59 @@
+// SPDX-License-Identifier: AGPL-3.0
+pragma solidity 0.6.12;
+pragma experimental ABIEncoderV2;
+
+import {StrategyParams} from "@yearnvaults/contracts/BaseStrategy.sol";
+
+interface IPreflightVault {
+    function strategies(address) external view returns (StrategyParams memory);
+}
+
+interface IPreflightStrategy {
+    function vault() external view returns (address);
+
+    function balanceOfDebt() external view returns (uint256);
+
+    function balanceOfMakerVault() external view returns (uint256);
+
+    function getCurrentMakerVaultRatio() external view returns (uint256);
+}
+
+// Never deployed. scripts/preflight.py places this code at the keeper's
+// address with an eth_call state override, so the strategy sees the keeper
+// as msg.sender, and reads the outcome of harvest() or tend() in the same
+// call
+contract Preflight {
+    // values: gasUsed, gain, loss, totalDebt, debt, collateral, ratio
+    function simulate(address strategy, bytes calldata action)
+        external
+        returns (
+            bool success,
+            bytes memory revertData,
+            uint256[7] memory values
+        )
+    {
+        IPreflightVault vault =
+            IPreflightVault(IPreflightStrategy(strategy).vault());
+        StrategyParams memory before = vault.strategies(strategy);
+
+        uint256 gasBefore = gasleft();
+        (success, revertData) = strategy.call(action);
+        values[0] = gasBefore - gasleft();
+        if (!success) {
+            return (success, revertData, values);
+        }
+
+        StrategyParams memory params = vault.strategies(strategy);
+        values[1] = params.totalGain - before.totalGain;
+        values[2] = params.totalLoss - before.totalLoss;
+        values[3] = params.totalDebt;
+        values[4] = IPreflightStrategy(strategy).balanceOfDebt();
+        values[5] = IPreflightStrategy(strategy).balanceOfMakerVault();
+        // Reverts without collateral or with an invalid price
+        try IPreflightStrategy(strategy).getCurrentMakerVaultRatio() returns (
+            uint256 ratio
+        ) {
+            values[6] = ratio;
+        } catch {}
+    }
+}
@@ -11,9 +11,13 @@ contract TestCustomOSM is IOSMedianizer {
     uint256 futurePrice;
     bool revertForesight;
 
+    // Same event as Maker's OSM, so watchers see price moves
+    event LogValue(bytes32 val);
+
     function setCurrentPrice(uint256 _currentPrice, bool _revertRead) external {
         currentPrice = _currentPrice;
         revertRead = _revertRead;
+        emit LogValue(bytes32(_currentPrice));
     }
 
     function setFuturePrice(uint256 _futurePrice, bool _revertForesight)
@@ -21,6 +25,7 @@ contract TestCustomOSM is IOSMedianizer {
     {
         futurePrice = _futurePrice;
         revertForesight = _revertForesight;
+        emit LogValue(bytes32(_futurePrice));
     }
 
     function foresight()
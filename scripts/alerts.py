@@ -0,0 +1,76 @@
+from scripts.notify import flush, send_msg
+from scripts.report import format_report
+from scripts.store import DEFAULT_PATH, SnapshotStore, snapshot_from_data
+
+# Alert when the c-ratio gets this close to the liquidation ratio
+DEFAULT_LIQUIDATION_BUFFER = 0.25
+
+
+def _crossed(previous, current, level):
+    return (previous < level) != (current < level)
+
+
+def check_alerts(previous, current, liquidation_buffer=DEFAULT_LIQUIDATION_BUFFER):
+    # Compares two snapshots and describes every threshold that was crossed
+    # in between. An empty list means nothing worth notifying happened
+    if previous is None:
+        return ["First snapshot for this strategy"]
+
+    alerts = []
+
+    if previous["tend_trigger"] != current["tend_trigger"]:
+        if current["tend_trigger"]:
+            alerts.append("C-ratio left the tolerance band")
+        else:
+            alerts.append("C-ratio is back within the tolerance band")
+
+    safety = current["liquidation_ratio"] + liquidation_buffer
+    if _crossed(previous["current_ratio"], current["current_ratio"], safety):
+        direction = "below" if current["current_ratio"] < safety else "above"
+        alerts.append(f"C-ratio moved {direction} {safety:.2f}")
+
+    if _crossed(previous["profit"], current["profit"], 0):
+        alerts.append(
+            "Investment is now at a loss"
+            if current["profit"] < 0
+            else "Investment is back in profit"
+        )
+
+    if previous["debt_ratio"] != current["debt_ratio"]:
+        alerts.append(
+            f"Debt ratio changed from {previous['debt_ratio']:.2f}% "
+            f"to {current['debt_ratio']:.2f}%"
+        )
+
+    return alerts
+
+
+def publish_reports(results, timestamp, settings, store=None):
+    # Stores a snapshot per strategy and only sends the report of the ones
+    # that crossed a threshold, unless `send_full_report` is set
+    if store is None:
+        store = SnapshotStore(settings.get("store", DEFAULT_PATH))
+
+    buffer = settings.get("alerts", {}).get(
+        "liquidation_buffer", DEFAULT_LIQUIDATION_BUFFER
+    )
+    send_full_report = settings.get("send_full_report", False)
+
+    for r in results:
+        if r["error"] is not None:
+            print(f"{r['strategy']} failed after {r['elapsed']:.2f}s: {r['error']!r}")
+            continue
+
+        data = r["result"]
+        snapshot = snapshot_from_data(data)
+        previous = store.latest(snapshot["strategy"], before_block=data["block"])
+        alerts = check_alerts(previous, snapshot, buffer)
+        store.append(snapshot, timestamp)
+
+        print(
+            f"{r['strategy']} collected in {r['elapsed']:.2f}s ({len(alerts)} alerts)"
+        )
+        if alerts or send_full_report:
+            send_msg("\n".join(format_report(data, alerts)))
+
+    flush()
@@ -0,0 +1,164 @@
+import argparse
+
+import requests
+
+from scripts.monitor_lite import load_strategy_contracts, strategy_calls, strategy_data
+from scripts.rpc import THROTTLE_CODES, RPCError, block_tag
+from scripts.rpc_pool import connect
+from scripts.settings import monitor_settings
+from scripts.store import DEFAULT_PATH, SnapshotStore, snapshot_from_data
+
+# Rebuilds the snapshot history of the monitored strategies every `step`
+# blocks over a range, e.g. `python -m scripts.backfill 15000000 15100000`.
+# Needs an archive node. Snapshots already in the store are not fetched
+# again, so an interrupted backfill resumes where it stopped. With several
+# endpoints the batches go out concurrently through RpcPool.map_batches
+
+DEFAULT_STEP = 100
+
+# eth_calls per JSON-RPC batch. The size is halved when the node rejects a
+# batch and grows back one strategy at a time after each successful one
+DEFAULT_BATCH_SIZE = 240
+MAX_BATCH_SIZE = 2400
+
+
+class Backfill:
+    def __init__(
+        self, rpc, store, batch_size=DEFAULT_BATCH_SIZE, max_batch_size=MAX_BATCH_SIZE
+    ):
+        self.rpc = rpc
+        self.store = store
+        self.batch_size = batch_size
+        self.max_batch_size = max_batch_size
+        self.stats = {"batches": 0, "retries": 0, "snapshots": 0, "failed": 0}
+
+    def _calls(self, jobs):
+        # The headers of the blocks of every (contracts, block) job, then
+        # the job's eth_calls
+        blocks = sorted({block for _, block in jobs})
+        calls = [("eth_getBlockByNumber", [block_tag(b), False]) for b in blocks]
+        for contracts, block in jobs:
+            calls += [
+                ("eth_call", [contract.encode(fn_name, *args), block_tag(block)])
+                for contract, fn_name, *args in strategy_calls(contracts)
+            ]
+        return blocks, calls
+
+    def _rows(self, jobs, blocks, results):
+        # [(snapshot, timestamp)] of the jobs, skipping the jobs that
+        # reverted (e.g. before the strategy was deployed)
+        timestamps = {
+            b: int(header["timestamp"], 16)
+            for b, header in zip(blocks, results[: len(blocks)])
+        }
+        rows = []
+        offset = len(blocks)
+        for contracts, block in jobs:
+            job_calls = strategy_calls(contracts)
+            values = results[offset : offset + len(job_calls)]
+            offset += len(job_calls)
+
+            if any(isinstance(v, RPCError) for v in values):
+                self.stats["failed"] += 1
+                continue
+            values = [
+                contract.decode(fn_name, data)
+                for (contract, fn_name, *_), data in zip(job_calls, values)
+            ]
+            data = strategy_data(contracts, block, values)
+            rows.append((snapshot_from_data(data), timestamps[block]))
+        return rows
+
+    def _fetch(self, chunks):
+        # Reads every chunk of jobs in its own batch. An RpcPool sends them
+        # through map_batches, as many at a time as its AIMD limiter allows
+        prepared = [self._calls(jobs) for jobs in chunks]
+        batches = [calls for _, calls in prepared]
+        if hasattr(self.rpc, "map_batches"):
+            results = self.rpc.map_batches(batches, raise_on_error=False)
+        else:
+            results = [self.rpc.batch(calls, raise_on_error=False) for calls in batches]
+        self.stats["batches"] += len(batches)
+        for (blocks, _), batch_results in zip(prepared, results):
+            for i, r in enumerate(batch_results):
+                if isinstance(r, RPCError) and (
+                    i < len(blocks) or r.code in THROTTLE_CODES
+                ):
+                    raise r
+
+        rows = []
+        for jobs, (blocks, _), batch_results in zip(chunks, prepared, results):
+            rows += self._rows(jobs, blocks, batch_results)
+        return rows
+
+    def run(self, strategies, start, end, step=DEFAULT_STEP):
+        contracts = [load_strategy_contracts(self.rpc, s, end) for s in strategies]
+        calls_per_job = len(strategy_calls(contracts[0])) if contracts else 1
+
+        # Snapshots already in the store act as checkpoints
+        done = [self.store.blocks(c["strategy"].address, start, end) for c in contracts]
+        jobs = [
+            (c, block)
+            for block in range(start, end + 1, step)
+            for c, blocks in zip(contracts, done)
+            if block not in blocks
+        ]
+
+        # Batches in flight at once, from the pool's concurrency bound
+        window = self.rpc.limiter.maximum if hasattr(self.rpc, "map_batches") else 1
+
+        i = 0
+        while i < len(jobs):
+            size = max(1, self.batch_size // calls_per_job)
+            chunks = [
+                jobs[j : j + size]
+                for j in range(i, min(len(jobs), i + size * window), size)
+            ]
+            try:
+                rows = self._fetch(chunks)
+            except (requests.RequestException, RPCError):
+                if size == 1:
+                    raise
+                self.stats["retries"] += 1
+                self.batch_size = max(calls_per_job, self.batch_size // 2)
+                continue
+
+            for snapshot, timestamp in rows:
+                self.store.append(snapshot, timestamp)
+            self.stats["snapshots"] += len(rows)
+            i += sum(len(c) for c in chunks)
+            self.batch_size = min(self.max_batch_size, self.batch_size + calls_per_job)
+
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Backfill strategy snapshots over a block range"
+    )
+    parser.add_argument("start", type=int)
+    parser.add_argument("end", type=int, nargs="?")
+    parser.add_argument("--step", type=int, default=DEFAULT_STEP)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--strategy", action="append", dest="strategies")
+    args = parser.parse_args()
+
+    settings = monitor_settings()
+    rpc = connect(settings)
+    end = args.end if args.end is not None else rpc.block_number()
+
+    backfill = Backfill(
+        rpc, SnapshotStore(settings.get("store", DEFAULT_PATH)), args.batch_size
+    )
+    stats = backfill.run(
+        args.strategies or settings.get("strategies", []), args.start, end, args.step
+    )
+    print(
+        f"Backfilled {stats['snapshots']} snapshots from block {args.start} to {end} "
+        f"with {rpc.requests} requests ({stats['retries']} retries, "
+        f"{stats['failed']} reverted)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+from collections import deque
+
+from scripts.bundle import BundledContract
+
+# Base fee forecasting for the isCurrentBaseFeeAcceptable gate of
+# harvestTrigger and of the mint side of tendTrigger. The provider returns
+# block.basefee, and EIP-1559 makes the base fee of the next block a function
+# of its parent header alone, so:
+#
+#   - whether the gate is open at a block is known from its header, without
+#     an eth_call
+#   - the base fee falls by at most 1/8 per block, so the first block at
+#     which the gate can open is known too, and nothing needs to be
+#     evaluated before it
+#
+# forecast() also projects the base fee at the recent block utilization, as
+# an estimate of when the gate is likely to open
+
+ELASTICITY_MULTIPLIER = 2
+BASE_FEE_MAX_CHANGE_DENOMINATOR = 8
+
+DEFAULT_WINDOW = 20
+DEFAULT_HORIZON = 256
+
+
+def _int(value):
+    return int(value, 16) if isinstance(value, str) else value
+
+
+def next_base_fee(base_fee, gas_used, gas_limit):
+    # Base fee of the child of a block, as in go-ethereum's CalcBaseFee
+    target = gas_limit // ELASTICITY_MULTIPLIER
+    if gas_used == target:
+        return base_fee
+    if gas_used > target:
+        delta = base_fee * (gas_used - target) // target
+        return base_fee + max(delta // BASE_FEE_MAX_CHANGE_DENOMINATOR, 1)
+    delta = base_fee * (target - gas_used) // target
+    return base_fee - delta // BASE_FEE_MAX_CHANGE_DENOMINATOR
+
+
+def header_next_base_fee(header):
+    return next_base_fee(
+        _int(header["baseFeePerGas"]), _int(header["gasUsed"]), _int(header["gasLimit"])
+    )
+
+
+class BaseFeeForecaster:
+    # Recent headers of the chain, fed in order with add()
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.headers = deque(maxlen=window)
+
+    @property
+    def head(self):
+        return self.headers[-1] if self.headers else None
+
+    @property
+    def block(self):
+        return _int(self.head["number"])
+
+    def add(self, header):
+        if header.get("baseFeePerGas") is None:
+            raise ValueError("header has no base fee, the chain is not on London")
+        if self.head is not None and header["parentHash"] != self.head["hash"]:
+            # Reorg or gap, the older headers do not lead to this one
+            self.headers.clear()
+        self.headers.append(header)
+
+    def base_fee(self):
+        return _int(self.head["baseFeePerGas"])
+
+    def next_base_fee(self):
+        # Exact
+        return header_next_base_fee(self.head)
+
+    def utilization(self):
+        # Gas used over gas limit across the window, as (used, limit)
+        used = sum(_int(h["gasUsed"]) for h in self.headers)
+        limit = sum(_int(h["gasLimit"]) for h in self.headers)
+        return used, limit
+
+    def forecast(self, blocks):
+        # Base fees of the next `blocks` blocks, the first one exact and the
+        # others assuming the recent utilization holds
+        used, limit = self.utilization()
+        gas_limit = _int(self.head["gasLimit"])
+        gas_used = gas_limit * used // limit if limit else 0
+        fees = [self.next_base_fee()]
+        while len(fees) < blocks:
+            fees.append(next_base_fee(fees[-1], gas_used, gas_limit))
+        return fees
+
+    def earliest_block(self, max_base_fee):
+        # First block whose base fee can be <= max_base_fee. The head itself
+        # when it already is
+        if self.base_fee() <= max_base_fee:
+            return self.block
+        base_fee = self.next_base_fee()
+        block = self.block + 1
+        gas_limit = _int(self.head["gasLimit"])
+        while base_fee > max_base_fee:
+            lower = next_base_fee(base_fee, 0, gas_limit)
+            if lower == base_fee:
+                # Too small to move, 0 only ever stays 0
+                return None
+            base_fee = lower
+            block += 1
+        return block
+
+    def expected_block(self, max_base_fee, horizon=DEFAULT_HORIZON):
+        # First block the forecast puts at or under max_base_fee, or None
+        # within `horizon` blocks
+        if self.base_fee() <= max_base_fee:
+            return self.block
+        for i, fee in enumerate(self.forecast(horizon)):
+            if fee <= max_base_fee:
+                return self.block + 1 + i
+        return None
+
+
+class BaseFeeGate:
+    # Tracks which strategies have their base fee gate open and defers the
+    # others to the first block their gate can open
+    def __init__(self, forecaster=None):
+        self.forecaster = forecaster or BaseFeeForecaster()
+        # strategy -> maxAcceptableBaseFee
+        self.max_base_fees = {}
+        # strategy -> first block its closed gate can open at
+        self.waiting = {}
+
+    def load(self, rpc, strategies, block=None):
+        # maxAcceptableBaseFee only changes with a setter, read it again on
+        # full refreshes
+        results = rpc.call_many(
+            [
+                (BundledContract("Strategy", s), "maxAcceptableBaseFee")
+                for s in strategies
+            ],
+            block,
+        )
+        self.max_base_fees.update(zip(strategies, results))
+
+    def add(self, header):
+        self.forecaster.add(header)
+
+    def is_open(self, strategy):
+        # At the head. Unknown strategies and chains are assumed open, the
+        # trigger call decides
+        max_base_fee = self.max_base_fees.get(strategy)
+        if max_base_fee is None or self.forecaster.head is None:
+            return True
+        return self.forecaster.base_fee() <= max_base_fee
+
+    def split(self, strategies):
+        # (open, closed) at the head. Closed strategies wait for their
+        # earliest block
+        open_, closed = [], []
+        for s in strategies:
+            if self.is_open(s):
+                open_.append(s)
+                self.waiting.pop(s, None)
+            else:
+                closed.append(s)
+                self.waiting[s] = self.forecaster.earliest_block(self.max_base_fees[s])
+        return open_, closed
+
+    def opened(self):
+        # Waiting strategies whose gate is open at the head
+        if self.forecaster.head is None:
+            return []
+        block = self.forecaster.block
+        due = [
+            s
+            for s, earliest in self.waiting.items()
+            if earliest is not None and earliest <= block
+        ]
+        # Not open yet when blocks were fuller than empty
+        opened, _ = self.split(due)
+        return opened
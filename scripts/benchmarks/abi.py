@@ -0,0 +1,106 @@
+import time
+
+from scripts.bundle import Function, decode, encode, load_bundle
+from scripts.fast_abi import precompile
+
+# Encode + decode cost of the hot views with the precompiled FastFunction,
+# the generic eth_abi path of the bundle and, when brownie is installed,
+# brownie's ContractCall path (format_input, eth_abi, format_output).
+# Run it with `python -m scripts.benchmarks.abi`
+
+ITERATIONS = 20_000
+
+STRATEGY = "0xd33535e9F2E09485aC9cE8b27F865251161065E0"
+ILK = b"ETH-C".ljust(32, b"\0")
+URN = "0x60A9d7A1E2A3D8b4d6B02D0E8E1a8d7fA2D1cF27".lower()
+
+HOT = [
+    ("Strategy", "balanceOfDebt", []),
+    ("Strategy", "balanceOfMakerVault", []),
+    ("Strategy", "tendTrigger", [1]),
+    ("IVault", "pricePerShare", []),
+    ("IVault", "balanceOf", [STRATEGY]),
+    ("IVault", "strategies", [STRATEGY]),
+    ("Vat", "ilks", [ILK]),
+    ("Vat", "urns", [ILK, URN]),
+    ("DssCdpManager", "urns", [27_000]),
+]
+
+# Plausible return values by output type
+SAMPLES = {
+    "uint256": 123_456_789 * 10 ** 27,
+    "bool": True,
+    "address": URN,
+    "bytes32": ILK,
+}
+
+
+def _abi(name, fn_name):
+    return next(
+        e
+        for e in load_bundle()[name]
+        if e["type"] == "function" and e["name"] == fn_name
+    )
+
+
+def _brownie_codec(abi):
+    # The work brownie's ContractCall does around every call
+    try:
+        from brownie.convert.normalize import format_input, format_output
+        from brownie.convert.utils import get_type_strings
+    except ImportError:
+        return None
+
+    fn = Function(abi)
+    input_types = get_type_strings(abi["inputs"])
+    output_types = get_type_strings(abi["outputs"])
+
+    def encode_input(*args):
+        data = encode(input_types, format_input(abi, args))
+        return "0x" + (fn.selector + data).hex()
+
+    def decode_output(data):
+        result = format_output(abi, decode(output_types, bytes.fromhex(data[2:])))
+        return result[0] if len(result) == 1 else result
+
+    return encode_input, decode_output
+
+
+def timed(encode_input, decode_output, args, response):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        encode_input(*args)
+        decode_output(response)
+    return (time.perf_counter() - start) / ITERATIONS
+
+
+def main():
+    print(f"Encode + decode, {ITERATIONS} iterations, microseconds per call\n")
+    print(f"{'view':<28} {'fast':>8} {'bundle':>8} {'brownie':>8} {'speedup':>8}")
+    for name, fn_name, args in HOT:
+        abi = _abi(name, fn_name)
+        fast = precompile(abi)
+        generic = Function(abi)
+        response = "0x" + (
+            encode(
+                generic.output_types, [SAMPLES[t] for t in generic.output_types]
+            ).hex()
+        )
+        assert fast.decode_output(response) == generic.decode_output(response)
+
+        fast_time = timed(fast.encode_input, fast.decode_output, args, response)
+        bundle_time = timed(generic.encode_input, generic.decode_output, args, response)
+        brownie = _brownie_codec(abi)
+        brownie_time = timed(*brownie, args, response) if brownie else None
+
+        baseline = brownie_time or bundle_time
+        print(
+            f"{name + '.' + fn_name:<28} {fast_time * 1e6:>8.2f} "
+            f"{bundle_time * 1e6:>8.2f} "
+            f"{brownie_time * 1e6 if brownie else float('nan'):>8.2f} "
+            f"{baseline / fast_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
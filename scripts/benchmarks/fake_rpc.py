@@ -0,0 +1,179 @@
+import json
+import random
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scripts.bundle import BundledContract, Function, decode, encode, load_bundle
+from scripts.rpc import MULTICALL2
+
+# Local stand-in for a JSON-RPC node. eth_call is answered from the bundled
+# ABIs with the same placeholder values for every contract, which is enough
+# to drive the monitor's collection path. Latency, jitter and errors are
+# injected to mimic a remote provider. Multicall2 tryAggregate answers every
+# inner call the same way
+
+FAKE_ADDRESS = "0x" + "11" * 20
+
+DEFAULTS = {
+    "address": FAKE_ADDRESS,
+    "bool": False,
+    "bytes32": b"ETH-C".ljust(32, b"\0"),
+    "string": "Fake",
+}
+
+
+def _default(abi_type):
+    if abi_type in DEFAULTS:
+        return DEFAULTS[abi_type]
+    if "int" in abi_type:
+        bits = int(abi_type.split("int")[1] or 256)
+        return 10 ** 18 if bits >= 64 else 18
+    raise ValueError(f"No placeholder for {abi_type}")
+
+
+def _responses():
+    # Encoded placeholder output of every bundled function, by selector.
+    # When two ABIs share a selector (Vat.ilks and Spotter.ilks) the longest
+    # output wins, extra words are ignored when decoding the shorter one
+    responses = {}
+    for _, abi in sorted(load_bundle().items()):
+        for entry in abi:
+            if entry["type"] != "function":
+                continue
+            fn = Function(entry)
+            try:
+                defaults = [_default(t) for t in fn.output_types]
+            except ValueError:
+                # Dynamic outputs, e.g. tryAggregate
+                continue
+            output = encode(fn.output_types, defaults)
+            selector = "0x" + fn.selector.hex()
+            if len(output) * 2 + 2 > len(responses.get(selector, "")):
+                responses[selector] = "0x" + output.hex()
+    return responses
+
+
+class FakeNodeHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        node = self.server
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        calls = payload if isinstance(payload, list) else [payload]
+
+        with node.lock:
+            node.requests += 1
+            node.calls += len(calls)
+        node.delay(len(calls))
+
+        responses = [node.respond(c) for c in calls]
+        body = json.dumps(responses if isinstance(payload, list) else responses[0])
+        data = body.encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeNode(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        latency=0.0,
+        per_call_latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        seed=0,
+        host="127.0.0.1",
+        port=0,
+    ):
+        # latency is paid once per HTTP request and per_call_latency for each
+        # call in it, both plus up to `jitter` seconds. A fraction
+        # `error_rate` of the eth_calls fail
+        super().__init__((host, port), FakeNodeHandler)
+        self.latency = latency
+        self.per_call_latency = per_call_latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+
+        self.block = 15_000_000
+        self.requests = 0
+        self.calls = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._responses = _responses()
+        self._aggregate_selector = "0x" + (
+            BundledContract("Multicall2", MULTICALL2)
+            .functions["tryAggregate"]
+            .selector.hex()
+        )
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests = self.calls = self.errors = 0
+
+    def delay(self, calls):
+        with self.lock:
+            jitter = self._random.uniform(0, self.jitter)
+        seconds = self.latency + calls * self.per_call_latency + jitter
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def header(self, number):
+        return {
+            "number": hex(number),
+            "hash": "0x" + number.to_bytes(32, "big").hex(),
+            "parentHash": "0x" + (number - 1).to_bytes(32, "big").hex(),
+            "timestamp": hex(1_600_000_000 + 12 * number),
+            "logsBloom": "0x" + "00" * 256,
+        }
+
+    def result(self, method, params):
+        if method == "eth_blockNumber":
+            return hex(self.block)
+        if method == "eth_getBlockByNumber":
+            tag = params[0]
+            return self.header(self.block if tag == "latest" else int(tag, 16))
+        if method == "eth_call":
+            with self.lock:
+                failed = self._random.random() < self.error_rate
+                self.errors += failed
+            if failed:
+                raise ValueError("injected error")
+            data = params[0]["data"]
+            if data[:10] == self._aggregate_selector:
+                return self._aggregate(data)
+            return self._responses[data[:10]]
+        raise KeyError(method)
+
+    def _aggregate(self, data):
+        _, calls = decode(["bool", "(address,bytes)[]"], bytes.fromhex(data[10:]))
+        results = [
+            (True, bytes.fromhex(self._responses["0x" + calldata[:4].hex()][2:]))
+            for _, calldata in calls
+        ]
+        return "0x" + encode(["(bool,bytes)[]"], [results]).hex()
+
+    def respond(self, call):
+        response = {"jsonrpc": "2.0", "id": call["id"]}
+        try:
+            response["result"] = self.result(call["method"], call.get("params", []))
+        except (KeyError, ValueError) as e:
+            response["error"] = {"code": -32000, "message": repr(e)}
+        return response
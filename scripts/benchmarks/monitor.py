@@ -0,0 +1,72 @@
+from brownie import network, web3
+
+import time
+
+from scripts.cache import shared_cache
+from scripts.monitor import collect_strategy_data, collect_strategy_data_serial
+
+STRATEGIES = [
+    "0xd33535e9F2E09485aC9cE8b27F865251161065E0",  # ETH-C
+    "0x19b2c8b3C601E9690ee524B02d4aCA058Db8B0D7",  # YFI-A
+]
+
+RUNS = 10
+
+
+class RequestCounter:
+    # Counts every JSON-RPC request that goes through brownie's web3 provider
+    def __init__(self):
+        self.count = 0
+
+    def __enter__(self):
+        self._make_request = web3.provider.make_request
+
+        def make_request(method, params):
+            self.count += 1
+            return self._make_request(method, params)
+
+        web3.provider.make_request = make_request
+        return self
+
+    def __exit__(self, *args):
+        web3.provider.make_request = self._make_request
+
+
+def measure(collect, strategy):
+    with RequestCounter() as counter:
+        start = time.perf_counter()
+        for _ in range(RUNS):
+            # Every run reads the same block, measure cold reads only
+            shared_cache().clear()
+            data = collect(strategy)
+        elapsed = time.perf_counter() - start
+    return data, counter.count / RUNS, elapsed / RUNS
+
+
+def main():
+    print(f"You are using the '{network.show_active()}' network")
+
+    for strategy in STRATEGIES:
+        # Warm up contract objects so neither path pays for explorer lookups
+        collect_strategy_data(strategy)
+        collect_strategy_data_serial(strategy)
+
+        serial, serial_calls, serial_time = measure(
+            collect_strategy_data_serial, strategy
+        )
+        batched, batched_calls, batched_time = measure(collect_strategy_data, strategy)
+
+        # Both paths must produce the same report values
+        for key, value in serial.items():
+            if key != "block" and batched[key] != value:
+                print(f"  mismatch on {key}: {value} != {batched[key]}")
+
+        print(
+            f"""
+    {serial['name']} {strategy}
+
+      serial: {serial_calls:.1f} requests {serial_time * 1000:.1f} ms
+     batched: {batched_calls:.1f} requests {batched_time * 1000:.1f} ms
+     speedup: {serial_time / batched_time:.2f}x
+    """
+        )
@@ -0,0 +1,70 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from scripts.settings import PROJECT_ROOT, monitor_settings, rpc_endpoint
+
+# Cold start of both monitor runtimes, from a fresh interpreter until the
+# first strategy is resolved and ready to be read.
+# Run it with `python -m scripts.benchmarks.startup`
+
+RUNS = 5
+
+LITE = """
+from scripts.monitor_lite import load_strategy_contracts
+from scripts.rpc import JsonRpc
+
+load_strategy_contracts(JsonRpc({endpoint!r}), {strategy!r})
+"""
+
+BROWNIE = """
+from brownie import network, project
+
+p = project.load({root!r})
+p.load_config()
+network.connect({network!r})
+
+from scripts.monitor import load_strategy_contracts
+
+load_strategy_contracts({strategy!r})
+"""
+
+
+def cold_start(code):
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", code], cwd=PROJECT_ROOT, check=True, capture_output=True
+    )
+    return time.perf_counter() - start
+
+
+def measure(code):
+    times = [cold_start(code) for _ in range(RUNS)]
+    return min(times), statistics.median(times)
+
+
+def main():
+    strategy = monitor_settings()["strategies"][0]
+    network = os.getenv("BROWNIE_NETWORK", "mainnet")
+
+    lite_min, lite_median = measure(
+        LITE.format(endpoint=rpc_endpoint(), strategy=strategy)
+    )
+    brownie_min, brownie_median = measure(
+        BROWNIE.format(root=str(PROJECT_ROOT), network=network, strategy=strategy)
+    )
+
+    print(
+        f"""
+    Cold start for {strategy} ({RUNS} runs)
+
+        lite: min {lite_min:.3f}s median {lite_median:.3f}s
+     brownie: min {brownie_min:.3f}s median {brownie_median:.3f}s ({network})
+    """
+    )
+
+
+if __name__ == "__main__":
+    main()
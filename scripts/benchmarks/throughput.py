@@ -0,0 +1,145 @@
+import argparse
+import json
+import platform
+import statistics
+import time
+
+from pathlib import Path
+
+from scripts.benchmarks.fake_rpc import FakeNode
+from scripts.cache import shared_cache
+from scripts.derived import collect_derived_data
+from scripts.fleet import DEFAULT_CONCURRENCY, monitor_fleet
+from scripts.monitor_lite import collect_strategy_data
+from scripts.rpc import JsonRpc
+from scripts.rpc_pool import percentile
+
+# Throughput of the monitor's collection path against a local fake node
+# with injected latency, for growing fleets. Run it with
+# `python -m scripts.benchmarks.throughput --save` and compare later runs
+# with `--compare scripts/benchmarks/baselines/throughput.json`. `--derive`
+# measures the monitor.derive_locally path instead of the views
+
+SIZES = [1, 10, 100, 1000]
+CONCURRENCY = [1, DEFAULT_CONCURRENCY]
+RUNS = 5
+
+# A remote provider: 10ms per request, 0.2ms per call, up to 5ms of jitter
+LATENCY = 0.01
+PER_CALL_LATENCY = 0.0002
+JITTER = 0.005
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "throughput.json"
+
+
+def fake_strategies(size):
+    # Addresses unique to each fleet size so every size pays its own loads
+    return [f"0x{size * 10**6 + i:040x}" for i in range(size)]
+
+
+def bench(node, size, concurrency, runs, collect=collect_strategy_data):
+    rpc = JsonRpc(node.url)
+    strategies = fake_strategies(size)
+
+    def collect_fleet():
+        # A new block per run, so nothing is served from the view cache
+        node.block += 1
+        block = node.block
+        return monitor_fleet(strategies, lambda s: collect(rpc, s, block), concurrency)
+
+    # Warm up: resolves want, vaults and ilk of every strategy once
+    collect_fleet()
+    node.reset_counters()
+    shared_cache().clear()
+
+    times, errors = [], 0
+    for _ in range(runs):
+        results, elapsed = collect_fleet()
+        times.append(elapsed)
+        errors += sum(r["error"] is not None for r in results)
+
+    times.sort()
+    return {
+        "strategies": size,
+        "concurrency": concurrency,
+        "runs": runs,
+        "throughput": size * runs / sum(times),
+        "p50": statistics.median(times),
+        "p99": percentile(times, 0.99),
+        "requests_per_run": node.requests / runs,
+        "calls_per_run": node.calls / runs,
+        "errors": errors,
+    }
+
+
+def compare(results, baseline):
+    previous = {(r["strategies"], r["concurrency"]): r for r in baseline["results"]}
+    for r in results:
+        base = previous.get((r["strategies"], r["concurrency"]))
+        if base is None:
+            continue
+        print(
+            f"{r['strategies']:>5} strategies x{r['concurrency']:<3} "
+            f"throughput {r['throughput'] / base['throughput']:.2f}x "
+            f"p50 {r['p50'] / base['p50']:.2f}x "
+            f"requests {r['requests_per_run'] - base['requests_per_run']:+.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monitor throughput benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=CONCURRENCY)
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--latency", type=float, default=LATENCY)
+    parser.add_argument("--per-call-latency", type=float, default=PER_CALL_LATENCY)
+    parser.add_argument("--jitter", type=float, default=JITTER)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--save", nargs="?", const=BASELINE_PATH, type=Path)
+    parser.add_argument("--compare", type=Path)
+    parser.add_argument("--derive", action="store_true")
+    args = parser.parse_args()
+
+    node = FakeNode(
+        args.latency, args.per_call_latency, args.jitter, args.error_rate
+    ).start()
+
+    collect = collect_derived_data if args.derive else collect_strategy_data
+    results = []
+    try:
+        for size in args.sizes:
+            for concurrency in args.concurrency:
+                r = bench(node, size, concurrency, args.runs, collect)
+                results.append(r)
+                print(
+                    f"{size:>5} strategies x{concurrency:<3} "
+                    f"{r['throughput']:8.1f} strategies/s "
+                    f"p50 {r['p50'] * 1000:8.1f} ms p99 {r['p99'] * 1000:8.1f} ms "
+                    f"{r['requests_per_run']:7.1f} requests "
+                    f"{r['calls_per_run']:8.1f} calls/run {r['errors']} errors"
+                )
+    finally:
+        node.shutdown()
+
+    report = {
+        "created": int(time.time()),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "node": {
+            "latency": args.latency,
+            "per_call_latency": args.per_call_latency,
+            "jitter": args.jitter,
+            "error_rate": args.error_rate,
+        },
+        "results": results,
+    }
+    if args.compare:
+        compare(results, json.loads(args.compare.read_text()))
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Saved baseline to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
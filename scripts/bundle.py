@@ -0,0 +1,102 @@
+import json
+
+from pathlib import Path
+
+from eth_utils import keccak, to_checksum_address
+
+try:
+    from eth_abi import decode, encode
+except ImportError:  # eth-abi < 4
+    from eth_abi import decode_abi as decode, encode_abi as encode
+
+from scripts.fast_abi import precompile
+
+# ABIs shipped with the scripts so the lightweight monitor never needs the
+# brownie project or an explorer. Bump the version when an ABI changes
+ABI_BUNDLE_VERSION = "v1"
+ABI_BUNDLE_PATH = Path(__file__).parent / "abis"
+
+_bundles = {}
+
+
+def load_bundle(version=ABI_BUNDLE_VERSION):
+    if version not in _bundles:
+        _bundles[version] = {
+            path.stem: json.loads(path.read_text())
+            for path in sorted((ABI_BUNDLE_PATH / version).glob("*.json"))
+        }
+    return _bundles[version]
+
+
+def _canonical_type(param):
+    if param["type"].startswith("tuple"):
+        components = ",".join(_canonical_type(c) for c in param["components"])
+        return f"({components}){param['type'][len('tuple'):]}"
+    return param["type"]
+
+
+class Function:
+    def __init__(self, abi):
+        self.name = abi["name"]
+        self.input_types = [_canonical_type(i) for i in abi["inputs"]]
+        self.output_types = [_canonical_type(o) for o in abi["outputs"]]
+        self.output_names = [o["name"] for o in abi["outputs"]]
+        self.signature = f"{self.name}({','.join(self.input_types)})"
+        self.selector = keccak(text=self.signature)[:4]
+
+    def encode_input(self, *args):
+        return "0x" + (self.selector + encode(self.input_types, args)).hex()
+
+    def decode_output(self, data):
+        if isinstance(data, str):
+            data = bytes.fromhex(data[2:] if data.startswith("0x") else data)
+
+        values = [
+            to_checksum_address(v) if t == "address" else v
+            for t, v in zip(self.output_types, decode(self.output_types, data))
+        ]
+
+        if len(values) == 1:
+            return values[0]
+        if all(self.output_names):
+            return dict(zip(self.output_names, values))
+        return tuple(values)
+
+
+_functions = {}
+
+
+def bundle_functions(name, version=ABI_BUNDLE_VERSION):
+    # {fn_name: Function} of a bundled ABI, built once. Hot views get a
+    # precompiled FastFunction instead
+    if (name, version) not in _functions:
+        _functions[name, version] = {
+            abi["name"]: precompile(abi) or Function(abi)
+            for abi in load_bundle(version)[name]
+            if abi["type"] == "function"
+        }
+    return _functions[name, version]
+
+
+class BundledContract:
+    def __init__(self, name, address, version=ABI_BUNDLE_VERSION, sender=None):
+        # Calls are made from `sender` when given, for views that check it
+        self._name = name
+        self.address = to_checksum_address(address)
+        self.sender = to_checksum_address(sender) if sender else None
+        self.functions = bundle_functions(name, version)
+
+    def __repr__(self):
+        return f"<{self._name} '{self.address}'>"
+
+    def __str__(self):
+        return self.address
+
+    def encode(self, fn_name, *args):
+        tx = {"to": self.address, "data": self.functions[fn_name].encode_input(*args)}
+        if self.sender:
+            tx["from"] = self.sender
+        return tx
+
+    def decode(self, fn_name, data):
+        return self.functions[fn_name].decode_output(data)
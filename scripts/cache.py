@@ -0,0 +1,110 @@
+import threading
+
+from collections import OrderedDict
+
+# View results only change between blocks, so they can be memoized by
+# (block, address, calldata). The calldata covers both selector and args.
+DEFAULT_MAX_BLOCKS = 4
+DEFAULT_MAX_ENTRIES = 50_000
+
+
+class BlockCache:
+    # Read-through cache for contract views shared by the scripts. Only the
+    # `max_blocks` most recent blocks are kept and the total number of
+    # entries is bounded by `max_entries`, dropping the oldest blocks first
+    def __init__(self, max_blocks=DEFAULT_MAX_BLOCKS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_blocks = max_blocks
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._blocks = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": self._size,
+            "blocks": len(self._blocks),
+        }
+
+    def clear(self):
+        # Needed after a reorg or a chain revert, when block numbers are reused
+        with self._lock:
+            self._blocks.clear()
+            self._size = 0
+
+    def get(self, block, address, calldata):
+        with self._lock:
+            entries = self._blocks.get(block)
+            key = (address.lower(), calldata)
+            if entries is not None and key in entries:
+                self.hits += 1
+                return True, entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, block, address, calldata, value):
+        if not isinstance(block, int):
+            # "latest" and friends are moving targets
+            return
+
+        with self._lock:
+            if block not in self._blocks:
+                oldest = next(iter(self._blocks), block)
+                if block < oldest and len(self._blocks) >= self.max_blocks:
+                    # Older than anything we keep, not worth caching
+                    return
+                self._blocks[block] = {}
+                self._blocks = OrderedDict(sorted(self._blocks.items()))
+
+            entries = self._blocks[block]
+            key = (address.lower(), calldata)
+            if key not in entries:
+                self._size += 1
+            entries[key] = value
+
+            while len(self._blocks) > self.max_blocks or (
+                self._size > self.max_entries and len(self._blocks) > 1
+            ):
+                self._evict_oldest_block()
+
+            if self._size > self.max_entries:
+                # A single block holds more than max_entries
+                entries.pop(next(iter(entries)))
+                self._size -= 1
+                self.evictions += 1
+
+    def _evict_oldest_block(self):
+        _, entries = self._blocks.popitem(last=False)
+        self._size -= len(entries)
+        self.evictions += len(entries)
+
+    def call(self, contract_call, *args, block):
+        # Read-through helper for brownie ContractCall objects, e.g.
+        # cache.call(strategy.balanceOfDebt, block=chain.height)
+        calldata = contract_call.encode_input(*args)
+        hit, value = self.get(block, contract_call._address, calldata)
+        if not hit:
+            value = contract_call(*args, block_identifier=block)
+            self.put(block, contract_call._address, calldata, value)
+        return value
+
+
+_shared_cache = None
+
+
+def shared_cache():
+    # Process wide cache used by the monitor, the exporter, deploy and keepers
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = BlockCache()
+    return _shared_cache
@@ -4,6 +4,8 @@ from brownie import Strategy, accounts, config, network, project, web3
 from eth_utils import is_checksum_address
 import click
 
+from scripts.profiler import profile_web3
+
 API_VERSION = config["dependencies"][0].split("@")[-1]
 Vault = project.load(
     Path.home() / ".brownie" / "packages" / config["dependencies"][0]
@@ -30,6 +32,7 @@ def get_address(msg: str, default: str = None) -> str:
 
 
 def main():
+    profile_web3(web3)
     print(f"You are using the '{network.show_active()}' network")
     dev = accounts.load(click.prompt("Account", type=click.Choice(accounts.load())))
     print(f"You are using: 'dev' [{dev.address}]")
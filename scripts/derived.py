@@ -0,0 +1,309 @@
+import threading
+
+from eth_utils import to_checksum_address
+
+from scripts import vat_reader
+from scripts.bundle import BundledContract
+from scripts.cache import shared_cache
+from scripts.maker import DAI, RAY, SPOTTER, VAT, WAD
+from scripts.monitor_lite import load_strategy_contracts
+from scripts.rpc import RPCError
+from scripts.vat_reader import debt_for_urn, resolve_urns
+
+# Derives the monitor fields from primitive reads. getCurrentMakerVaultRatio,
+# tendTrigger and estimatedTotalAssets each price want again on-chain
+# (spotter, OSM read and foresight, par), so here every primitive is read
+# once and the views are recomputed with the same integer math as the
+# contracts. Enable it with `monitor.derive_locally`
+
+# Provider Strategy.isCurrentBaseFeeAcceptable reads the base fee from and
+# the value it assumes when that call fails
+BASE_FEE_PROVIDER = "0xf8d0Ec04e94296773cE20eFbeeA82e76220cD549"
+FALLBACK_BASE_FEE = 1000 * 10 ** 9
+
+# Constants of Strategy and MakerDaiDelegateLib
+MAX_BPS = WAD
+MIN_MINTABLE = 500000 * WAD
+
+# Reads the contracts wrap in try/catch
+MAY_REVERT = {"osm_read", "osm_foresight", "base_fee"}
+
+_static = {}
+_static_lock = threading.Lock()
+
+
+class Revert(Exception):
+    # The on-chain view would revert with these inputs
+    pass
+
+
+def spot_price(spot, mat):
+    # MakerDaiDelegateLib.getSpotPrice: collateral price without the safety
+    # margin, ray * ray to wad
+    return spot * mat // (RAY * 10 ** 9)
+
+
+def want_price(spot_price, current, future, par):
+    # Strategy._getWantTokenPrice. `current` and `future` are the (price,
+    # valid) OSM reads, or None when they revert
+    price = spot_price
+    for osm in (current, future):
+        if osm is not None and osm[1] and osm[0] > 0:
+            price = min(price, osm[0])
+    if price == 0:
+        raise Revert("invalid spot price")
+    return price * RAY // par
+
+
+def current_ratio(ink, debt, spot_price, want_price):
+    # getPessimisticRatioOfCdpWithExternalPrice with MAX_BPS precision
+    price = min(spot_price, want_price)
+    if price == 0:
+        raise Revert("invalid price")
+    return ink * price // WAD * MAX_BPS // (debt or 1)
+
+
+def is_dai_available_to_mint(Art, rate, line):
+    vat_debt = Art * rate
+    return vat_debt < line and (line - vat_debt) // RAY >= MIN_MINTABLE
+
+
+def tend_trigger(
+    ink,
+    debt,
+    ratio,
+    collateralization_ratio,
+    rebalance_tolerance,
+    base_fee,
+    max_acceptable_base_fee,
+    dai_available,
+):
+    if ink == 0:
+        return False
+    if ratio < collateralization_ratio - rebalance_tolerance:
+        return True
+    return (
+        ratio > collateralization_ratio + rebalance_tolerance
+        and debt > 0
+        and base_fee <= max_acceptable_base_fee
+        and dai_available
+    )
+
+
+def estimated_total_assets(
+    want_balance, ink, dai_balance, shares, price_per_share, decimals, debt, price
+):
+    # Every DAI amount is converted to want on its own, as in the contract
+    def to_want(amount):
+        return amount * WAD // price
+
+    assets = (
+        want_balance
+        + ink
+        + to_want(dai_balance)
+        + to_want(shares * price_per_share // 10 ** decimals)
+    )
+    if to_want(debt) > assets:
+        raise Revert("estimatedTotalAssets underflow")
+    return assets - to_want(debt)
+
+
+def forget(strategy=None):
+    # Drops what is cached for `strategy`, or for every strategy
+    with _static_lock:
+        if strategy is None:
+            _static.clear()
+        else:
+            _static.pop(str(strategy), None)
+    vat_reader.forget(strategy)
+
+
+def load_static(rpc, s, block=None):
+    # Values derived mode needs that do not change for a strategy
+    contracts = load_strategy_contracts(rpc, s, block)
+    s = contracts["strategy"].address
+    if s in _static:
+        return _static[s]
+
+    symbol, osm, decimals = rpc.call_many(
+        [
+            (contracts["want"], "symbol"),
+            (contracts["strategy"], "wantToUSDOSMProxy"),
+            (contracts["yvault"], "decimals"),
+        ],
+        block,
+    )
+    with _static_lock:
+        _static[s] = {
+            "want_symbol": symbol,
+            # OSM views are only answered for authorized callers, so they are
+            # read as the strategy would
+            "osm": BundledContract("IOSMedianizer", osm, sender=s),
+            "yvault_decimals": decimals,
+        }
+    return _static[s]
+
+
+def derived_calls(contracts, static, urn):
+    s = contracts["strategy"]
+    ilk = contracts["ilk"]
+    vat = BundledContract("Vat", VAT)
+    spotter = BundledContract("Spotter", SPOTTER)
+
+    # {read name: call}
+    return {
+        # Shared by every strategy of the ilk and served from the cache
+        "vat_ilk": (vat, "ilks", ilk),
+        "spotter_ilk": (spotter, "ilks", ilk),
+        "par": (spotter, "par"),
+        "price_per_share": (contracts["yvault"], "pricePerShare"),
+        "base_fee": (BundledContract("IBaseFee", BASE_FEE_PROVIDER), "basefee_global"),
+        # Specific to the strategy
+        "cdp_id": (s, "cdpId"),
+        "vat_urn": (vat, "urns", ilk, urn),
+        "osm_read": (static["osm"], "read"),
+        "osm_foresight": (static["osm"], "foresight"),
+        "want_balance": (contracts["want"], "balanceOf", s.address),
+        "dai_balance": (BundledContract("ERC20", DAI), "balanceOf", s.address),
+        "shares": (contracts["yvault"], "balanceOf", s.address),
+        "params": (contracts["vault"], "strategies", s.address),
+        "collateralization_ratio": (s, "collateralizationRatio"),
+        "rebalance_tolerance": (s, "rebalanceTolerance"),
+        "max_acceptable_base_fee": (s, "maxAcceptableBaseFee"),
+    }
+
+
+def derived_data(contracts, static, block, cdp_id, reads):
+    # `reads` by name, as in derived_calls
+    ilk_params = reads["vat_ilk"]
+    spotter_ilk = reads["spotter_ilk"]
+    par = reads["par"]
+    price_per_share = reads["price_per_share"]
+    base_fee = reads["base_fee"]
+    vat_urn = reads["vat_urn"]
+    current = reads["osm_read"]
+    future = reads["osm_foresight"]
+    want_balance = reads["want_balance"]
+    dai_balance = reads["dai_balance"]
+    shares = reads["shares"]
+    params = reads["params"]
+    collateralization_ratio = reads["collateralization_ratio"]
+    rebalance_tolerance = reads["rebalance_tolerance"]
+    max_acceptable_base_fee = reads["max_acceptable_base_fee"]
+
+    # The contract ignores OSM reads and base fee reads that revert
+    current, future = [
+        None if isinstance(osm, RPCError) else (osm["price"], osm["osm"])
+        for osm in (current, future)
+    ]
+    base_fee = FALLBACK_BASE_FEE if isinstance(base_fee, RPCError) else base_fee
+
+    ink = vat_urn["ink"]
+    debt = debt_for_urn(vat_urn["art"], ilk_params["rate"])
+    spot = spot_price(ilk_params["spot"], spotter_ilk["mat"])
+    price = want_price(spot, current, future, par)
+    ratio = current_ratio(ink, debt, spot, price)
+    total_assets = estimated_total_assets(
+        want_balance,
+        ink,
+        dai_balance,
+        shares,
+        price_per_share,
+        static["yvault_decimals"],
+        debt,
+        price,
+    )
+
+    return {
+        "block": block,
+        "name": contracts["name"],
+        "address": contracts["strategy"].address,
+        "want_symbol": static["want_symbol"],
+        "cdp_id": cdp_id,
+        "collateral": ink,
+        "debt": debt,
+        "shares": shares,
+        "price_per_share": price_per_share,
+        "spot_price": spot,
+        "collateralization_ratio": collateralization_ratio,
+        "current_ratio": ratio,
+        "liquidation_ratio": spotter_ilk["mat"],
+        "debt_ratio": params["debtRatio"],
+        "tend_trigger": tend_trigger(
+            ink,
+            debt,
+            ratio,
+            collateralization_ratio,
+            rebalance_tolerance,
+            base_fee,
+            max_acceptable_base_fee,
+            is_dai_available_to_mint(
+                ilk_params["Art"], ilk_params["rate"], ilk_params["line"]
+            ),
+        ),
+        "want_price": price,
+        "estimated_total_assets": total_assets,
+        # What prepareReturn reports before freeing funds
+        "profit": max(total_assets - params["totalDebt"], 0),
+    }
+
+
+def read_fleet(rpc, strategies, block, extra_calls=None, may_revert=()):
+    # {strategy: {"contracts", "static", "cdp_id", "reads"}} for every
+    # strategy, with the derived_calls reads and the {name: call} of
+    # extra_calls(contracts) by name. One batch: a Multicall2 eth_call for
+    # the reads missing from the block cache and the OSM reads, which must
+    # come from the strategy. A strategy whose reads fail maps to the
+    # RPCError instead
+    strategies = [to_checksum_address(s) for s in strategies]
+    resolved = resolve_urns(rpc, strategies, block)
+    may_revert = MAY_REVERT | set(may_revert)
+
+    fleet, names, calls = {}, [], []
+    for s in strategies:
+        contracts = load_strategy_contracts(rpc, s, block)
+        static = load_static(rpc, s, block)
+        cdp_id, _, urn = resolved[s]
+        strategy_calls = derived_calls(contracts, static, urn)
+        if extra_calls is not None:
+            strategy_calls.update(extra_calls(contracts))
+        fleet[s] = {"contracts": contracts, "static": static, "cdp_id": cdp_id}
+        names.append((s, list(strategy_calls)))
+        calls += strategy_calls.values()
+    results = iter(
+        rpc.aggregate(calls, block, raise_on_error=False, cache=shared_cache())
+    )
+
+    moved = []
+    for s, keys in names:
+        reads = {name: next(results) for name in keys}
+        errors = [
+            r
+            for name, r in reads.items()
+            if isinstance(r, RPCError) and name not in may_revert
+        ]
+        if errors:
+            fleet[s] = errors[0]
+        elif reads["cdp_id"] != fleet[s]["cdp_id"]:
+            moved.append(s)
+        else:
+            fleet[s]["reads"] = reads
+    if moved:
+        # Moved to another cdp with shiftToCdp
+        for s in moved:
+            vat_reader.forget(s)
+        fleet.update(read_fleet(rpc, moved, block, extra_calls, may_revert))
+    return fleet
+
+
+def collect_derived_data(rpc, s, block=None):
+    # Drop-in for monitor_lite.collect_strategy_data, with one batch of
+    # primitive reads pinned to `block`
+    if block is None:
+        block = rpc.block_number()
+    (read,) = read_fleet(rpc, [s], block).values()
+    if isinstance(read, RPCError):
+        raise read
+    return derived_data(
+        read["contracts"], read["static"], block, read["cdp_id"], read["reads"]
+    )
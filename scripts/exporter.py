@@ -0,0 +1,238 @@
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scripts.cache import shared_cache
+from scripts.monitor_lite import load_strategy_contracts
+from scripts.rpc import RPCError
+from scripts.rpc_pool import connect
+from scripts.settings import monitor_settings
+
+# Long-lived Prometheus exporter for the monitored strategies.
+# Run it with `python -m scripts.exporter` and scrape http://<host>:<port>/metrics
+
+DEFAULT_PORT = 9101
+
+# How long the latest block number is trusted before asking the node again
+DEFAULT_BLOCK_POLL_INTERVAL = 2
+
+METRICS = [
+    # name, help, scale
+    ("collateralization_ratio", "Current c-ratio of the CDP", 1e18),
+    ("target_collateralization_ratio", "Target c-ratio of the CDP", 1e18),
+    ("debt", "balanceOfDebt in DAI", 1e18),
+    ("collateral", "balanceOfMakerVault in want", 1e18),
+    ("investment_value", "Value of the yvDAI position in DAI", 1e36),
+    ("tend_trigger", "1 if tendTrigger(1) is true", 1),
+    ("base_fee_acceptable", "1 if isCurrentBaseFeeAcceptable() is true", 1),
+]
+
+
+def collect_metrics(rpc, strategies, block):
+    # Reads every metric of every strategy in one batch pinned to `block`.
+    # Values that reverted are left out instead of failing the scrape
+    contracts = [load_strategy_contracts(rpc, s, block) for s in strategies]
+
+    calls = []
+    for c in contracts:
+        strategy = c["strategy"]
+        calls += [
+            (strategy, "getCurrentMakerVaultRatio"),
+            (strategy, "collateralizationRatio"),
+            (strategy, "balanceOfDebt"),
+            (strategy, "balanceOfMakerVault"),
+            (strategy, "tendTrigger", 1),
+            (strategy, "isCurrentBaseFeeAcceptable"),
+            (c["yvault"], "balanceOf", strategy.address),
+            (c["yvault"], "pricePerShare"),
+        ]
+    results = rpc.call_many(calls, block, raise_on_error=False, cache=shared_cache())
+
+    metrics = {}
+    for i, c in enumerate(contracts):
+        (
+            current_ratio,
+            target_ratio,
+            debt,
+            collateral,
+            tend_trigger,
+            base_fee_acceptable,
+            shares,
+            price_per_share,
+        ) = results[8 * i : 8 * (i + 1)]
+
+        values = {
+            "collateralization_ratio": current_ratio,
+            "target_collateralization_ratio": target_ratio,
+            "debt": debt,
+            "collateral": collateral,
+            "tend_trigger": tend_trigger,
+            "base_fee_acceptable": base_fee_acceptable,
+        }
+        if not isinstance(shares, RPCError) and not isinstance(
+            price_per_share, RPCError
+        ):
+            values["investment_value"] = shares * price_per_share
+
+        metrics[c["strategy"].address] = {
+            "name": c["name"],
+            "values": {k: v for k, v in values.items() if not isinstance(v, RPCError)},
+        }
+    return metrics
+
+
+def format_metrics(metrics, block, stats):
+    lines = []
+    for name, description, scale in METRICS:
+        metric = f"maker_dai_delegate_{name}"
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} gauge"]
+        for address, strategy in metrics.items():
+            if name in strategy["values"]:
+                value = int(strategy["values"][name]) / scale
+                lines.append(
+                    f'{metric}{{strategy="{address}",name="{strategy["name"]}"}} {value}'
+                )
+
+    lines += [
+        "# HELP maker_dai_delegate_block Block the metrics were read at",
+        "# TYPE maker_dai_delegate_block gauge",
+        f"maker_dai_delegate_block {block}",
+    ]
+    for name, value in stats.items():
+        metric = f"maker_dai_delegate_exporter_{name}_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+
+    return "\n".join(lines) + "\n"
+
+
+def format_rpc_metrics(metrics):
+    # Tail latencies and health of the endpoints behind an RpcPool
+    metric = "maker_dai_delegate_rpc_latency_seconds"
+    lines = [
+        f"# HELP {metric} Latency of JSON-RPC requests, hedging included",
+        f"# TYPE {metric} summary",
+    ]
+    for q, value in metrics["latency"].items():
+        if value is not None:
+            lines.append(f'{metric}{{quantile="{q}"}} {value}')
+
+    metric = "maker_dai_delegate_rpc_endpoint_latency_seconds"
+    lines += [f"# TYPE {metric} summary"]
+    for i, e in enumerate(metrics["endpoints"]):
+        labels = f'endpoint="{i}",host="{e["name"]}"'
+        for q, value in e["latency"].items():
+            if value is not None:
+                lines.append(f'{metric}{{{labels},quantile="{q}"}} {value}')
+        for name in ["requests", "failures"]:
+            lines.append(
+                f"maker_dai_delegate_rpc_endpoint_{name}_total{{{labels}}} {e[name]}"
+            )
+
+    for name in ["hedges", "hedge_wins"]:
+        lines.append(f"maker_dai_delegate_rpc_{name}_total {metrics[name]}")
+    lines.append(
+        f"maker_dai_delegate_rpc_concurrency_limit {metrics['concurrency_limit']}"
+    )
+    return "\n".join(lines) + "\n"
+
+
+class ScrapeCache:
+    # Serves the same exposition to every scraper within a block. The head
+    # is polled at most once per `block_poll_interval`, so the RPC load does
+    # not depend on how many scrapers there are
+    def __init__(
+        self, rpc, strategies, block_poll_interval=DEFAULT_BLOCK_POLL_INTERVAL
+    ):
+        self.rpc = rpc
+        self.strategies = strategies
+        self.block_poll_interval = block_poll_interval
+
+        self.stats = {"scrapes": 0, "cache_hits": 0, "refreshes": 0}
+        self._block = None
+        self._block_checked_at = 0
+        self._cached_block = None
+        self._cached = None
+        self._lock = threading.Lock()
+
+    def head(self):
+        now = time.monotonic()
+        if (
+            self._block is None
+            or now - self._block_checked_at >= self.block_poll_interval
+        ):
+            self._block = self.rpc.block_number()
+            self._block_checked_at = now
+        return self._block
+
+    def scrape(self):
+        # Concurrent scrapers wait for a single refresh instead of each
+        # reading the chain
+        with self._lock:
+            self.stats["scrapes"] += 1
+            block = self.head()
+            if block != self._cached_block:
+                self.stats["refreshes"] += 1
+                self._cached = collect_metrics(self.rpc, self.strategies, block)
+                self._cached_block = block
+            else:
+                self.stats["cache_hits"] += 1
+
+            cache = shared_cache().stats()
+            exposition = format_metrics(
+                self._cached,
+                block,
+                {
+                    **self.stats,
+                    "rpc_requests": self.rpc.requests,
+                    "view_cache_hits": cache["hits"],
+                    "view_cache_misses": cache["misses"],
+                },
+            )
+            if hasattr(self.rpc, "metrics"):
+                exposition += format_rpc_metrics(self.rpc.metrics())
+            return exposition
+
+
+def make_server(cache, host="0.0.0.0", port=DEFAULT_PORT):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+
+            try:
+                body = cache.scrape().encode()
+            except Exception as e:
+                self.send_error(503, explain=repr(e))
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), MetricsHandler)
+
+
+def main():
+    settings = monitor_settings()
+    exporter = settings.get("exporter", {})
+
+    cache = ScrapeCache(
+        connect(settings),
+        settings.get("strategies", []),
+        exporter.get("block_poll_interval", DEFAULT_BLOCK_POLL_INTERVAL),
+    )
+    server = make_server(cache, port=exporter.get("port", DEFAULT_PORT))
+
+    print(f"Serving metrics on port {server.server_address[1]}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
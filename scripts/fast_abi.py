@@ -0,0 +1,224 @@
+from functools import lru_cache
+
+from eth_utils import keccak, to_checksum_address
+
+# Precompiled calls for the views the monitors read on every strategy and
+# every block. Selectors are computed once, arguments are formatted straight
+# into hex and responses are sliced into plain ints or slotted records,
+# skipping the generic eth_abi codecs and brownie's ReturnValue objects.
+# Only static types are supported, anything else goes through the generic
+# path. See scripts/benchmarks/abi.py for the numbers
+
+HOT_VIEWS = {
+    "balanceOfDebt()",
+    "balanceOfMakerVault()",
+    "pricePerShare()",
+    "balanceOf(address)",
+    "strategies(address)",
+    "ilks(bytes32)",
+    "urns(bytes32,address)",
+    "urns(uint256)",
+    "tendTrigger(uint256)",
+}
+
+UINT_MAX = 2 ** 256
+
+
+class Record:
+    # Tuple-like return value with named fields: r.rate, r["rate"], r[1],
+    # unpacking and r.dict() all work, like brownie's ReturnValue
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        return getattr(self, self.__slots__[key])
+
+    def __iter__(self):
+        return (getattr(self, name) for name in self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __eq__(self, other):
+        if isinstance(other, dict):
+            return self.dict() == other
+        return tuple(self) == tuple(other)
+
+    def __repr__(self):
+        fields = ", ".join(f"{n}={getattr(self, n)!r}" for n in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def keys(self):
+        return self.__slots__
+
+    def dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class StrategyParams(Record):
+    __slots__ = (
+        "performanceFee",
+        "activation",
+        "debtRatio",
+        "minDebtPerHarvest",
+        "maxDebtPerHarvest",
+        "lastReport",
+        "totalDebt",
+        "totalGain",
+        "totalLoss",
+    )
+
+
+class VatIlk(Record):
+    __slots__ = ("Art", "rate", "spot", "line", "dust")
+
+
+class VatUrn(Record):
+    __slots__ = ("ink", "art")
+
+
+class SpotterIlk(Record):
+    __slots__ = ("pip", "mat")
+
+
+class JugIlk(Record):
+    __slots__ = ("duty", "rho")
+
+
+RECORDS = {r.__slots__: r for r in (StrategyParams, VatIlk, VatUrn, SpotterIlk, JugIlk)}
+
+
+def _encode_uint(value):
+    if not isinstance(value, int) or not 0 <= value < UINT_MAX:
+        raise ValueError(f"{value!r} is not a uint256")
+    return f"{value:064x}"
+
+
+def _encode_address(value):
+    value = str(value)
+    if len(value) != 42 or not value.startswith("0x"):
+        raise ValueError(f"{value!r} is not an address")
+    return "000000000000000000000000" + value[2:].lower()
+
+
+def _encode_bytes32(value):
+    if isinstance(value, str):
+        value = bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    if len(value) > 32:
+        raise ValueError(f"{value!r} is longer than 32 bytes")
+    return value.hex().ljust(64, "0")
+
+
+def _decode_uint(word):
+    return int(word, 16)
+
+
+def _decode_bool(word):
+    return int(word, 16) != 0
+
+
+@lru_cache(maxsize=4096)
+def _decode_address(word):
+    # The same few urns and oracles come back every block
+    return to_checksum_address("0x" + word[24:])
+
+
+def _decode_bytes32(word):
+    return bytes.fromhex(word)
+
+
+ENCODERS = {
+    "uint256": _encode_uint,
+    "address": _encode_address,
+    "bytes32": _encode_bytes32,
+}
+DECODERS = {
+    "uint256": _decode_uint,
+    "bool": _decode_bool,
+    "address": _decode_address,
+    "bytes32": _decode_bytes32,
+}
+
+
+class FastFunction:
+    # Same interface as scripts.bundle.Function for a precompiled view
+    __slots__ = (
+        "name",
+        "input_types",
+        "output_types",
+        "output_names",
+        "signature",
+        "selector",
+        "_prefix",
+        "_encoders",
+        "_decoders",
+        "_record",
+        "_size",
+    )
+
+    def __init__(self, abi, record=None):
+        self.name = abi["name"]
+        self.input_types = [i["type"] for i in abi["inputs"]]
+        self.output_types = [o["type"] for o in abi["outputs"]]
+        self.output_names = [o["name"] for o in abi["outputs"]]
+        self.signature = f"{self.name}({','.join(self.input_types)})"
+        self.selector = keccak(text=self.signature)[:4]
+
+        self._prefix = "0x" + self.selector.hex()
+        self._encoders = [ENCODERS[t] for t in self.input_types]
+        self._decoders = [DECODERS[t] for t in self.output_types]
+        self._record = record
+        self._size = 64 * len(self.output_types)
+
+    def encode_input(self, *args):
+        if len(args) != len(self._encoders):
+            raise TypeError(f"{self.signature} takes {len(self._encoders)} arguments")
+        return self._prefix + "".join(e(a) for e, a in zip(self._encoders, args))
+
+    def decode_output(self, data):
+        if isinstance(data, str):
+            data = data[2:] if data.startswith("0x") else data
+        else:
+            data = bytes(data).hex()
+        if len(data) < self._size:
+            raise ValueError(f"{self.signature} returned {len(data) // 2} bytes")
+
+        if self._record is None:
+            return self._decoders[0](data[:64])
+        return self._record(
+            *(d(data[i * 64 : i * 64 + 64]) for i, d in enumerate(self._decoders))
+        )
+
+
+_precompiled = {}
+
+
+def precompile(abi):
+    # FastFunction for a hot view, None for anything else
+    if abi.get("type", "function") != "function":
+        return None
+    inputs = tuple(i["type"] for i in abi["inputs"])
+    outputs = tuple((o["name"], o["type"]) for o in abi["outputs"])
+    key = (abi["name"], inputs, outputs)
+    if key in _precompiled:
+        return _precompiled[key]
+
+    fn = None
+    signature = f"{abi['name']}({','.join(inputs)})"
+    names = tuple(name for name, _ in outputs)
+    supported = all(t in ENCODERS for t in inputs) and all(
+        t in DECODERS for _, t in outputs
+    )
+    if signature in HOT_VIEWS and supported and outputs:
+        if len(outputs) == 1:
+            fn = FastFunction(abi)
+        elif names in RECORDS:
+            fn = FastFunction(abi, RECORDS[names])
+
+    _precompiled[key] = fn
+    return fn
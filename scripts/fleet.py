@@ -0,0 +1,40 @@
+import asyncio
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CONCURRENCY = 8
+
+
+async def _collect(strategy, collect, semaphore, executor):
+    async with semaphore:
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        result, error = None, None
+        try:
+            result = await loop.run_in_executor(executor, collect, strategy)
+        except Exception as e:
+            error = e
+
+        return {
+            "strategy": strategy,
+            "result": result,
+            "error": error,
+            "elapsed": time.perf_counter() - start,
+        }
+
+
+async def run_fleet(strategies, collect, concurrency=DEFAULT_CONCURRENCY):
+    # Runs `collect(strategy)` for every strategy with at most `concurrency`
+    # of them in flight. Results keep the order of `strategies`
+    semaphore = asyncio.Semaphore(concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return await asyncio.gather(
+            *[_collect(s, collect, semaphore, executor) for s in strategies]
+        )
+
+
+def monitor_fleet(strategies, collect, concurrency=DEFAULT_CONCURRENCY):
+    start = time.perf_counter()
+    results = asyncio.run(run_fleet(strategies, collect, concurrency))
+    return results, time.perf_counter() - start
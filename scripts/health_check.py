@@ -0,0 +1,165 @@
+from scripts.bundle import BundledContract
+from scripts.derived import Revert, derived_data, read_fleet
+from scripts.maker import WAD
+from scripts.rpc import RPCError
+
+# Predicts whether the next harvest() passes the health check. prepareReturn
+# is recomputed from the derived primitive reads (scripts/derived.py), then
+# the health check itself is asked with an eth_call made from the strategy,
+# as the common health check finds the strategy's limits and custom check
+# from msg.sender. Two batches for the whole fleet: reads, then checks.
+#
+# The yVault profit is valued at the oracle price rather than at the swap
+# price, and liquidatePosition is reduced to what can be freed at all (the
+# collateral left once the DAI on hand repays the debt), so losses from
+# slippage or from selling collateral are not seen
+
+HEALTH_CHECK = "0xDDCea799fF1699e98EDF118e0629A974Df7DF012"
+# Limits of the health check are in basis points
+MAX_BPS = 10_000
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+
+def prepare_return(
+    total_assets,
+    total_debt,
+    debt_outstanding,
+    want_balance,
+    collateral,
+    debt,
+    dai_available,
+    collateralization_ratio,
+    price,
+):
+    # Strategy.prepareReturn as (profit, loss, debt_payment). Amounts in
+    # want except `debt` and `dai_available` (DAI on hand and in the yVault)
+    profit = max(total_assets - total_debt, 0)
+    needed = debt_outstanding + profit
+
+    # _takeYVaultProfit sells the yVault value above the debt for want
+    want = want_balance + max(dai_available - debt, 0) * WAD // price
+    if want < needed:
+        # Collateral still backing the debt the DAI on hand cannot repay
+        locked = -(-max(debt - dai_available, 0) * collateralization_ratio // price)
+        want += max(min(needed - want, collateral - locked), 0)
+    freed = min(want, needed)
+    loss = needed - freed
+
+    if loss > profit:
+        return 0, loss - profit, min(debt_outstanding, freed)
+    return profit - loss, 0, min(debt_outstanding, freed)
+
+
+def _extra_calls(contracts):
+    s = contracts["strategy"]
+    health_check = BundledContract("IHealthCheck", HEALTH_CHECK)
+    return {
+        "debt_outstanding": (contracts["vault"], "debtOutstanding", s.address),
+        "do_health_check": (s, "doHealthCheck"),
+        "health_check": (s, "healthCheck"),
+        "profit_limit_ratio": (health_check, "profitLimitRatio"),
+        "loss_limit_ratio": (health_check, "lossLimitRatio"),
+        "limits": (health_check, "strategiesLimits", s.address),
+    }
+
+
+# The common health check may not be deployed, e.g. on other chains
+LIMIT_READS = ("profit_limit_ratio", "loss_limit_ratio", "limits")
+
+
+def _predict(read, block):
+    reads = read["reads"]
+    data = derived_data(read["contracts"], read["static"], block, read["cdp_id"], reads)
+    dai_available = (
+        reads["dai_balance"]
+        + reads["shares"]
+        * data["price_per_share"]
+        // 10 ** read["static"]["yvault_decimals"]
+    )
+    total_debt = reads["params"]["totalDebt"]
+    profit, loss, debt_payment = prepare_return(
+        data["estimated_total_assets"],
+        total_debt,
+        reads["debt_outstanding"],
+        reads["want_balance"],
+        data["collateral"],
+        data["debt"],
+        dai_available,
+        data["collateralization_ratio"],
+        data["want_price"],
+    )
+
+    profit_limit_ratio = reads["profit_limit_ratio"]
+    loss_limit_ratio = reads["loss_limit_ratio"]
+    limits = reads["limits"]
+    if not isinstance(limits, RPCError) and limits["exists"]:
+        profit_limit_ratio = limits["profitLimitRatio"]
+        loss_limit_ratio = limits["lossLimitRatio"]
+    known = not any(
+        isinstance(r, RPCError) for r in (profit_limit_ratio, loss_limit_ratio)
+    )
+    return {
+        "strategy": data["address"],
+        "block": block,
+        "error": None,
+        "profit": profit,
+        "loss": loss,
+        "debt_payment": debt_payment,
+        "debt_outstanding": reads["debt_outstanding"],
+        "total_debt": total_debt,
+        "health_check": reads["health_check"],
+        "do_health_check": reads["do_health_check"],
+        # Default limits, a custom check may use others
+        "profit_limit": total_debt * profit_limit_ratio // MAX_BPS if known else None,
+        "loss_limit": total_debt * loss_limit_ratio // MAX_BPS if known else None,
+        "passes": True,
+    }
+
+
+def predict_health_checks(rpc, strategies, block=None):
+    # {strategy: prediction} for the next harvest of every strategy at
+    # `block`. "passes" is what the health check answers for the predicted
+    # profit and loss, True when the strategy skips the check and None with
+    # the "error" when the strategy could not be read or priced
+    if block is None:
+        block = rpc.block_number()
+    fleet = read_fleet(rpc, strategies, block, _extra_calls, LIMIT_READS)
+
+    predictions, checks = {}, []
+    for s, read in fleet.items():
+        try:
+            if isinstance(read, RPCError):
+                raise read
+            predictions[s] = _predict(read, block)
+        except (RPCError, Revert) as e:
+            predictions[s] = {"strategy": s, "block": block, "error": e, "passes": None}
+            continue
+        p = predictions[s]
+        if p["do_health_check"] and p["health_check"] != ZERO_ADDRESS:
+            checks.append(s)
+
+    if checks:
+        # harvest() passes the debt outstanding after the report, the one
+        # before is the closest known here
+        responses = rpc.call_many(
+            [
+                (
+                    BundledContract(
+                        "IHealthCheck", predictions[s]["health_check"], sender=s
+                    ),
+                    "check",
+                    predictions[s]["profit"],
+                    predictions[s]["loss"],
+                    predictions[s]["debt_payment"],
+                    predictions[s]["debt_outstanding"],
+                    predictions[s]["total_debt"],
+                )
+                for s in checks
+            ],
+            block,
+            raise_on_error=False,
+        )
+        for s, passes in zip(checks, responses):
+            # A check that reverts fails the harvest too
+            predictions[s]["passes"] = passes is True
+    return predictions
@@ -0,0 +1,382 @@
+import json
+import os
+
+from pathlib import Path
+
+from brownie import Strategy, accounts
+from eth_account import Account
+
+from scripts.base_fee import BaseFeeGate
+from scripts.bundle import BundledContract
+from scripts.health_check import predict_health_checks
+from scripts.preflight import preflight
+from scripts.profitability import evaluate as evaluate_harvests
+from scripts.profitability import load_columns, rank
+from scripts.rpc import RPCError
+from scripts.rpc_pool import connect
+from scripts.settings import PROJECT_ROOT, monitor_settings
+from scripts.tx_pipeline import PipelineSender, TxPipeline
+from scripts.watch import DEFAULT_POLL_INTERVAL, Watcher
+
+# Keeper daemon: follows new heads like scripts/watch.py, evaluates
+# harvestTrigger and tendTrigger only for the strategies a block may have
+# touched (and for every strategy every `full_refresh_blocks`, as
+# harvestTrigger also moves with time) and sends harvest() or tend().
+#
+#   brownie run keeper --network mainnet
+#
+# The account comes from KEEPER_PRIVATE_KEY or from the brownie account
+# named in `monitor.keeper.account`. Sent transactions are kept in a state
+# file until they have `confirmations` blocks on top, so a restart never
+# sends a second transaction for the same strategy and a transaction
+# dropped by a reorg is noticed and the strategy evaluated again
+
+DEFAULT_STATE = PROJECT_ROOT / "keeper.json"
+DEFAULT_CONFIRMATIONS = 3
+DEFAULT_FULL_REFRESH_BLOCKS = 25
+
+# harvest() also rebalances the cdp, so it goes first when both trigger
+ACTIONS = ("harvest", "tend")
+
+# Gas priced into the callCost passed to the triggers
+DEFAULT_GAS = {"harvest": 2_500_000, "tend": 1_500_000}
+
+
+class BrownieSender:
+    # Sends with a brownie account without waiting for the receipt
+    def __init__(self, account):
+        self.account = account
+        self.address = str(account)
+
+    def send(self, strategy, action):
+        tx = getattr(Strategy.at(strategy), action)(
+            {"from": self.account, "required_confs": 0}
+        )
+        return tx.txid
+
+    def send_many(self, actions):
+        # One after the other, see scripts/tx_pipeline.py to send them together
+        results = []
+        for strategy, action in actions:
+            try:
+                results.append(self.send(strategy, action))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def latest(self, tx_hash):
+        # Transactions are never replaced
+        return tx_hash
+
+    def poll(self):
+        pass
+
+
+class Keeper(Watcher):
+    def __init__(
+        self,
+        rpc,
+        strategies,
+        sender,
+        settings=None,
+        state_path=DEFAULT_STATE,
+        confirmations=DEFAULT_CONFIRMATIONS,
+        full_refresh_blocks=DEFAULT_FULL_REFRESH_BLOCKS,
+        actions=ACTIONS,
+        gas=None,
+        gate=None,
+        preflight=False,
+        health_check=False,
+        rank_harvests=False,
+    ):
+        super().__init__(
+            rpc, strategies, settings, full_refresh_blocks=full_refresh_blocks
+        )
+        self.sender = sender
+        self.state_path = Path(state_path)
+        self.confirmations = confirmations
+        self.actions = [a for a in ACTIONS if a in actions]
+        self.gas = {**DEFAULT_GAS, **(gas or {})}
+        # scripts.base_fee.BaseFeeGate, harvestTrigger is only called on
+        # blocks where the base fee gate is open
+        self.gate = gate
+        # Simulate actions with scripts/preflight.py and drop those that
+        # would revert
+        self.preflight = preflight
+        # Skip harvests scripts/health_check.py predicts to fail the check
+        self.health_check = health_check
+        # Send harvests by the net value scripts/profitability.py projects,
+        # the most valuable first, and defer those that would lose money
+        # unless their report is due
+        self.rank_harvests = rank_harvests
+
+        self.stats.update(
+            {
+                "sent": 0,
+                "confirmed": 0,
+                "reverted": 0,
+                "dropped": 0,
+                "send_errors": 0,
+                "gated": 0,
+                "preflight_reverts": 0,
+                "health_check_failures": 0,
+                "unprofitable": 0,
+            }
+        )
+        self.chain_id = int(self.rpc.request("eth_chainId"), 16)
+        # strategy -> {"action", "hash", "block"} of the transaction in flight
+        self.pending = self._load_state()
+        self._recheck = set()
+        # Harvests deferred for their net value
+        self._unprofitable = set()
+
+    def _load_state(self):
+        if not self.state_path.exists():
+            return {}
+        state = json.loads(self.state_path.read_text())
+        if state.get("chain_id") != self.chain_id:
+            return {}
+        return {s: tx for s, tx in state["pending"].items() if s in self.strategies}
+
+    def _save_state(self):
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps({"chain_id": self.chain_id, "pending": self.pending}, indent=2)
+        )
+        os.replace(tmp, self.state_path)
+
+    def _header(self, header):
+        if self.gate is not None and header.get("baseFeePerGas") is not None:
+            self.gate.add(header)
+
+    def _refresh_all(self, header):
+        if self.gate is not None:
+            self.gate.load(self.rpc, self.strategies, int(header["number"], 16))
+        super()._refresh_all(header)
+
+    def _refresh(self, strategies, block, timestamp):
+        self.evaluate(strategies, block)
+
+    def evaluate(self, strategies, block):
+        # Checks the triggers of `strategies` at `block` and sends the first
+        # action that fires. Strategies with a transaction in flight wait
+        strategies = [s for s in strategies if s not in self.pending]
+        if not strategies:
+            return {}
+
+        closed = set()
+        if self.gate is not None and "harvest" in self.actions:
+            # tendTrigger is still called, its repay side is not gated
+            waiting = set(self.gate.waiting)
+            closed = set(self.gate.split(strategies)[1])
+            # Harvests deferred, not re-checks of one already waiting
+            self.stats["gated"] += len(closed - waiting)
+        checks = [
+            (s, a)
+            for s in strategies
+            for a in self.actions
+            if not (a == "harvest" and s in closed)
+        ]
+        if not checks:
+            return {}
+
+        gas_price = int(self.rpc.request("eth_gasPrice"), 16)
+        calls = [
+            (BundledContract("Strategy", s), f"{a}Trigger", self.gas[a] * gas_price)
+            for s, a in checks
+        ]
+        results = self.rpc.call_many(calls, block, raise_on_error=False)
+        self.stats["refreshes"] += len(strategies)
+
+        triggered = {}
+        for (s, a), r in zip(checks, results):
+            # A trigger that errors counts as not triggered
+            if r is True and s not in triggered:
+                triggered[s] = a
+        triggered = self._preflight(list(triggered.items()), block)
+        return self._send(self._rank(triggered, block, gas_price), block)
+
+    def _preflight(self, triggered, block):
+        if self.health_check:
+            triggered = self._check_health(triggered, block)
+        if not self.preflight or not triggered:
+            return triggered
+        keepers = {s: self.sender.address for s, _ in triggered}
+        passed = set()
+        for action in self.actions:
+            strategies = [s for s, a in triggered if a == action]
+            if not strategies:
+                continue
+            outcomes = preflight(self.rpc, strategies, action, block, keepers)
+            for s in strategies:
+                if outcomes[s]["ok"]:
+                    passed.add(s)
+                else:
+                    self.stats["preflight_reverts"] += 1
+                    print(f"{action}() on {s} would revert: {outcomes[s]['reason']}")
+        return [(s, a) for s, a in triggered if s in passed]
+
+    def _check_health(self, triggered, block):
+        harvests = [s for s, a in triggered if a == "harvest"]
+        if not harvests:
+            return triggered
+        predictions = predict_health_checks(self.rpc, harvests, block)
+        # Harvests that could not be predicted are left to the preflight
+        failing = {s for s in harvests if predictions[s]["passes"] is False}
+        for s in failing:
+            self.stats["health_check_failures"] += 1
+            p = predictions[s]
+            print(
+                f"harvest() on {s} would fail the health check:"
+                f" profit {p['profit']}, loss {p['loss']}"
+            )
+        return [(s, a) for s, a in triggered if s not in failing]
+
+    def _rank(self, triggered, block, gas_price):
+        harvests = [s for s, a in triggered if a == "harvest"]
+        if not self.rank_harvests or not harvests:
+            return triggered
+        columns, errors = load_columns(self.rpc, harvests, block)
+        evaluated = evaluate_harvests(columns, gas_price, self.gas["harvest"])
+        # Evaluated again on the next refresh, as the profit accrues. A due
+        # report is sent anyway, it may never show a profit
+        losing = set()
+        for s, net, gas_cost, due in zip(
+            evaluated["strategy"],
+            evaluated["net"],
+            evaluated["gas_cost"],
+            columns["due"],
+        ):
+            if net > 0 or due:
+                continue
+            losing.add(s)
+            # Counted once per deferral, not on every re-evaluation
+            if s not in self._unprofitable:
+                self.stats["unprofitable"] += 1
+                print(f"harvest() on {s} deferred: net {net} after gas {gas_cost}")
+        self._unprofitable = (self._unprofitable - set(harvests)) | losing
+        ranked = [s for s in rank(evaluated) if s not in losing]
+        # Harvests that could not be valued go last
+        return [(s, "harvest") for s in ranked + list(errors)] + [
+            (s, a) for s, a in triggered if a != "harvest"
+        ]
+
+    def _send(self, triggered, block):
+        # Every action of the block goes to the sender at once
+        if not triggered:
+            return {}
+        sent = {}
+        for (s, action), tx_hash in zip(triggered, self.sender.send_many(triggered)):
+            if isinstance(tx_hash, Exception):
+                # e.g. the gas estimate reverts because the state moved on
+                self.stats["send_errors"] += 1
+                print(f"{action}() on {s} failed: {tx_hash!r}")
+                sent[s] = None
+                continue
+            self.stats["sent"] += 1
+            self.pending[s] = {"action": action, "hash": tx_hash, "block": block}
+            print(f"{action}() on {s} sent in {tx_hash}")
+            sent[s] = tx_hash
+        self._save_state()
+        return sent
+
+    def check_pending(self):
+        # Settles transactions with enough confirmations and forgets those
+        # the node no longer knows about. Their strategies are evaluated
+        # again, as their inputs changed or their action did not happen
+        if not self.pending or self.head is None:
+            return
+        head = int(self.head["number"], 16)
+        for tx in self.pending.values():
+            # Follow fee bump replacements
+            tx["hash"] = self.sender.latest(tx["hash"])
+        hashes = [tx["hash"] for tx in self.pending.values()]
+        receipts = self.rpc.batch(
+            [("eth_getTransactionReceipt", [h]) for h in hashes], raise_on_error=False
+        )
+
+        settled = []
+        for (s, tx), receipt in zip(list(self.pending.items()), receipts):
+            if isinstance(receipt, RPCError):
+                continue
+            if receipt is None:
+                # Not mined, or mined in a block that was reorged out
+                if self.rpc.request("eth_getTransactionByHash", [tx["hash"]]) is None:
+                    self.stats["dropped"] += 1
+                    settled.append(s)
+                continue
+            if head - int(receipt["blockNumber"], 16) + 1 < self.confirmations:
+                continue
+            if int(receipt["status"], 16) == 1:
+                self.stats["confirmed"] += 1
+            else:
+                self.stats["reverted"] += 1
+                print(f"{tx['action']}() on {s} reverted in {tx['hash']}")
+            settled.append(s)
+
+        for s in settled:
+            del self.pending[s]
+            self._recheck.add(s)
+        if settled:
+            self._save_state()
+
+    def poll(self):
+        refreshed = super().poll()
+        self.sender.poll()
+        self.check_pending()
+        if self.gate is not None:
+            # Gates that opened since the strategy was last evaluated
+            self._recheck.update(self.gate.opened())
+        if self._recheck and self.head is not None:
+            recheck, self._recheck = self._recheck, set()
+            self.evaluate(sorted(recheck), int(self.head["number"], 16))
+            refreshed |= recheck
+        return refreshed
+
+    def _tick(self):
+        self.poll()
+
+
+def keeper_account(settings):
+    if os.getenv("KEEPER_PRIVATE_KEY"):
+        return accounts.add(os.getenv("KEEPER_PRIVATE_KEY"))
+    return accounts.load(settings["account"])
+
+
+def keeper_sender(rpc, account, settings):
+    pipeline = settings.get("pipeline", {})
+    if not pipeline.get("enabled"):
+        return BrownieSender(account)
+    return PipelineSender(
+        TxPipeline(
+            rpc,
+            Account.from_key(account.private_key),
+            **{k: v for k, v in pipeline.items() if k != "enabled"},
+        )
+    )
+
+
+def main():
+    settings = monitor_settings()
+    keeper = settings.get("keeper", {})
+
+    account = keeper_account(keeper)
+    print(f"Keeping {len(settings.get('strategies', []))} strategies as {account}")
+    rpc = connect(settings)
+    Keeper(
+        rpc,
+        settings.get("strategies", []),
+        keeper_sender(rpc, account, keeper),
+        settings,
+        state_path=keeper.get("state", DEFAULT_STATE),
+        confirmations=keeper.get("confirmations", DEFAULT_CONFIRMATIONS),
+        full_refresh_blocks=keeper.get(
+            "full_refresh_blocks", DEFAULT_FULL_REFRESH_BLOCKS
+        ),
+        actions=keeper.get("actions", ACTIONS),
+        gas=keeper.get("gas"),
+        gate=BaseFeeGate() if keeper.get("base_fee_gate") else None,
+        preflight=keeper.get("preflight", False),
+        health_check=keeper.get("health_check", False),
+        rank_harvests=keeper.get("rank_harvests", False),
+    ).run(keeper.get("poll_interval", DEFAULT_POLL_INTERVAL))
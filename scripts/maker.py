@@ -0,0 +1,13 @@
+# Mainnet addresses of the Maker contracts used by MakerDaiDelegateLib
+VAT = "0x35D1b3F3D7966A1DFe207aa4514C12a259A0492B"
+MANAGER = "0x5ef30b9986345249bc32d8928B7ee64DE9435E39"
+SPOTTER = "0x65C79fcB50Ca1594B025960e539eD7A9a6D434A3"
+JUG = "0x19c0976f590D67707E62397C87829d896Dc0f1F1"
+DAI = "0x6B175474E89094C44Da98b954EedeAC495271d0F"
+
+# Deployed MakerDaiDelegateLib used by the production strategies
+MAKER_DAI_DELEGATE_LIB = "0xf728c1645739b1d4367A94232d7473016Df908E7"
+
+# Units used in Maker contracts
+WAD = 10 ** 18
+RAY = 10 ** 27
@@ -1,73 +1,161 @@
-from brownie import Contract
+from brownie import Contract, config, web3
 
-import os
-import requests
+import threading
 
-telegram_bot_key = os.getenv("TELEGRAM_BOT_KEY")
+from scripts.alerts import publish_reports
+from scripts.cache import shared_cache
+from scripts.fleet import DEFAULT_CONCURRENCY, monitor_fleet
+from scripts.maker import MAKER_DAI_DELEGATE_LIB
+from scripts.multicall import aggregate
+from scripts.profiler import profile_web3
+from scripts.report import format_report
+
+# want, vault, yVault, ilk and name do not change between blocks so we only
+# resolve them once per strategy
+_strategy_contracts = {}
+_strategy_contracts_lock = threading.Lock()
 
 
 def main():
-    eth_c = print_monitoring_info_for_strategy(
-        "0xd33535e9F2E09485aC9cE8b27F865251161065E0"
-    )
-    send_msg("\n".join(eth_c))
+    profile_web3(web3)
+    settings = config.get("monitor", {})
+    strategies = settings.get("strategies", [])
+    concurrency = settings.get("concurrency", DEFAULT_CONCURRENCY)
+
+    # All the strategies are read at the same block
+    block = web3.eth.block_number
 
-    yfi_a = print_monitoring_info_for_strategy(
-        "0x19b2c8b3C601E9690ee524B02d4aCA058Db8B0D7"
+    results, elapsed = monitor_fleet(
+        strategies, lambda s: collect_strategy_data(s, block), concurrency
     )
-    send_msg("\n".join(yfi_a))
+    publish_reports(results, web3.eth.get_block(block).timestamp, settings)
 
+    print(f"Monitored {len(strategies)} strategies at block {block} in {elapsed:.2f}s")
 
-def print_monitoring_info_for_strategy(s):
-    output = ["```"]
 
-    s = Contract(s)
-    want = Contract(s.want())
-    vault = Contract(s.vault())
-    yvault = Contract(s.yVault())
-    maker_dai_delegate = Contract("0xf728c1645739b1d4367A94232d7473016Df908E7")
+def print_monitoring_info_for_strategy(s, block=None):
+    return format_report(collect_strategy_data(s, block))
 
-    output.append(f"{s.name()} {s}")
 
-    shares = yvault.balanceOf(s)
-    value = shares * yvault.pricePerShare() / 1e18
-    debt = s.balanceOfDebt()
-
-    output.append(
-        f"Balance of CDP #{s.cdpId()}: {s.balanceOfMakerVault()/1e18:.2f} {want.symbol()}"
-    )
-    output.append(f"Debt: {debt/1e18:.2f} DAI")
-    output.append(f"Value of investment: {value/1e18:.2f} DAI")
+def load_strategy_contracts(s, block=None):
+    s = str(s)
+    if s in _strategy_contracts:
+        return _strategy_contracts[s]
 
-    if value >= debt:
-        output.append(f"Current profit: {(value - debt)/1e18:.2f} DAI")
-    else:
-        output.append(f"Current loss: {(debt - value)/1e18:.2f} DAI")
+    # brownie's contract registry is not thread safe
+    with _strategy_contracts_lock:
+        strategy = Contract(s)
 
-    output.append(
-        f"{want.symbol()} price (spotter): {maker_dai_delegate.getSpotPrice(s.ilk())/1e18:.2f}"
+    want, vault, yvault, ilk, name = aggregate(
+        [
+            (strategy.want,),
+            (strategy.vault,),
+            (strategy.yVault,),
+            (strategy.ilk,),
+            (strategy.name,),
+        ],
+        block,
     )
-    output.append(f"Target c-ratio: {s.collateralizationRatio()/1e18:.2f}")
-    output.append(f"Current c-ratio: {s.getCurrentMakerVaultRatio()/1e18:.2f}")
-    output.append(
-        f"Liquidation ratio: {maker_dai_delegate.getLiquidationRatio(s.ilk())/1e27:.2f}"
-    )
-    output.append(f"Debt ratio: {vault.strategies(s).dict()['debtRatio']/100:.2f}%")
-
-    if s.tendTrigger(1):
-        output.append(
-            f"Strategy is outside the tolerance band and should be rebalanced. Call tend()!"
-        )
-    else:
-        output.append(f"Everything looks OK")
-
-    output.append("```")
-    return output
 
-
-def send_msg(text):
-    payload = {"chat_id": "-1001580241915", "text": text, "parse_mode": "MarkdownV2"}
-    r = requests.get(
-        "https://api.telegram.org/bot" + telegram_bot_key + "/sendMessage",
-        params=payload,
+    with _strategy_contracts_lock:
+        _strategy_contracts[s] = {
+            "strategy": strategy,
+            "want": Contract(want),
+            "vault": Contract(vault),
+            "yvault": Contract(yvault),
+            "maker_dai_delegate": Contract(MAKER_DAI_DELEGATE_LIB),
+            "ilk": ilk,
+            "name": name,
+        }
+    return _strategy_contracts[s]
+
+
+def collect_strategy_data(s, block=None):
+    # Every view is read through one multicall pinned to the same block so
+    # all the values in the report are consistent with each other
+    if block is None:
+        block = web3.eth.block_number
+
+    contracts = load_strategy_contracts(s, block)
+    s = contracts["strategy"]
+    yvault = contracts["yvault"]
+    maker_dai_delegate = contracts["maker_dai_delegate"]
+    ilk = contracts["ilk"]
+
+    (
+        want_symbol,
+        cdp_id,
+        collateral,
+        debt,
+        shares,
+        price_per_share,
+        spot_price,
+        collateralization_ratio,
+        current_ratio,
+        liquidation_ratio,
+        params,
+        tend_trigger,
+    ) = aggregate(
+        [
+            (contracts["want"].symbol,),
+            (s.cdpId,),
+            (s.balanceOfMakerVault,),
+            (s.balanceOfDebt,),
+            (yvault.balanceOf, s),
+            (yvault.pricePerShare,),
+            (maker_dai_delegate.getSpotPrice, ilk),
+            (s.collateralizationRatio,),
+            (s.getCurrentMakerVaultRatio,),
+            (maker_dai_delegate.getLiquidationRatio, ilk),
+            (contracts["vault"].strategies, s),
+            (s.tendTrigger, 1),
+        ],
+        block,
+        cache=shared_cache(),
     )
+
+    return {
+        "block": block,
+        "name": contracts["name"],
+        "address": s.address,
+        "want_symbol": want_symbol,
+        "cdp_id": cdp_id,
+        "collateral": collateral,
+        "debt": debt,
+        "shares": shares,
+        "price_per_share": price_per_share,
+        "spot_price": spot_price,
+        "collateralization_ratio": collateralization_ratio,
+        "current_ratio": current_ratio,
+        "liquidation_ratio": liquidation_ratio,
+        "debt_ratio": params.dict()["debtRatio"],
+        "tend_trigger": tend_trigger,
+    }
+
+
+def collect_strategy_data_serial(s):
+    # One eth_call per view. Kept as the reference implementation for the
+    # multicall read path (see scripts/benchmarks/monitor.py)
+    s = Contract(s)
+    want = Contract(s.want())
+    vault = Contract(s.vault())
+    yvault = Contract(s.yVault())
+    maker_dai_delegate = Contract(MAKER_DAI_DELEGATE_LIB)
+
+    return {
+        "block": None,
+        "name": s.name(),
+        "address": s.address,
+        "want_symbol": want.symbol(),
+        "cdp_id": s.cdpId(),
+        "collateral": s.balanceOfMakerVault(),
+        "debt": s.balanceOfDebt(),
+        "shares": yvault.balanceOf(s),
+        "price_per_share": yvault.pricePerShare(),
+        "spot_price": maker_dai_delegate.getSpotPrice(s.ilk()),
+        "collateralization_ratio": s.collateralizationRatio(),
+        "current_ratio": s.getCurrentMakerVaultRatio(),
+        "liquidation_ratio": maker_dai_delegate.getLiquidationRatio(s.ilk()),
+        "debt_ratio": vault.strategies(s).dict()["debtRatio"],
+        "tend_trigger": s.tendTrigger(1),
+    }
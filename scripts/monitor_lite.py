@@ -0,0 +1,143 @@
+import threading
+
+from scripts.alerts import publish_reports
+from scripts.bundle import BundledContract
+from scripts.cache import shared_cache
+from scripts.fleet import DEFAULT_CONCURRENCY, monitor_fleet
+from scripts.maker import MAKER_DAI_DELEGATE_LIB
+from scripts.rpc_pool import connect
+from scripts.settings import monitor_settings
+
+# Lightweight monitor: bundled ABIs and plain JSON-RPC, no brownie project,
+# no explorer requests. Run it with `python -m scripts.monitor_lite`
+
+_strategy_contracts = {}
+_strategy_contracts_lock = threading.Lock()
+
+
+def main():
+    settings = monitor_settings()
+    strategies = settings.get("strategies", [])
+    concurrency = settings.get("concurrency", DEFAULT_CONCURRENCY)
+
+    collect = collect_strategy_data
+    if settings.get("derive_locally", False):
+        from scripts.derived import collect_derived_data as collect
+
+    rpc = connect(settings)
+    block = rpc.block_number()
+
+    results, elapsed = monitor_fleet(
+        strategies, lambda s: collect(rpc, s, block), concurrency
+    )
+    publish_reports(results, rpc.block_timestamp(block), settings)
+
+    print(
+        f"Monitored {len(strategies)} strategies at block {block} in {elapsed:.2f}s "
+        f"with {rpc.requests} requests"
+    )
+
+
+def load_strategy_contracts(rpc, s, block=None):
+    s = str(s)
+    if s in _strategy_contracts:
+        return _strategy_contracts[s]
+
+    strategy = BundledContract("Strategy", s)
+    want, vault, yvault, ilk, name = rpc.call_many(
+        [
+            (strategy, "want"),
+            (strategy, "vault"),
+            (strategy, "yVault"),
+            (strategy, "ilk"),
+            (strategy, "name"),
+        ],
+        block,
+    )
+
+    with _strategy_contracts_lock:
+        _strategy_contracts[s] = {
+            "strategy": strategy,
+            "want": BundledContract("ERC20", want),
+            "vault": BundledContract("IVault", vault),
+            "yvault": BundledContract("IVault", yvault),
+            "maker_dai_delegate": BundledContract(
+                "MakerDaiDelegateLib", MAKER_DAI_DELEGATE_LIB
+            ),
+            "ilk": ilk,
+            "name": name,
+        }
+    return _strategy_contracts[s]
+
+
+def strategy_calls(contracts):
+    # The (contract, fn_name, *args) calls behind the values of a report
+    s = contracts["strategy"]
+    yvault = contracts["yvault"]
+    maker_dai_delegate = contracts["maker_dai_delegate"]
+    ilk = contracts["ilk"]
+
+    return [
+        (contracts["want"], "symbol"),
+        (s, "cdpId"),
+        (s, "balanceOfMakerVault"),
+        (s, "balanceOfDebt"),
+        (yvault, "balanceOf", s.address),
+        (yvault, "pricePerShare"),
+        (maker_dai_delegate, "getSpotPrice", ilk),
+        (s, "collateralizationRatio"),
+        (s, "getCurrentMakerVaultRatio"),
+        (maker_dai_delegate, "getLiquidationRatio", ilk),
+        (contracts["vault"], "strategies", s.address),
+        (s, "tendTrigger", 1),
+    ]
+
+
+def strategy_data(contracts, block, results):
+    (
+        want_symbol,
+        cdp_id,
+        collateral,
+        debt,
+        shares,
+        price_per_share,
+        spot_price,
+        collateralization_ratio,
+        current_ratio,
+        liquidation_ratio,
+        params,
+        tend_trigger,
+    ) = results
+
+    return {
+        "block": block,
+        "name": contracts["name"],
+        "address": contracts["strategy"].address,
+        "want_symbol": want_symbol,
+        "cdp_id": cdp_id,
+        "collateral": collateral,
+        "debt": debt,
+        "shares": shares,
+        "price_per_share": price_per_share,
+        "spot_price": spot_price,
+        "collateralization_ratio": collateralization_ratio,
+        "current_ratio": current_ratio,
+        "liquidation_ratio": liquidation_ratio,
+        "debt_ratio": params["debtRatio"],
+        "tend_trigger": tend_trigger,
+    }
+
+
+def collect_strategy_data(rpc, s, block=None):
+    # Same values as scripts.monitor.collect_strategy_data, read with one
+    # JSON-RPC batch pinned to `block`
+    if block is None:
+        block = rpc.block_number()
+
+    contracts = load_strategy_contracts(rpc, s, block)
+    results = rpc.call_many(strategy_calls(contracts), block, cache=shared_cache())
+    return strategy_data(contracts, block, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+from brownie import Contract
+
+from scripts.fast_abi import precompile
+from scripts.rpc import MULTICALL2
+
+MULTICALL2_ABI = [
+    {
+        "inputs": [
+            {"internalType": "bool", "name": "requireSuccess", "type": "bool"},
+            {
+                "components": [
+                    {"internalType": "address", "name": "target", "type": "address"},
+                    {"internalType": "bytes", "name": "callData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall2.Call[]",
+                "name": "calls",
+                "type": "tuple[]",
+            },
+        ],
+        "name": "tryBlockAndAggregate",
+        "outputs": [
+            {"internalType": "uint256", "name": "blockNumber", "type": "uint256"},
+            {"internalType": "bytes32", "name": "blockHash", "type": "bytes32"},
+            {
+                "components": [
+                    {"internalType": "bool", "name": "success", "type": "bool"},
+                    {"internalType": "bytes", "name": "returnData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall2.Result[]",
+                "name": "returnData",
+                "type": "tuple[]",
+            },
+        ],
+        "stateMutability": "nonpayable",
+        "type": "function",
+    }
+]
+
+_multicall = None
+
+
+def multicall():
+    global _multicall
+    if _multicall is None:
+        _multicall = Contract.from_abi("Multicall2", MULTICALL2, MULTICALL2_ABI)
+    return _multicall
+
+
+def aggregate(calls, block_identifier=None, cache=None):
+    # Executes every (ContractCall, *args) in `calls` with a single eth_call
+    # pinned to `block_identifier` and returns the decoded results in order.
+    # With a BlockCache only the calls missing from it are aggregated. Hot
+    # views are encoded and decoded by their precompiled FastFunction
+    functions = [precompile(call.abi) or call for call, *_ in calls]
+    encoded = [
+        (call._address, fn.encode_input(*args))
+        for fn, (call, *args) in zip(functions, calls)
+    ]
+
+    decoded = [None] * len(calls)
+    missing = []
+    for i, (address, calldata) in enumerate(encoded):
+        hit = False
+        if cache is not None and isinstance(block_identifier, int):
+            hit, decoded[i] = cache.get(block_identifier, address, calldata)
+        if not hit:
+            missing.append(i)
+
+    if not missing:
+        return decoded
+
+    block, _, results = multicall().tryBlockAndAggregate.call(
+        False, [encoded[i] for i in missing], block_identifier=block_identifier
+    )
+
+    for i, (success, data) in zip(missing, results):
+        call, *args = calls[i]
+        if not success:
+            raise ValueError(f"{call._name}{tuple(args)} reverted at block {block}")
+        decoded[i] = functions[i].decode_output(data)
+        if cache is not None:
+            cache.put(block, *encoded[i], decoded[i])
+
+    return decoded
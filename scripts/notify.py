@@ -0,0 +1,191 @@
+import atexit
+import os
+import queue
+import threading
+import time
+
+import requests
+
+from requests.adapters import HTTPAdapter
+
+telegram_bot_key = os.getenv("TELEGRAM_BOT_KEY")
+
+TELEGRAM_API = "https://api.telegram.org"
+CHAT_ID = "-1001580241915"
+
+# Telegram rejects messages longer than 4096 characters
+MAX_MESSAGE_LENGTH = 4096
+
+CODE_FENCE = "```"
+
+
+def _split_report(text, limit):
+    # Splits on line boundaries. Code blocks cut in half are closed and
+    # reopened so every chunk is valid MarkdownV2 on its own
+    chunks = []
+    lines = []
+    in_code = False
+
+    # Leave room to close and reopen a code block around the longest line
+    room = limit - 2 * (len(CODE_FENCE) + 1)
+
+    for line in text.split("\n"):
+        for piece in [line[i : i + room] for i in range(0, len(line), room)] or [""]:
+            is_fence = piece.strip() == CODE_FENCE
+            closing = [CODE_FENCE] if in_code and not is_fence else []
+            if lines and len("\n".join(lines + [piece] + closing)) > limit:
+                chunks.append("\n".join(lines + ([CODE_FENCE] if in_code else [])))
+                lines = [CODE_FENCE] if in_code else []
+
+            lines.append(piece)
+            if is_fence:
+                in_code = not in_code
+
+    if lines:
+        chunks.append("\n".join(lines))
+    return chunks
+
+
+def split_messages(texts, limit=MAX_MESSAGE_LENGTH):
+    # Packs as many reports as possible in each message without going over
+    # the size limit. Reports that do not fit in one message are split
+    messages = []
+    for text in texts:
+        for chunk in _split_report(text, limit) if len(text) > limit else [text]:
+            if messages and len(messages[-1]) + 1 + len(chunk) <= limit:
+                messages[-1] += "\n" + chunk
+            else:
+                messages.append(chunk)
+    return messages
+
+
+class TelegramNotifier:
+    # Delivers messages from a background thread so slow or failing sends
+    # never block data collection. One pooled session is reused for every
+    # request, sends are spaced by `min_interval` seconds and 429/5xx
+    # responses are retried with backoff
+    def __init__(
+        self,
+        bot_key,
+        chat_id=CHAT_ID,
+        api=TELEGRAM_API,
+        min_interval=1.0,
+        max_retries=5,
+        backoff=1.0,
+        timeout=10,
+        linger=0.5,
+    ):
+        self.url = f"{api}/bot{bot_key}/sendMessage"
+        self.chat_id = chat_id
+        self.min_interval = min_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.linger = linger
+
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+
+        self.sent = 0
+        self.failed = 0
+        self._last_send = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def send(self, text):
+        self._queue.put(text)
+
+    def flush(self):
+        # Blocks until every queued message has been delivered or dropped
+        self._queue.join()
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        self.session.close()
+
+    def _worker(self):
+        while True:
+            texts = [self._queue.get()]
+            if texts[0] is None:
+                self._queue.task_done()
+                return
+
+            # Give other reports of the same run a chance to be coalesced
+            time.sleep(self.linger)
+            while True:
+                try:
+                    texts.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in texts
+            for message in split_messages([t for t in texts if t is not None]):
+                if self._deliver(message):
+                    self.sent += 1
+                else:
+                    self.failed += 1
+
+            for _ in texts:
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _deliver(self, text):
+        payload = {"chat_id": self.chat_id, "text": text, "parse_mode": "MarkdownV2"}
+
+        for attempt in range(self.max_retries):
+            wait = self._last_send + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_send = time.monotonic()
+
+            delay = self.backoff * 2 ** attempt
+            try:
+                r = self.session.post(self.url, json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                print(f"Telegram request failed: {e!r}")
+            else:
+                if r.ok:
+                    return True
+                if r.status_code == 429:
+                    # Telegram tells us how long to wait before retrying
+                    try:
+                        delay = r.json()["parameters"]["retry_after"]
+                    except (ValueError, KeyError):
+                        pass
+                elif r.status_code < 500:
+                    print(f"Telegram rejected message: {r.status_code} {r.text}")
+                    return False
+
+            if attempt + 1 < self.max_retries:
+                time.sleep(delay)
+
+        print(f"Giving up on message after {self.max_retries} attempts")
+        return False
+
+
+_notifier = None
+
+
+def default_notifier():
+    global _notifier
+    if _notifier is None:
+        _notifier = TelegramNotifier(telegram_bot_key)
+        atexit.register(_notifier.close)
+    return _notifier
+
+
+def send_msg(text):
+    if telegram_bot_key is None:
+        print(text)
+        return
+    default_notifier().send(text)
+
+
+def flush():
+    if _notifier is not None:
+        _notifier.flush()
@@ -0,0 +1,336 @@
+import json
+import re
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from eth_utils import to_checksum_address
+
+from scripts.bundle import BundledContract, decode
+from scripts.cache import shared_cache
+from scripts.fleet import DEFAULT_CONCURRENCY
+from scripts.rpc import RPCError, block_tag
+from scripts.settings import PROJECT_ROOT
+
+# Preflight of harvest() and tend(): each strategy's action is simulated in
+# an eth_call that places contracts/Preflight.sol at the keeper's address
+# with a state override. The strategy sees the keeper as msg.sender, and
+# the same call returns the gas used, the gain and loss reported to the
+# vault and the debt, collateral and ratio left, or the revert data.
+# Strategies are sent in concurrent batches, through RpcPool.map_batches
+# with several endpoints, so a whole fleet is checked in a few round trips
+# and a keeper never pays for a transaction that reverts.
+#
+# Revert data is decoded as Error(string) or Panic(uint256). Most requires
+# here revert with no data and a "// dev:" comment, those are found with
+# debug_traceCall when the node has it: the pc of the revert is looked up
+# in the pcMap of the brownie build artifacts. Without a node that traces,
+# fork_preflight() runs the actions on a brownie fork snapshot instead
+
+BUILD_PATH = PROJECT_ROOT / "build" / "contracts"
+DEFAULT_BATCH_SIZE = 50
+# Enough for any harvest, the simulation is not charged
+SIMULATION_GAS = 30_000_000
+
+ERROR_SELECTOR = "08c379a0"
+PANIC_SELECTOR = "4e487b71"
+CALL_OPS = {"CALL", "CALLCODE", "DELEGATECALL", "STATICCALL"}
+
+OUTCOME_FIELDS = (
+    "gas_used",
+    "profit",
+    "loss",
+    "total_debt",
+    "debt",
+    "collateral",
+    "ratio",
+)
+
+_code = None
+_artifacts = None
+# address -> artifact name, or None for code without artifact
+_code_owners = {}
+_lock = threading.Lock()
+# Whether the node implements debug_traceCall, None until asked
+_can_trace = {}
+
+
+def preflight_code():
+    global _code
+    if _code is None:
+        path = BUILD_PATH / "Preflight.json"
+        if not path.exists():
+            raise FileNotFoundError(f"{path} is missing, run `brownie compile`")
+        _code = "0x" + json.loads(path.read_text())["deployedBytecode"]
+    return _code
+
+
+def decode_revert(data):
+    # Reason of Error(string) and Panic(uint256) revert data, None when
+    # there is no data
+    data = data[2:] if data.startswith("0x") else data
+    if not data:
+        return None
+    if data.startswith(ERROR_SELECTOR):
+        return decode(["string"], bytes.fromhex(data[8:]))[0]
+    if data.startswith(PANIC_SELECTOR):
+        return f"Panic({int(data[8:72], 16):#x})"
+    return "0x" + data
+
+
+def _load_artifacts():
+    # name -> (regex matching the deployed code, pcMap with dev comments)
+    global _artifacts
+    with _lock:
+        if _artifacts is None:
+            _artifacts = {}
+            for path in sorted(BUILD_PATH.glob("*.json")):
+                artifact = json.loads(path.read_text())
+                code = artifact.get("deployedBytecode")
+                if not code or not artifact.get("pcMap"):
+                    continue
+                dev = {
+                    int(pc): entry["dev"]
+                    for pc, entry in artifact["pcMap"].items()
+                    if entry.get("dev")
+                }
+                # Library addresses are linked in at deployment
+                pattern = re.sub(r"__.{38}", "[0-9a-f]{40}", code.lower())
+                _artifacts[path.stem] = (re.compile(pattern), dev)
+        return _artifacts
+
+
+def _owner(rpc, address, block):
+    if address not in _code_owners:
+        code = rpc.request("eth_getCode", [address, block_tag(block)])[2:].lower()
+        _code_owners[address] = next(
+            (
+                name
+                for name, (pattern, _) in _load_artifacts().items()
+                if pattern.fullmatch(code)
+            ),
+            None,
+        )
+    return _code_owners[address]
+
+
+def _revert_chain(logs):
+    # (code address, pc) of the revert that ended the simulated action and
+    # of the reverts it bubbled up from, outermost first. Depth 1 is the
+    # Preflight code itself
+    frames = []
+    addresses = []
+    for i, log in enumerate(logs):
+        depth = log["depth"]
+        del frames[depth - 1 :]
+        addresses.append(frames[depth - 2] if 1 < depth <= len(frames) + 1 else None)
+        if (
+            log["op"] in CALL_OPS
+            and i + 1 < len(logs)
+            and logs[i + 1]["depth"] == depth + 1
+        ):
+            frames.append(to_checksum_address(f"0x{int(log['stack'][-2], 16):040x}"))
+
+    reverts = [i for i, log in enumerate(logs) if log["op"] == "REVERT"]
+    reverts = [i for i in reverts if logs[i]["depth"] > 1]
+    if not reverts:
+        return []
+    chain = [reverts[-1]]
+    while True:
+        # A revert that copies the return data of a child frame that just
+        # reverted is bubbling it up, a caught revert is not copied
+        i = chain[-1]
+        depth = logs[i]["depth"]
+        j = i - 1
+        copied = False
+        while j >= 0 and logs[j]["depth"] == depth and logs[j]["op"] not in CALL_OPS:
+            copied = copied or logs[j]["op"] == "RETURNDATACOPY"
+            j -= 1
+        if not copied or j < 0 or logs[j]["depth"] != depth + 1:
+            break
+        if logs[j]["op"] != "REVERT":
+            break
+        chain.append(j)
+    return [(addresses[i], logs[i]["pc"]) for i in chain]
+
+
+def dev_reason(rpc, tx, block, overrides):
+    # "dev: ..." comment of the require that reverted, from a trace of the
+    # same call. None when the node cannot trace or nothing matches
+    if _can_trace.get(rpc.endpoint) is False:
+        return None
+    try:
+        trace = rpc.request(
+            "debug_traceCall",
+            [
+                tx,
+                block_tag(block),
+                {
+                    "stateOverrides": overrides,
+                    "disableStorage": True,
+                    "enableMemory": False,
+                },
+            ],
+        )
+    except RPCError as e:
+        if e.code == -32601 or "method" in e.message.lower():
+            _can_trace[rpc.endpoint] = False
+        return None
+    _can_trace[rpc.endpoint] = True
+
+    # The outer reverts only bubble up, the innermost comment explains it
+    for address, pc in reversed(_revert_chain(trace["structLogs"])):
+        name = address and _owner(rpc, address, block)
+        if name and pc in _load_artifacts()[name][1]:
+            return _load_artifacts()[name][1][pc]
+    return None
+
+
+def _outcome(strategy, action, block, result, reason=None):
+    outcome = {
+        "strategy": strategy,
+        "action": action,
+        "block": block,
+        "ok": False,
+        "reason": reason,
+        **{f: None for f in OUTCOME_FIELDS},
+    }
+    if result is not None:
+        outcome["ok"] = result["success"]
+        outcome.update(zip(OUTCOME_FIELDS, result["values"]))
+    return outcome
+
+
+def _simulations(jobs, action, block):
+    # The eth_call simulating `action` for every (strategy, keeper) job
+    code = preflight_code()
+    calls = []
+    for strategy, keeper in jobs:
+        tx = BundledContract("Preflight", keeper).encode(
+            "simulate",
+            strategy,
+            bytes.fromhex(
+                BundledContract("Strategy", strategy).encode(action)["data"][2:]
+            ),
+        )
+        tx["gas"] = hex(SIMULATION_GAS)
+        calls.append(("eth_call", [tx, block_tag(block), {keeper: {"code": code}}]))
+    return calls
+
+
+def _outcomes(rpc, jobs, calls, responses, action, block):
+    outcomes = []
+    for (strategy, keeper), (_, (tx, _, overrides)), response in zip(
+        jobs, calls, responses
+    ):
+        if isinstance(response, RPCError):
+            outcomes.append(_outcome(strategy, action, block, None, str(response)))
+            continue
+        result = BundledContract("Preflight", keeper).decode("simulate", response)
+        reason = None
+        if not result["success"]:
+            reason = decode_revert("0x" + result["revertData"].hex())
+            if reason is None:
+                reason = dev_reason(rpc, tx, block, overrides) or "reverted"
+        outcomes.append(_outcome(strategy, action, block, result, reason))
+    return outcomes
+
+
+def _simulate(rpc, jobs, action, block):
+    calls = _simulations(jobs, action, block)
+    responses = rpc.batch(calls, raise_on_error=False)
+    return _outcomes(rpc, jobs, calls, responses, action, block)
+
+
+def preflight(
+    rpc,
+    strategies,
+    action,
+    block=None,
+    keepers=None,
+    concurrency=DEFAULT_CONCURRENCY,
+    batch_size=DEFAULT_BATCH_SIZE,
+):
+    # {strategy: outcome} of `action` ("harvest" or "tend") on every strategy
+    # at `block`. Sent by each strategy's keeper unless `keepers` maps
+    # strategies to another authorized address
+    if block is None:
+        block = rpc.block_number()
+    strategies = [to_checksum_address(s) for s in strategies]
+    keepers = dict(keepers or {})
+    missing = [s for s in strategies if s not in keepers]
+    if missing:
+        results = rpc.call_many(
+            [(BundledContract("Strategy", s), "keeper") for s in missing],
+            block,
+            cache=shared_cache(),
+        )
+        keepers.update(zip(missing, results))
+
+    jobs = [(s, to_checksum_address(keepers[s])) for s in strategies]
+    chunks = [jobs[i : i + batch_size] for i in range(0, len(jobs), batch_size)]
+    if hasattr(rpc, "map_batches"):
+        # An RpcPool sends the batches as its AIMD limiter allows
+        calls = [_simulations(c, action, block) for c in chunks]
+        responses = rpc.map_batches(calls, raise_on_error=False)
+        return {
+            o["strategy"]: o
+            for c, chunk_calls, r in zip(chunks, calls, responses)
+            for o in _outcomes(rpc, c, chunk_calls, r, action, block)
+        }
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = executor.map(lambda c: _simulate(rpc, c, action, block), chunks)
+        return {o["strategy"]: o for outcomes in results for o in outcomes}
+
+
+def _state(rpc, strategy, block):
+    vault = BundledContract("IVault", rpc.call_many([(strategy, "vault")], block)[0])
+    params, debt, collateral, ratio = rpc.call_many(
+        [
+            (vault, "strategies", strategy.address),
+            (strategy, "balanceOfDebt"),
+            (strategy, "balanceOfMakerVault"),
+            (strategy, "getCurrentMakerVaultRatio"),
+        ],
+        block,
+        raise_on_error=False,
+    )
+    return params, debt, collateral, 0 if isinstance(ratio, RPCError) else ratio
+
+
+def fork_preflight(rpc, strategies, action, sender):
+    # Same outcomes from a brownie fork: each action is sent from `sender`
+    # and the chain reverted after, brownie resolving the dev revert
+    # comments from its own traces. One strategy at a time
+    from brownie import Strategy, chain
+
+    outcomes = {}
+    block = rpc.block_number()
+    for s in [to_checksum_address(s) for s in strategies]:
+        strategy = BundledContract("Strategy", s)
+        before = _state(rpc, strategy, block)[0]
+        chain.snapshot()
+        try:
+            tx = getattr(Strategy.at(s), action)(
+                {"from": sender, "gas_limit": SIMULATION_GAS, "allow_revert": True}
+            )
+            if tx.status == 1:
+                after, debt, collateral, ratio = _state(rpc, strategy, tx.block_number)
+                values = [
+                    tx.gas_used,
+                    after["totalGain"] - before["totalGain"],
+                    after["totalLoss"] - before["totalLoss"],
+                    after["totalDebt"],
+                    debt,
+                    collateral,
+                    ratio,
+                ]
+                result = {"success": True, "values": values}
+                outcomes[s] = _outcome(s, action, block, result)
+            else:
+                result = {"success": False, "values": [tx.gas_used] + [0] * 6}
+                reason = tx.revert_msg or "reverted"
+                outcomes[s] = _outcome(s, action, block, result, reason)
+        finally:
+            chain.revert()
+    return outcomes
@@ -0,0 +1,165 @@
+from bisect import bisect_left, bisect_right
+
+from scripts.bundle import BundledContract
+from scripts.cache import shared_cache
+from scripts.derived import spot_price, want_price
+from scripts.maker import RAY, SPOTTER, WAD
+from scripts.vat_reader import read_positions, resolve_urns
+
+# Critical prices of every strategy, sorted per ilk, so a price tick finds
+# the strategies whose tendTrigger flips with two bisections and without
+# reading any of them. The price is the pessimistic one the strategy uses,
+# min(getSpotPrice, _getWantTokenPrice), shared by every strategy of an ilk.
+# With ink and debt fixed getCurrentMakerVaultRatio only moves with it:
+#
+#   repay        tendTrigger fires below it (ratio < cr - tolerance)
+#   mint         the ratio is above cr + tolerance from it on; tendTrigger
+#                then also needs debt, an acceptable base fee and DAI to mint
+#   liquidation  the ratio is under the liquidation ratio below it
+#
+# Entries are refreshed from the Vat when a strategy's urn changes
+
+KINDS = ("repay", "mint", "liquidation")
+
+
+def _ceil_div(a, b):
+    return -(-a // b)
+
+
+def min_price_for_ratio(ink, debt, ratio):
+    # Lowest price with ink * price // WAD * WAD // debt >= ratio, the
+    # getPessimisticRatioOfCdpWithExternalPrice rounding
+    debt = debt or 1
+    return _ceil_div(_ceil_div(ratio * debt, WAD) * WAD, ink)
+
+
+def critical_prices(
+    ink, debt, collateralization_ratio, rebalance_tolerance, liquidation_ratio
+):
+    # {kind: price}, liquidation_ratio in ray as returned by the spotter
+    return {
+        "repay": min_price_for_ratio(
+            ink, debt, collateralization_ratio - rebalance_tolerance
+        ),
+        "mint": min_price_for_ratio(
+            ink, debt, collateralization_ratio + rebalance_tolerance + 1
+        ),
+        "liquidation": min_price_for_ratio(ink, debt, liquidation_ratio * WAD // RAY),
+    }
+
+
+def pessimistic_price(spot, mat, current, future, par):
+    # The price getCurrentMakerVaultRatio values collateral at, from the
+    # Vat spot, the spotter mat and par and the (price, valid) OSM reads
+    spot = spot_price(spot, mat)
+    return min(spot, want_price(spot, current, future, par))
+
+
+class PriceIndex:
+    def __init__(self):
+        # (ilk, kind) -> sorted critical prices and their strategies
+        self._prices = {}
+        self._strategies = {}
+        # strategy -> (ilk, {kind: price})
+        self.entries = {}
+        # ilk -> last price seen by tick()
+        self.prices = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def update(
+        self,
+        strategy,
+        ilk,
+        ink,
+        debt,
+        collateralization_ratio,
+        rebalance_tolerance,
+        liquidation_ratio,
+    ):
+        self.remove(strategy)
+        if ink == 0:
+            # Nothing locked, tendTrigger is false at any price
+            return
+
+        levels = critical_prices(
+            ink, debt, collateralization_ratio, rebalance_tolerance, liquidation_ratio
+        )
+        for kind, price in levels.items():
+            prices = self._prices.setdefault((ilk, kind), [])
+            i = bisect_right(prices, price)
+            prices.insert(i, price)
+            self._strategies.setdefault((ilk, kind), []).insert(i, strategy)
+        self.entries[strategy] = (ilk, levels)
+
+    def remove(self, strategy):
+        if strategy not in self.entries:
+            return
+        ilk, levels = self.entries.pop(strategy)
+        for kind, price in levels.items():
+            prices = self._prices[ilk, kind]
+            strategies = self._strategies[ilk, kind]
+            first = bisect_left(prices, price)
+            i = first + strategies[first : bisect_right(prices, price)].index(strategy)
+            del prices[i]
+            del strategies[i]
+
+    def _range(self, ilk, kind, low, high):
+        # Strategies with a critical price in (low, high]
+        prices = self._prices.get((ilk, kind), [])
+        strategies = self._strategies.get((ilk, kind), [])
+        return strategies[bisect_right(prices, low) : bisect_right(prices, high)]
+
+    def triggered(self, ilk, price):
+        # {kind: strategies} on the triggering side of each level at `price`
+        inf = float("inf")
+        return {
+            "repay": self._range(ilk, "repay", price, inf),
+            "mint": self._range(ilk, "mint", -1, price),
+            "liquidation": self._range(ilk, "liquidation", price, inf),
+        }
+
+    def crossed(self, ilk, old_price, new_price):
+        # {kind: strategies} whose side of a level changed between two ticks
+        low, high = sorted((old_price, new_price))
+        return {kind: self._range(ilk, kind, low, high) for kind in KINDS}
+
+    def tick(self, ilk, price):
+        # Strategies affected by an OSM or spot update of `ilk`, relative to
+        # the previous tick. The first tick of an ilk returns its triggered sides
+        old = self.prices.get(ilk)
+        self.prices[ilk] = price
+        if old is None:
+            return self.triggered(ilk, price)
+        return self.crossed(ilk, old, price)
+
+    def refresh(self, rpc, strategies, block=None):
+        # Reads the urns and settings of `strategies` and updates their
+        # entries, e.g. after the watcher saw their urn move
+        if block is None:
+            block = rpc.block_number()
+        resolved = resolve_urns(rpc, strategies, block)
+        positions = read_positions(rpc, list(resolved), block)
+        ilks = sorted({ilk for _, ilk, _ in resolved.values()})
+
+        spotter = BundledContract("Spotter", SPOTTER)
+        calls = [(spotter, "ilks", ilk) for ilk in ilks]
+        for s in resolved:
+            strategy = BundledContract("Strategy", s)
+            calls.append((strategy, "collateralizationRatio"))
+            calls.append((strategy, "rebalanceTolerance"))
+        results = rpc.call_many(calls, block, cache=shared_cache())
+
+        mats = {ilk: r["mat"] for ilk, r in zip(ilks, results)}
+        results = results[len(ilks) :]
+        for i, (s, (_, ilk, _)) in enumerate(resolved.items()):
+            self.update(
+                s,
+                ilk,
+                positions[s]["collateral"],
+                positions[s]["debt"],
+                results[2 * i],
+                results[2 * i + 1],
+                mats[ilk],
+            )
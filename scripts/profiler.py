@@ -0,0 +1,265 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+from bisect import bisect_left
+
+from eth_utils import to_checksum_address
+
+from scripts.bundle import Function, decode, load_bundle
+from scripts.maker import DAI, JUG, MAKER_DAI_DELEGATE_LIB, MANAGER, SPOTTER, VAT
+
+# Attributes every JSON-RPC request to a method, a contract and a function
+# and prints a summary at exit. Enable it with RPC_PROFILE=1, or with
+# RPC_PROFILE=<path>.json to also write the summary as JSON. It covers
+# JsonRpc (lite scripts), brownie's web3 (monitor, deploy) and the tests
+
+# Histogram bucket upper bounds in seconds, from 0.5ms doubling up to ~16s
+BUCKETS = [0.0005 * 2 ** i for i in range(16)]
+
+KNOWN_CONTRACTS = {
+    VAT: "Vat",
+    SPOTTER: "Spotter",
+    MANAGER: "DssCdpManager",
+    JUG: "Jug",
+    DAI: "DAI",
+    MAKER_DAI_DELEGATE_LIB: "MakerDaiDelegateLib",
+    "0x5BA1e12693Dc8F9c48aAD8770482f4739bEeD696": "Multicall2",
+}
+
+MULTICALL_SELECTORS = {
+    "0x399542e9": ("tryBlockAndAggregate", ["bool", "(address,bytes)[]"]),
+    "0xbce38bd7": ("tryAggregate", ["bool", "(address,bytes)[]"]),
+    "0x252dba42": ("aggregate", ["(address,bytes)[]"]),
+}
+
+# Methods whose first parameter is a transaction or an address
+TX_METHODS = {"eth_call", "eth_estimateGas", "eth_sendTransaction"}
+ADDRESS_METHODS = {"eth_getBalance", "eth_getCode", "eth_getStorageAt"}
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS + [self.max], self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(bound, self.max)
+        return self.max
+
+
+class Profiler:
+    def __init__(self):
+        self.selectors = {}
+        self.contracts = dict(KNOWN_CONTRACTS)
+        self.stats = {}
+        self.requests = 0
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+        for name, abi in load_bundle().items():
+            self.add_abi(name, abi)
+        for selector, (name, _) in MULTICALL_SELECTORS.items():
+            self.selectors[selector] = {name: {"Multicall2"}}
+
+    def add_abi(self, name, abi):
+        for entry in abi:
+            if entry.get("type") == "function":
+                fn = Function(entry)
+                owners = self.selectors.setdefault("0x" + fn.selector.hex(), {})
+                owners.setdefault(fn.name, set()).add(name)
+
+    def register(self, address, name):
+        self.contracts[to_checksum_address(address)] = name
+
+    def _label(self, to, data):
+        selector = (data or "")[:10]
+        functions = self.selectors.get(selector, {})
+        function = "/".join(sorted(functions)) or selector or "-"
+
+        if not to:
+            return "-", function
+        to = to_checksum_address(to)
+        if to in self.contracts:
+            return self.contracts[to], function
+        owners = {n for names in functions.values() for n in names}
+        return "|".join(sorted(owners)) or to, function
+
+    def _attribute(self, method, params):
+        # [(method, contract, function)] for one JSON-RPC call
+        params = list(params or [])
+        if method in TX_METHODS and params and isinstance(params[0], dict):
+            tx = params[0]
+            data = tx.get("data") or tx.get("input") or ""
+            if isinstance(data, bytes):
+                data = "0x" + data.hex()
+            keys = [(method,) + self._label(tx.get("to"), data)]
+            return keys + self._multicall(method, tx.get("to"), data)
+        if method in ADDRESS_METHODS and params:
+            return [(method, self._label(params[0], "")[0], "-")]
+        if method == "eth_getLogs" and params and isinstance(params[0], dict):
+            address = params[0].get("address")
+            addresses = address if isinstance(address, list) else [address]
+            return [
+                (method, self._label(a, "")[0] if a else "-", "-") for a in addresses
+            ]
+        return [(method, "-", "-")]
+
+    def _multicall(self, method, to, data):
+        # Inner calls of a Multicall2 aggregate, to see the calls it hides
+        if data[:10] not in MULTICALL_SELECTORS:
+            return []
+        _, types = MULTICALL_SELECTORS[data[:10]]
+        try:
+            calls = decode(types, bytes.fromhex(data[10:]))[-1]
+        except Exception:
+            return []
+        return [
+            (f"{method} (multicall)",) + self._label(target, "0x" + calldata.hex())
+            for target, calldata in calls
+        ]
+
+    def record(self, payload, latency, error=False):
+        # `payload` is a JSON-RPC request or a batch of them. Every call in
+        # a batch is charged the latency of the whole batch
+        calls = payload if isinstance(payload, list) else [payload]
+        keys = [
+            key
+            for call in calls
+            for key in self._attribute(call.get("method"), call.get("params"))
+        ]
+        with self._lock:
+            self.requests += 1
+            for key in keys:
+                stats = self.stats.setdefault(
+                    key, {"errors": 0, "latency": Histogram()}
+                )
+                stats["latency"].observe(latency)
+                stats["errors"] += error
+
+    def summary(self):
+        with self._lock:
+            rows = [
+                {
+                    "method": method,
+                    "contract": contract,
+                    "function": function,
+                    "count": s["latency"].count,
+                    "errors": s["errors"],
+                    "total": s["latency"].total,
+                    "p50": s["latency"].quantile(0.5),
+                    "p90": s["latency"].quantile(0.9),
+                    "p99": s["latency"].quantile(0.99),
+                    "max": s["latency"].max,
+                    "buckets": dict(zip(BUCKETS + ["inf"], s["latency"].counts)),
+                }
+                for (method, contract, function), s in self.stats.items()
+            ]
+        return {
+            "requests": self.requests,
+            "elapsed": time.time() - self.started,
+            "calls": sorted(rows, key=lambda r: (-r["count"], -r["total"])),
+        }
+
+    def format_summary(self, limit=40):
+        summary = self.summary()
+        calls = summary["calls"]
+        lines = [
+            f"RPC profile: {summary['requests']} requests, "
+            f"{sum(r['count'] for r in calls)} calls in {summary['elapsed']:.1f}s",
+            f"{'count':>7} {'errors':>6} {'p50 ms':>8} {'p99 ms':>8} "
+            f"{'total s':>8}  method contract.function",
+        ]
+        for r in calls[:limit]:
+            lines.append(
+                f"{r['count']:>7} {r['errors']:>6} {r['p50'] * 1000:>8.1f} "
+                f"{r['p99'] * 1000:>8.1f} {r['total']:>8.2f}  "
+                f"{r['method']} {r['contract']}.{r['function']}"
+            )
+        if len(calls) > limit:
+            lines.append(f"... {len(calls) - limit} more")
+        return "\n".join(lines)
+
+    def report(self, path=None):
+        print(self.format_summary())
+        if path:
+            with open(path, "w") as f:
+                json.dump(self.summary(), f, indent=2)
+
+    def middleware(self, make_request, w3):
+        # web3 middleware, see install()
+        def middleware(method, params):
+            start = time.perf_counter()
+            try:
+                response = make_request(method, params)
+            except Exception:
+                self.record(
+                    {"method": method, "params": params},
+                    time.perf_counter() - start,
+                    True,
+                )
+                raise
+            self.record(
+                {"method": method, "params": params},
+                time.perf_counter() - start,
+                "error" in response,
+            )
+            return response
+
+        return middleware
+
+    def install(self, w3):
+        # Innermost layer, so requests answered by brownie's caches are not
+        # counted as node requests
+        if "rpc_profiler" not in w3.middleware_onion:
+            w3.middleware_onion.inject(self.middleware, "rpc_profiler", layer=0)
+        try:
+            from brownie import project
+        except ImportError:
+            return
+        for p in project.get_loaded_projects():
+            for name, container in p.dict().items():
+                self.add_abi(name, container.abi)
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def active_profiler():
+    # The process wide profiler when RPC_PROFILE is set, otherwise None
+    global _profiler
+    setting = os.getenv("RPC_PROFILE", "")
+    if setting.lower() in ("", "0", "false", "no"):
+        return None
+
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = Profiler()
+            path = setting if setting.endswith(".json") else None
+            atexit.register(_profiler.report, path)
+    return _profiler
+
+
+def profile_web3(w3):
+    # Profiles a web3 instance (e.g. brownie's) when RPC_PROFILE is set
+    profiler = active_profiler()
+    if profiler is not None:
+        profiler.install(w3)
+    return profiler
@@ -0,0 +1,218 @@
+from scripts.bundle import BundledContract
+from scripts.derived import Revert, derived_data, read_fleet
+from scripts.maker import JUG, RAY, WAD
+from scripts.rpc import RPCError
+from scripts.rpc_pool import connect
+from scripts.settings import monitor_settings
+
+# Net value of harvesting every strategy of a fleet, to rank harvests
+# instead of relying on the generic callCost heuristics of harvestTrigger:
+#
+#   - the yvDAI profit _takeYVaultProfit would realize, the value of the
+#     yVault shares above the debt, in want at the oracle price
+#   - the stability fee drag, the fees accrued since the last jug.drip of
+#     the ilk that are not in the vat rate yet. Dripped fees are already in
+#     the debt the profit is measured against
+#   - the gas of the harvest, converted with the strategy's ethToWant
+#
+# "due" marks the harvests harvestTrigger fires for whatever the profit: the
+# report is overdue, the vault wants debt back (a lower debtRatio or an
+# emergency exit) or there is a loss to report
+#
+# State is loaded once per block into columns, one list per field, and
+# evaluate() goes over the whole fleet in one pass. The fee accrual is
+# computed once per ilk. Amounts are uint256 and rad products, so the math
+# stays on exact Python ints
+
+DEFAULT_HARVEST_GAS = 2_500_000
+# Seconds between the state read and the harvest landing
+DEFAULT_DELAY = 12
+
+COLUMNS = (
+    "strategy",
+    "ilk",
+    "timestamp",
+    "want_price",
+    "art",
+    "rate",
+    "debt",
+    "investment_value",
+    "duty",
+    "rho",
+    "base",
+    "eth_to_want",
+    "due",
+)
+
+
+def rpow(x, n, base=RAY):
+    # dss rpow: x ** n in `base` precision, rounding half up at every step
+    if x == 0:
+        return base if n == 0 else 0
+    z = x if n % 2 else base
+    half = base // 2
+    n //= 2
+    while n:
+        x = (x * x + half) // base
+        if n % 2:
+            z = (z * x + half) // base
+        n //= 2
+    return z
+
+
+def accrued_rate(rate, duty, base, rho, timestamp):
+    # Rate of the ilk after jug.drip at `timestamp`
+    if timestamp <= rho:
+        return rate
+    return rpow(base + duty, timestamp - rho) * rate // RAY
+
+
+def report_due(
+    timestamp, last_report, max_report_delay, debt_outstanding, loss, emergency_exit
+):
+    # The harvestTrigger conditions that do not depend on the profit
+    return (
+        timestamp - last_report >= max_report_delay
+        or debt_outstanding > 0
+        or loss > 0
+        or emergency_exit
+    )
+
+
+def _extra_calls(contracts):
+    s = contracts["strategy"]
+    jug = BundledContract("Jug", JUG)
+    return {
+        "jug_ilk": (jug, "ilks", contracts["ilk"]),
+        "jug_base": (jug, "base"),
+        # want per ETH, ethToWant is linear in the amount
+        "eth_to_want": (s, "ethToWant", WAD),
+        "max_report_delay": (s, "maxReportDelay"),
+        "emergency_exit": (s, "emergencyExit"),
+        "debt_outstanding": (contracts["vault"], "debtOutstanding", s.address),
+    }
+
+
+def _row(read, block, timestamp):
+    reads = read["reads"]
+    data = derived_data(read["contracts"], read["static"], block, read["cdp_id"], reads)
+    params = reads["params"]
+    return {
+        "strategy": data["address"],
+        "ilk": read["contracts"]["ilk"],
+        "timestamp": timestamp,
+        "want_price": data["want_price"],
+        "art": reads["vat_urn"]["art"],
+        "rate": reads["vat_ilk"]["rate"],
+        "debt": data["debt"],
+        # _valueOfInvestment
+        "investment_value": data["shares"]
+        * data["price_per_share"]
+        // 10 ** read["static"]["yvault_decimals"],
+        "duty": reads["jug_ilk"]["duty"],
+        "rho": reads["jug_ilk"]["rho"],
+        "base": reads["jug_base"],
+        "eth_to_want": reads["eth_to_want"],
+        "due": report_due(
+            timestamp,
+            params["lastReport"],
+            reads["max_report_delay"],
+            reads["debt_outstanding"],
+            max(params["totalDebt"] - data["estimated_total_assets"], 0),
+            reads["emergency_exit"],
+        ),
+    }
+
+
+def load_columns(rpc, strategies, block=None):
+    # (columns, errors): the fleet state at `block` for evaluate(), in one
+    # batch of reads, and {strategy: error} of the strategies that could not
+    # be read or priced, which are left out of the columns. Shared reads
+    # (vat, spotter, jug, yVault) come from the block cache
+    if block is None:
+        block = rpc.block_number()
+    fleet = read_fleet(rpc, strategies, block, _extra_calls)
+    timestamp = rpc.block_timestamp(block)
+
+    columns = {c: [] for c in COLUMNS}
+    errors = {}
+    for s, read in fleet.items():
+        try:
+            if isinstance(read, RPCError):
+                raise read
+            row = _row(read, block, timestamp)
+        except (RPCError, Revert) as e:
+            errors[s] = e
+            continue
+        for c in COLUMNS:
+            columns[c].append(row[c])
+    return columns, errors
+
+
+def evaluate(columns, gas_price, gas=DEFAULT_HARVEST_GAS, delay=DEFAULT_DELAY):
+    # Columns of the projected profit, fee drag, gas cost and net value of a
+    # harvest, in want. `gas` is the gas of a harvest, one value or a column
+    n = len(columns["strategy"])
+    gas = gas if isinstance(gas, (list, tuple)) else [gas] * n
+
+    rates = {}
+    for ilk, rate, duty, base, rho, timestamp in zip(
+        columns["ilk"],
+        columns["rate"],
+        columns["duty"],
+        columns["base"],
+        columns["rho"],
+        columns["timestamp"],
+    ):
+        if ilk not in rates:
+            rates[ilk] = accrued_rate(rate, duty, base, rho, timestamp + delay)
+    accrued = [rates[ilk] for ilk in columns["ilk"]]
+
+    price = columns["want_price"]
+    profit = [
+        max(value - debt, 0) * WAD // p
+        for value, debt, p in zip(columns["investment_value"], columns["debt"], price)
+    ]
+    # rad to wad, in want
+    drag = [
+        art * (new - rate) // RAY * WAD // p
+        for art, new, rate, p in zip(columns["art"], accrued, columns["rate"], price)
+    ]
+    gas_cost = [g * gas_price * e // WAD for g, e in zip(gas, columns["eth_to_want"])]
+    return {
+        "strategy": list(columns["strategy"]),
+        "profit": profit,
+        "fee_drag": drag,
+        "gas_cost": gas_cost,
+        "net": [p - d - g for p, d, g in zip(profit, drag, gas_cost)],
+    }
+
+
+def rank(evaluated):
+    # Strategies by net value of their harvest, the most valuable first
+    order = sorted(
+        range(len(evaluated["strategy"])),
+        key=lambda i: evaluated["net"][i],
+        reverse=True,
+    )
+    return [evaluated["strategy"][i] for i in order]
+
+
+def main():
+    settings = monitor_settings()
+    rpc = connect(settings)
+    block = rpc.block_number()
+    gas = settings.get("keeper", {}).get("gas", {}).get("harvest", DEFAULT_HARVEST_GAS)
+    columns, errors = load_columns(rpc, settings.get("strategies", []), block)
+    evaluated = evaluate(columns, int(rpc.request("eth_gasPrice"), 16), gas)
+    rows = {s: i for i, s in enumerate(evaluated["strategy"])}
+    print(f"Harvest net value at block {block}, in want")
+    for s in rank(evaluated):
+        i = rows[s]
+        print(
+            f"{s}: net {evaluated['net'][i]} = profit {evaluated['profit'][i]}"
+            f" - fee drag {evaluated['fee_drag'][i]} - gas {evaluated['gas_cost'][i]}"
+            + (", report due" if columns["due"][i] else "")
+        )
+    for s, error in errors.items():
+        print(f"{s}: not evaluated, {error}")
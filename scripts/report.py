@@ -0,0 +1,39 @@
+def format_report(data, alerts=()):
+    output = ["```"]
+
+    for alert in alerts:
+        output.append(f"ALERT: {alert}")
+
+    output.append(f"{data['name']} {data['address']}")
+
+    value = data["shares"] * data["price_per_share"] / 1e18
+    debt = data["debt"]
+
+    output.append(
+        f"Balance of CDP #{data['cdp_id']}: {data['collateral']/1e18:.2f} {data['want_symbol']}"
+    )
+    output.append(f"Debt: {debt/1e18:.2f} DAI")
+    output.append(f"Value of investment: {value/1e18:.2f} DAI")
+
+    if value >= debt:
+        output.append(f"Current profit: {(value - debt)/1e18:.2f} DAI")
+    else:
+        output.append(f"Current loss: {(debt - value)/1e18:.2f} DAI")
+
+    output.append(
+        f"{data['want_symbol']} price (spotter): {data['spot_price']/1e18:.2f}"
+    )
+    output.append(f"Target c-ratio: {data['collateralization_ratio']/1e18:.2f}")
+    output.append(f"Current c-ratio: {data['current_ratio']/1e18:.2f}")
+    output.append(f"Liquidation ratio: {data['liquidation_ratio']/1e27:.2f}")
+    output.append(f"Debt ratio: {data['debt_ratio']/100:.2f}%")
+
+    if data["tend_trigger"]:
+        output.append(
+            f"Strategy is outside the tolerance band and should be rebalanced. Call tend()!"
+        )
+    else:
+        output.append(f"Everything looks OK")
+
+    output.append("```")
+    return output
@@ -0,0 +1,232 @@
+import itertools
+import time
+
+import requests
+
+from scripts.bundle import BundledContract
+from scripts.profiler import active_profiler
+
+# Error codes nodes and providers use for "too many requests / too large"
+THROTTLE_CODES = {-32005, -32029, -32097, 429}
+
+# Multicall2 deployment on mainnet (also available on mainnet-fork)
+MULTICALL2 = "0x5BA1e12693Dc8F9c48aAD8770482f4739bEeD696"
+# Calls per tryAggregate, keeps each eth_call under the node's gas cap
+DEFAULT_AGGREGATE_SIZE = 100
+
+
+class RPCError(Exception):
+    def __init__(self, error):
+        self.code = error.get("code")
+        self.message = error.get("message", "")
+        self.data = error.get("data")
+        super().__init__(f"{self.code}: {self.message}")
+
+
+def block_tag(block):
+    if block is None:
+        return "latest"
+    if isinstance(block, int):
+        return hex(block)
+    return block
+
+
+class JsonRpc:
+    # Minimal JSON-RPC client over a pooled HTTP session. It does not load
+    # brownie or web3 so it is cheap to start
+    def __init__(self, endpoint, timeout=30):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.requests = 0
+        self.profiler = active_profiler()
+        self._ids = itertools.count(1)
+
+    def _payload(self, method, params):
+        return {
+            "jsonrpc": "2.0",
+            "id": next(self._ids),
+            "method": method,
+            "params": list(params),
+        }
+
+    def _post(self, payload):
+        self.requests += 1
+        if self.profiler is None:
+            return self._send(payload)
+
+        start = time.perf_counter()
+        try:
+            response = self._send(payload)
+        except Exception:
+            self.profiler.record(payload, time.perf_counter() - start, True)
+            raise
+        responses = response if isinstance(response, list) else [response]
+        self.profiler.record(
+            payload,
+            time.perf_counter() - start,
+            any(isinstance(r, dict) and "error" in r for r in responses),
+        )
+        return response
+
+    def _send(self, payload):
+        response = self.session.post(self.endpoint, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    def _result(response):
+        if "error" in response:
+            return RPCError(response["error"])
+        return response["result"]
+
+    def request(self, method, params=()):
+        result = self._result(self._post(self._payload(method, params)))
+        if isinstance(result, RPCError):
+            raise result
+        return result
+
+    def batch(self, calls, raise_on_error=True):
+        # Sends every (method, params) in `calls` in one HTTP request. Failed
+        # entries raise, or are returned as RPCError if raise_on_error is False
+        if not calls:
+            return []
+
+        payloads = [self._payload(method, params) for method, params in calls]
+        responses = self._post(payloads)
+        if isinstance(responses, dict):
+            # Some nodes answer a rejected batch with a single error object
+            raise RPCError(responses.get("error", {"message": str(responses)}))
+
+        by_id = {r.get("id"): r for r in responses}
+        results = []
+        for payload in payloads:
+            response = by_id.get(payload["id"])
+            if response is None:
+                response = {"error": {"code": -32603, "message": "missing response"}}
+            result = self._result(response)
+            if raise_on_error and isinstance(result, RPCError):
+                raise result
+            results.append(result)
+        return results
+
+    def block_number(self):
+        return int(self.request("eth_blockNumber"), 16)
+
+    def get_block(self, block=None, full_transactions=False):
+        return self.request(
+            "eth_getBlockByNumber", [block_tag(block), full_transactions]
+        )
+
+    def block_timestamp(self, block=None):
+        return int(self.get_block(block)["timestamp"], 16)
+
+    def call_many(self, calls, block=None, raise_on_error=True, cache=None):
+        # Executes every (contract, fn_name, *args) in `calls` as an eth_call
+        # pinned to `block` within a single batch and decodes the results.
+        # With a BlockCache only the calls missing from it are sent. Calls
+        # made from a given sender are never cached
+        tag = block_tag(block)
+        txs = [contract.encode(fn_name, *args) for contract, fn_name, *args in calls]
+        cached = [
+            cache is not None and isinstance(block, int) and "from" not in tx
+            for tx in txs
+        ]
+
+        results = [None] * len(calls)
+        missing = []
+        for i, tx in enumerate(txs):
+            hit = False
+            if cached[i]:
+                hit, results[i] = cache.get(block, tx["to"], tx["data"])
+            if not hit:
+                missing.append(i)
+
+        responses = self.batch(
+            [("eth_call", [txs[i], tag]) for i in missing], raise_on_error
+        )
+        for i, data in zip(missing, responses):
+            contract, fn_name, *_ = calls[i]
+            if not isinstance(data, RPCError):
+                data = contract.decode(fn_name, data)
+                if cached[i]:
+                    cache.put(block, txs[i]["to"], txs[i]["data"], data)
+            results[i] = data
+
+        return results
+
+    def aggregate(
+        self,
+        calls,
+        block=None,
+        raise_on_error=True,
+        cache=None,
+        size=DEFAULT_AGGREGATE_SIZE,
+    ):
+        # Same as call_many, but the calls missing from the cache are packed
+        # into Multicall2 tryAggregate eth_calls of up to `size` calls. Calls
+        # made from a given sender would be made by Multicall2 instead, so
+        # they are sent on their own in the same batch
+        tag = block_tag(block)
+        txs = [contract.encode(fn_name, *args) for contract, fn_name, *args in calls]
+        cached = [
+            cache is not None and isinstance(block, int) and "from" not in tx
+            for tx in txs
+        ]
+
+        results = [None] * len(calls)
+        packed, direct = [], []
+        for i, tx in enumerate(txs):
+            hit = False
+            if cached[i]:
+                hit, results[i] = cache.get(block, tx["to"], tx["data"])
+            if not hit:
+                (direct if "from" in tx else packed).append(i)
+
+        multicall = BundledContract("Multicall2", MULTICALL2)
+        chunks = [packed[i : i + size] for i in range(0, len(packed), size)]
+        aggregates = [
+            multicall.encode(
+                "tryAggregate",
+                False,
+                [(txs[i]["to"], bytes.fromhex(txs[i]["data"][2:])) for i in chunk],
+            )
+            for chunk in chunks
+        ]
+        responses = self.batch(
+            [("eth_call", [tx, tag]) for tx in aggregates]
+            + [("eth_call", [txs[i], tag]) for i in direct],
+            raise_on_error,
+        )
+
+        outputs = []
+        for chunk, response in zip(chunks, responses):
+            if isinstance(response, RPCError):
+                outputs += [(i, response) for i in chunk]
+                continue
+            for i, (success, data) in zip(
+                chunk, multicall.decode("tryAggregate", response)
+            ):
+                if not success:
+                    error = RPCError(
+                        {
+                            "code": 3,
+                            "message": "execution reverted",
+                            "data": "0x" + data.hex(),
+                        }
+                    )
+                    if raise_on_error:
+                        raise error
+                    data = error
+                outputs.append((i, data))
+        outputs += zip(direct, responses[len(chunks) :])
+
+        for i, data in outputs:
+            contract, fn_name, *_ = calls[i]
+            if not isinstance(data, RPCError):
+                data = contract.decode(fn_name, data)
+                if cached[i]:
+                    cache.put(block, txs[i]["to"], txs[i]["data"], data)
+            results[i] = data
+
+        return results
@@ -0,0 +1,268 @@
+import threading
+import time
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+import requests
+
+from requests.adapters import HTTPAdapter
+
+from scripts.rpc import THROTTLE_CODES, JsonRpc, RPCError
+from scripts.settings import rpc_endpoints
+
+# JSON-RPC client over several endpoints. Reads are hedged: when the best
+# endpoint has not answered after its p90 latency the same request goes to
+# the next one and the first answer wins. Bulk jobs go through map_batches,
+# which adapts its concurrency to the errors of the nodes (AIMD)
+
+# Hedge delay until an endpoint has enough samples for its own p90
+DEFAULT_HEDGE_DELAY = 0.25
+MIN_HEDGE_DELAY = 0.01
+MIN_SAMPLES = 20
+
+LATENCY_WINDOW = 1000
+QUANTILES = [0.5, 0.9, 0.99]
+
+# Endpoints failing this many times in a row are benched for a while
+MAX_CONSECUTIVE_FAILURES = 3
+MAX_COOLDOWN = 60
+
+# Sending a transaction twice is not a read
+UNHEDGED_METHODS = {"eth_sendRawTransaction", "eth_sendTransaction"}
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class Endpoint:
+    def __init__(self, url, pool_size=32):
+        self.url = url
+        self.name = urlparse(url).hostname or url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.requests = 0
+        self.failures = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.ewma_latency = 0.0
+        self.ewma_failures = 0.0
+        self.consecutive_failures = 0
+        self.benched_until = 0
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def post(self, payload, timeout):
+        start = time.perf_counter()
+        key = object()
+        with self._lock:
+            self._started[key] = start
+        try:
+            response = self.session.post(self.url, json=payload, timeout=timeout)
+            response.raise_for_status()
+            result = response.json()
+            if isinstance(result, dict) and "error" in result:
+                error = RPCError(result["error"])
+                if error.code in THROTTLE_CODES:
+                    raise error
+        except Exception:
+            self._record(key, time.perf_counter() - start, False)
+            raise
+        self._record(key, time.perf_counter() - start, True)
+        return result
+
+    def _record(self, key, latency, success):
+        with self._lock:
+            del self._started[key]
+            self.requests += 1
+            self.latencies.append(latency)
+            self.ewma_latency += 0.2 * (latency - self.ewma_latency)
+            self.ewma_failures += 0.2 * ((not success) - self.ewma_failures)
+            if success:
+                self.consecutive_failures = 0
+                return
+
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+                cooldown = 2 ** (self.consecutive_failures - MAX_CONSECUTIVE_FAILURES)
+                self.benched_until = time.monotonic() + min(MAX_COOLDOWN, cooldown)
+
+    def score(self):
+        # Lower is better. Untried endpoints score 0 so they get sampled, and
+        # requests still in flight count with the time they have taken so far
+        if time.monotonic() < self.benched_until:
+            return float("inf")
+        with self._lock:
+            oldest = min(self._started.values(), default=None)
+        latency = self.ewma_latency
+        if oldest is not None:
+            latency = max(latency, time.perf_counter() - oldest)
+        return latency * (1 + 4 * self.ewma_failures)
+
+    def quantiles(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+        return {q: percentile(latencies, q) for q in QUANTILES}
+
+    def hedge_delay(self):
+        with self._lock:
+            if len(self.latencies) < MIN_SAMPLES:
+                return DEFAULT_HEDGE_DELAY
+            latencies = sorted(self.latencies)
+        return max(MIN_HEDGE_DELAY, percentile(latencies, 0.9))
+
+
+class AdaptiveLimiter:
+    # AIMD concurrency limit: +1 per window of successes, halved on errors
+    def __init__(self, initial=4, minimum=1, maximum=64):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, success):
+        with self._condition:
+            self.in_flight -= 1
+            if success:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            else:
+                self.limit = max(self.minimum, self.limit / 2)
+            self._condition.notify_all()
+
+
+class RpcPool(JsonRpc):
+    def __init__(
+        self, endpoints, timeout=30, hedge=True, max_attempts=None, limiter=None,
+    ):
+        super().__init__(endpoints[0], timeout)
+        self.endpoints = [Endpoint(url) for url in endpoints]
+        self.hedge = hedge
+        self.max_attempts = max_attempts or len(self.endpoints)
+        self.limiter = limiter or AdaptiveLimiter()
+
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self._executor = ThreadPoolExecutor(max_workers=8 * len(self.endpoints))
+
+    def ranked(self):
+        return sorted(self.endpoints, key=lambda e: e.score())
+
+    def _send(self, payload):
+        start = time.perf_counter()
+
+        calls = payload if isinstance(payload, list) else [payload]
+        hedge = self.hedge and not any(c["method"] in UNHEDGED_METHODS for c in calls)
+
+        candidates = self.ranked()[: self.max_attempts]
+        pending = {}
+        hedged = False
+        error = None
+
+        def launch():
+            endpoint = candidates.pop(0)
+            future = self._executor.submit(endpoint.post, payload, self.timeout)
+            pending[future] = endpoint
+
+        launch()
+        primary = next(iter(pending.values()))
+        while pending:
+            delay = primary.hedge_delay() if hedge and candidates else None
+            done, _ = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+            if not done:
+                # The request is slower than usual, race it on the next one
+                self.hedges += 1
+                hedged = True
+                launch()
+                continue
+
+            for future in done:
+                endpoint = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # Fail over to the next best endpoint
+                    error = e
+                    if candidates:
+                        launch()
+                    continue
+
+                if hedged and endpoint is not primary:
+                    self.hedge_wins += 1
+                self.latencies.append(time.perf_counter() - start)
+                return result
+
+        raise error
+
+    def map_batches(self, batches, raise_on_error=True, max_retries=5):
+        # Sends every list of (method, params) in `batches` as its own batch,
+        # as many at a time as the limiter allows, and returns the results
+        # in order. Throttled or failed batches are retried
+        def run(calls):
+            for attempt in range(max_retries + 1):
+                self.limiter.acquire()
+                try:
+                    results = self.batch(calls, raise_on_error=False)
+                except (requests.RequestException, RPCError):
+                    self.limiter.release(False)
+                    if attempt == max_retries:
+                        raise
+                    continue
+
+                throttled = any(
+                    isinstance(r, RPCError) and r.code in THROTTLE_CODES
+                    for r in results
+                )
+                self.limiter.release(not throttled)
+                if throttled and attempt < max_retries:
+                    continue
+
+                for r in results:
+                    if raise_on_error and isinstance(r, RPCError):
+                        raise r
+                return results
+
+        with ThreadPoolExecutor(max_workers=self.limiter.maximum) as executor:
+            return list(executor.map(run, batches))
+
+    def metrics(self):
+        latencies = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "concurrency_limit": self.limiter.limit,
+            "latency": {q: percentile(latencies, q) for q in QUANTILES},
+            "endpoints": [
+                {
+                    "name": e.name,
+                    "requests": e.requests,
+                    "failures": e.failures,
+                    "score": e.score(),
+                    "latency": e.quantiles(),
+                }
+                for e in self.endpoints
+            ],
+        }
+
+
+def connect(settings=None):
+    # Client for the configured endpoints, pooled when there are several
+    endpoints = rpc_endpoints(settings)
+    if len(endpoints) == 1:
+        return JsonRpc(endpoints[0])
+    return RpcPool(endpoints)
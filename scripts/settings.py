@@ -0,0 +1,39 @@
+import json
+import os
+import yaml
+
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def load_config(path=PROJECT_ROOT / "brownie-config.yml"):
+    # Reads brownie-config.yml without loading the brownie project
+    with open(path) as f:
+        return yaml.safe_load(f) or {}
+
+
+def monitor_settings():
+    settings = load_config().get("monitor", {})
+    if os.getenv("MONITOR_FLEET"):
+        # Manifest written by scripts/synthetic_fleet.py
+        with open(os.getenv("MONITOR_FLEET")) as f:
+            manifest = json.load(f)
+        settings["strategies"] = [s["address"] for s in manifest["strategies"]]
+    return settings
+
+
+def rpc_endpoints(settings=None):
+    # Several endpoints can be given as a comma separated WEB3_PROVIDER_URIS
+    # or under monitor.rpc.endpoints
+    if os.getenv("WEB3_PROVIDER_URIS"):
+        return [uri.strip() for uri in os.getenv("WEB3_PROVIDER_URIS").split(",")]
+    if settings is None:
+        settings = monitor_settings()
+    return settings.get("rpc", {}).get("endpoints") or [rpc_endpoint()]
+
+
+def rpc_endpoint():
+    if os.getenv("WEB3_PROVIDER_URI"):
+        return os.getenv("WEB3_PROVIDER_URI")
+    return f"https://mainnet.infura.io/v3/{os.getenv('WEB3_INFURA_PROJECT_ID')}"
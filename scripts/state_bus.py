@@ -0,0 +1,211 @@
+import fcntl
+import mmap
+import os
+import struct
+import time
+
+from eth_utils import to_checksum_address
+
+from scripts.fleet import DEFAULT_CONCURRENCY, monitor_fleet
+from scripts.monitor_lite import collect_strategy_data
+from scripts.rpc_pool import connect
+from scripts.settings import PROJECT_ROOT, monitor_settings
+
+# Fleet state published by a single reader process into a memory mapped
+# ring buffer, so the exporter, keepers and ad hoc tools can share it
+# without each polling the node. Run the publisher with
+# `python -m scripts.state_bus` and read it with StateBus(path).
+#
+# Every slot is guarded by a sequence lock: the writer makes the version
+# odd, writes the record and makes it even again. Readers retry when the
+# version is odd or changed while they were copying the record
+
+DEFAULT_PATH = PROJECT_ROOT / "fleet.bus"
+DEFAULT_CAPACITY = 1024
+DEFAULT_POLL_INTERVAL = 2
+
+MAGIC = b"MDDB"
+LAYOUT_VERSION = 1
+
+# magic, layout version, capacity, slot size, published records
+HEADER = struct.Struct("<4sIIIQ")
+HEADER_SIZE = 64
+HEAD_OFFSET = 16
+
+# A slot is the version followed by the record: block, timestamp, cdp id,
+# debt ratio, strategy, flags and the uint256 values as 32 byte words
+VERSION = struct.Struct("<Q")
+RECORD = struct.Struct("<QQQQ20sB3x" + "32s" * 8)
+SLOT_SIZE = VERSION.size + RECORD.size
+VALUES = [
+    "collateral",
+    "debt",
+    "shares",
+    "price_per_share",
+    "spot_price",
+    "collateralization_ratio",
+    "current_ratio",
+    "liquidation_ratio",
+]
+TEND_TRIGGER = 1
+
+
+class StateBus:
+    def __init__(self, path=DEFAULT_PATH, writable=False):
+        self.path = path
+        self._file = open(path, "r+b" if writable else "rb")
+        access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+        self._map = mmap.mmap(self._file.fileno(), 0, access=access)
+        self._view = memoryview(self._map)
+
+        magic, layout, self.capacity, slot_size, _ = HEADER.unpack_from(self._view)
+        if magic != MAGIC or layout != LAYOUT_VERSION or slot_size != SLOT_SIZE:
+            self.close()
+            raise ValueError(f"{path} is not a v{LAYOUT_VERSION} state bus")
+
+    @classmethod
+    def create(cls, path=DEFAULT_PATH, capacity=DEFAULT_CAPACITY):
+        # Opens the bus as its only writer. An existing bus with the same
+        # layout is reused so readers keep their mapping and cursors
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            raise RuntimeError(f"{path} already has a publisher")
+
+        size = HEADER_SIZE + capacity * SLOT_SIZE
+        header = os.pread(fd, HEADER.size, 0)
+        if (
+            os.fstat(fd).st_size != size
+            or len(header) != HEADER.size
+            or HEADER.unpack(header)[:4] != (MAGIC, LAYOUT_VERSION, capacity, SLOT_SIZE)
+        ):
+            os.ftruncate(fd, 0)
+            os.ftruncate(fd, size)
+            os.pwrite(fd, HEADER.pack(MAGIC, LAYOUT_VERSION, capacity, SLOT_SIZE, 0), 0)
+
+        bus = cls(path, writable=True)
+        # The lock lives as long as this descriptor
+        bus._lock_fd = fd
+        return bus
+
+    def close(self):
+        self._view.release()
+        self._map.close()
+        self._file.close()
+        if getattr(self, "_lock_fd", None) is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    @property
+    def head(self):
+        # Number of records published so far
+        return VERSION.unpack_from(self._view, HEAD_OFFSET)[0]
+
+    def _offset(self, seq):
+        return HEADER_SIZE + (seq % self.capacity) * SLOT_SIZE
+
+    def publish(self, data, timestamp):
+        seq = self.head
+        offset = self._offset(seq)
+
+        VERSION.pack_into(self._view, offset, 2 * seq + 1)
+        RECORD.pack_into(
+            self._view,
+            offset + VERSION.size,
+            data["block"],
+            timestamp,
+            data["cdp_id"],
+            data["debt_ratio"],
+            bytes.fromhex(data["address"][2:]),
+            TEND_TRIGGER if data["tend_trigger"] else 0,
+            *[data[v].to_bytes(32, "big") for v in VALUES],
+        )
+        VERSION.pack_into(self._view, offset, 2 * seq + 2)
+        VERSION.pack_into(self._view, HEAD_OFFSET, seq + 1)
+        return seq
+
+    def read(self, seq, retries=100):
+        # The record published as `seq`, or None once it has been overwritten
+        offset = self._offset(seq)
+        for _ in range(retries):
+            (version,) = VERSION.unpack_from(self._view, offset)
+            if version == 2 * seq + 1:
+                # Being written right now
+                continue
+            if version != 2 * seq + 2:
+                return None
+
+            fields = RECORD.unpack_from(self._view, offset + VERSION.size)
+            if VERSION.unpack_from(self._view, offset)[0] != version:
+                continue
+
+            block, timestamp, cdp_id, debt_ratio, address, flags, *values = fields
+            return {
+                "seq": seq,
+                "address": to_checksum_address(address),
+                "block": block,
+                "timestamp": timestamp,
+                "cdp_id": cdp_id,
+                "debt_ratio": debt_ratio,
+                "tend_trigger": bool(flags & TEND_TRIGGER),
+                **{k: int.from_bytes(v, "big") for k, v in zip(VALUES, values)},
+            }
+        return None
+
+    def since(self, cursor):
+        # Records published after `cursor` and the cursor to pass next time.
+        # Records the writer already lapped are skipped
+        head = self.head
+        records = []
+        for seq in range(max(cursor, head - self.capacity), head):
+            record = self.read(seq)
+            if record is not None:
+                records.append(record)
+        return records, head
+
+    def latest(self):
+        # Most recent record of every strategy still in the buffer
+        records = {}
+        head = self.head
+        for seq in range(head - 1, max(-1, head - 1 - self.capacity), -1):
+            record = self.read(seq)
+            if record is not None and record["address"] not in records:
+                records[record["address"]] = record
+        return records
+
+
+def main():
+    settings = monitor_settings()
+    strategies = settings.get("strategies", [])
+    concurrency = settings.get("concurrency", DEFAULT_CONCURRENCY)
+    bus_settings = settings.get("bus", {})
+
+    rpc = connect(settings)
+    bus = StateBus.create(
+        bus_settings.get("path", DEFAULT_PATH),
+        bus_settings.get("capacity", DEFAULT_CAPACITY),
+    )
+    poll_interval = bus_settings.get("poll_interval", DEFAULT_POLL_INTERVAL)
+
+    last_block = None
+    while True:
+        block = rpc.block_number()
+        if block != last_block:
+            results, elapsed = monitor_fleet(
+                strategies, lambda s: collect_strategy_data(rpc, s, block), concurrency
+            )
+            timestamp = rpc.block_timestamp(block)
+            for r in results:
+                if r["error"] is None:
+                    bus.publish(r["result"], timestamp)
+                else:
+                    print(f"{r['strategy']} failed: {r['error']!r}")
+            print(f"Published block {block} in {elapsed:.2f}s")
+            last_block = block
+        time.sleep(poll_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import hashlib
+import json
+
+from pathlib import Path
+
+from eth_utils import to_checksum_address
+
+from scripts.cache import shared_cache
+from scripts.rpc import block_tag
+from scripts.settings import PROJECT_ROOT, load_config
+
+# Reads strategy configuration straight from storage: every slot of every
+# strategy in one eth_getStorageAt batch, decoded locally. The layout comes
+# from the compiler's storageLayout output and is cached under build/,
+# along with a hash of the sources and compiler settings it was built from
+
+LAYOUT_CACHE = PROJECT_ROOT / "build" / "storage"
+SOURCE_DIRS = ("contracts", "interfaces")
+
+CONFIG_FIELDS = [
+    "gemJoinAdapter",
+    "wantToUSDOSMProxy",
+    "chainlinkWantToETHPriceFeed",
+    "yVault",
+    "router",
+    "ilk",
+    "cdpId",
+    "collateralizationRatio",
+    "rebalanceTolerance",
+    "maxAcceptableBaseFee",
+    "maxLoss",
+    "leaveDebtBehind",
+]
+
+
+def compile_layout(contract="Strategy", source=None):
+    # Asks solc for the storageLayout of `contract`, with the same compiler
+    # version and remappings brownie uses for the project
+    import solcx
+
+    config = load_config()
+    solc = config["compiler"]["solc"]
+    packages = Path.home() / ".brownie" / "packages"
+    remappings = []
+    for remapping in solc.get("remappings", []):
+        prefix, path = remapping.split("=")
+        remappings.append(f"{prefix}={packages / path}")
+
+    source = source or f"contracts/{contract}.sol"
+    output = solcx.compile_standard(
+        {
+            "language": "Solidity",
+            "sources": {source: {"urls": [str(PROJECT_ROOT / source)]}},
+            "settings": {
+                "remappings": remappings,
+                "outputSelection": {source: {contract: ["storageLayout"]}},
+            },
+        },
+        solc_version=solc["version"],
+        allow_paths=[str(PROJECT_ROOT), str(packages)],
+        base_path=str(PROJECT_ROOT),
+    )
+    return output["contracts"][source][contract]["storageLayout"]
+
+
+def sources_hash():
+    # Changes with any project source or with the solc settings. Packages
+    # are pinned by version in the remappings
+    digest = hashlib.sha256()
+    digest.update(json.dumps(load_config()["compiler"], sort_keys=True).encode())
+    paths = [p for d in SOURCE_DIRS for p in (PROJECT_ROOT / d).glob("**/*.sol")]
+    for path in sorted(paths):
+        digest.update(str(path.relative_to(PROJECT_ROOT)).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def storage_layout(contract="Strategy"):
+    path = LAYOUT_CACHE / f"{contract}.json"
+    sources = sources_hash()
+    if path.exists():
+        cached = json.loads(path.read_text())
+        if cached.get("sources") == sources:
+            return cached["layout"]
+
+    layout = compile_layout(contract)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"sources": sources, "layout": layout}, indent=2) + "\n")
+    return layout
+
+
+def decode_field(word, offset, type_info):
+    # Value of a field packed at `offset` bytes from the right of a slot
+    size = int(type_info["numberOfBytes"])
+    raw = word[32 - offset - size : 32 - offset]
+    label = type_info["label"]
+
+    if label == "bool":
+        return raw != b"\0" * size
+    if label == "address" or label.startswith("contract "):
+        return to_checksum_address(raw)
+    if label.startswith("bytes"):
+        return raw
+    value = int.from_bytes(raw, "big")
+    if label.startswith("int") and value >= 2 ** (8 * size - 1):
+        value -= 2 ** (8 * size)
+    return value
+
+
+def _fields(layout, names):
+    by_label = {entry["label"]: entry for entry in layout["storage"]}
+    fields = []
+    for name in names:
+        entry = by_label[name]
+        type_info = layout["types"][entry["type"]]
+        if type_info["encoding"] != "inplace":
+            raise ValueError(f"{name} is not stored in place")
+        fields.append((name, int(entry["slot"]), entry["offset"], type_info))
+    return fields
+
+
+def read_config(rpc, strategies, block=None, fields=CONFIG_FIELDS, layout=None):
+    # {strategy: {field: value}} for every strategy, reading each slot once
+    fields = _fields(layout or storage_layout(), fields)
+    slots = sorted({slot for _, slot, _, _ in fields})
+    strategies = [to_checksum_address(s) for s in strategies]
+    cache = shared_cache()
+
+    words = {}
+    missing = []
+    for s in strategies:
+        for slot in slots:
+            hit = False
+            if isinstance(block, int):
+                hit, words[s, slot] = cache.get(block, s, f"slot:{slot}")
+            if not hit:
+                missing.append((s, slot))
+
+    results = rpc.batch(
+        [("eth_getStorageAt", [s, hex(slot), block_tag(block)]) for s, slot in missing]
+    )
+    for (s, slot), result in zip(missing, results):
+        words[s, slot] = bytes.fromhex(result[2:]).rjust(32, b"\0")
+        cache.put(block, s, f"slot:{slot}", words[s, slot])
+
+    return {
+        s: {
+            name: decode_field(words[s, slot], offset, type_info)
+            for name, slot, offset, type_info in fields
+        }
+        for s in strategies
+    }
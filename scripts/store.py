@@ -0,0 +1,141 @@
+import sqlite3
+import threading
+
+from scripts.settings import PROJECT_ROOT
+
+DEFAULT_PATH = PROJECT_ROOT / "monitor.db"
+
+# Snapshot fields, stored as floats in human units (DAI, want, ratios)
+FIELDS = [
+    "collateral",
+    "debt",
+    "investment_value",
+    "profit",
+    "spot_price",
+    "target_ratio",
+    "current_ratio",
+    "liquidation_ratio",
+    "debt_ratio",
+    "tend_trigger",
+]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS snapshots (
+    strategy TEXT NOT NULL,
+    block INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    {", ".join(f"{field} REAL NOT NULL" for field in FIELDS)},
+    PRIMARY KEY (strategy, block)
+) WITHOUT ROWID
+"""
+
+
+def snapshot_from_data(data):
+    # Compacts the values collected for the report into a snapshot row
+    value = data["shares"] * data["price_per_share"] / 1e18
+    return {
+        "strategy": data["address"],
+        "block": data["block"],
+        "collateral": data["collateral"] / 1e18,
+        "debt": data["debt"] / 1e18,
+        "investment_value": value / 1e18,
+        "profit": (value - data["debt"]) / 1e18,
+        "spot_price": data["spot_price"] / 1e18,
+        "target_ratio": data["collateralization_ratio"] / 1e18,
+        "current_ratio": data["current_ratio"] / 1e18,
+        "liquidation_ratio": data["liquidation_ratio"] / 1e27,
+        "debt_ratio": data["debt_ratio"] / 100,
+        "tend_trigger": float(bool(data["tend_trigger"])),
+    }
+
+
+class SnapshotStore:
+    def __init__(self, path=DEFAULT_PATH):
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            self._db.execute(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def append(self, snapshot, timestamp):
+        columns = ["strategy", "block", "timestamp"] + FIELDS
+        row = {**snapshot, "timestamp": timestamp}
+        with self._lock, self._db:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO snapshots ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' for _ in columns)})",
+                [row[c] for c in columns],
+            )
+
+    def latest(self, strategy, before_block=None):
+        query = "SELECT * FROM snapshots WHERE strategy = ?"
+        params = [strategy]
+        if before_block is not None:
+            query += " AND block < ?"
+            params.append(before_block)
+
+        with self._lock:
+            row = self._db.execute(
+                query + " ORDER BY block DESC LIMIT 1", params
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def last_block(self, strategy):
+        with self._lock:
+            (block,) = self._db.execute(
+                "SELECT MAX(block) FROM snapshots WHERE strategy = ?", [strategy]
+            ).fetchone()
+        return block
+
+    def blocks(self, strategy, since=None, until=None):
+        # Blocks with a snapshot of `strategy`, bounds included
+        query = "SELECT block FROM snapshots WHERE strategy = ?"
+        params = [strategy]
+        if since is not None:
+            query += " AND block >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND block <= ?"
+            params.append(until)
+
+        with self._lock:
+            return {block for (block,) in self._db.execute(query, params)}
+
+    def history(self, strategy, field, since=None, until=None):
+        # Returns [(timestamp, value)] ordered by block
+        if field not in FIELDS:
+            raise ValueError(f"Unknown snapshot field '{field}'")
+
+        query = f"SELECT timestamp, {field} FROM snapshots WHERE strategy = ?"
+        params = [strategy]
+        if since is not None:
+            query += " AND timestamp >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND timestamp <= ?"
+            params.append(until)
+
+        with self._lock:
+            return [
+                tuple(r) for r in self._db.execute(query + " ORDER BY block", params)
+            ]
+
+    def rate(self, strategy, field, since=None, until=None, per=3600):
+        # Least-squares slope of `field` over time, in units per `per` seconds
+        # (per hour by default). None when there are not enough points
+        points = self.history(strategy, field, since, until)
+        if len(points) < 2:
+            return None
+
+        n = len(points)
+        mean_t = sum(t for t, _ in points) / n
+        mean_v = sum(v for _, v in points) / n
+        variance = sum((t - mean_t) ** 2 for t, _ in points)
+        if variance == 0:
+            return None
+
+        covariance = sum((t - mean_t) * (v - mean_v) for t, v in points)
+        return covariance / variance * per
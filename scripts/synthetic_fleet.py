@@ -0,0 +1,207 @@
+import json
+import random
+import time
+
+from pathlib import Path
+
+from brownie import (
+    Contract,
+    MakerDaiDelegateCloner,
+    MakerDaiDelegateLib,
+    Strategy,
+    accounts,
+    chain,
+    config,
+    network,
+    project,
+    web3,
+)
+
+from scripts.settings import PROJECT_ROOT
+
+# Deploys a fleet of MakerDaiDelegate clones on a local fork so the monitor,
+# the watcher and keepers can be measured on realistic fleet sizes:
+#
+#   brownie run synthetic_fleet main 200 --network <persistent fork>
+#
+# The fleet is described in a manifest. Running the script again against the
+# same chain reuses it instead of redeploying, and MONITOR_FLEET=<manifest>
+# points the lite scripts at it. mainnet-fork is thrown away after every
+# command, so use a fork that keeps running (e.g. ganache --fork started
+# separately and added with `brownie networks add`)
+
+DEFAULT_MANIFEST = PROJECT_ROOT / "fleet.json"
+DEFAULT_SIZE = 100
+STRATEGIES_PER_VAULT = 10
+
+YCHAD = "0xFEB4acf3df3cDEA7399794D0869ef76A6EfAff52"
+WETH = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+YVDAI = "0xdA816459F1AB5631232FE5e97a05BBBb94970c95"
+
+ILKS = {
+    "ETH-C": {
+        "ilk": "0x4554482d43000000000000000000000000000000000000000000000000000000",
+        "want": WETH,
+        "gem_join": "0xF04a5cC80B1E94C69B48f5ee68a08CD2F09A7c3E",
+        "osm_proxy": "0xCF63089A8aD2a9D8BD6Bb8022f3190EB7e1eD0f1",
+        "chainlink": "0x7c5d4F8345e66f68099581Db340cd65B078C41f4",
+    },
+}
+
+# Ranges the strategy parameters are drawn from. ETH-C liquidates at 175%
+COLLATERALIZATION_RATIO = (2.0, 3.0)
+REBALANCE_TOLERANCE = (0.05, 0.2)
+DEPOSIT = (10, 100)  # in want
+
+
+def _vault_container():
+    return project.load(
+        Path.home() / ".brownie" / "packages" / config["dependencies"][0]
+    ).Vault
+
+
+def _fund(account, token, amount):
+    # Mints ETH on the local node and wraps it
+    balance = account.balance() + amount
+    web3.provider.make_request("evm_setAccountBalance", [account.address, hex(balance)])
+    token.deposit({"from": account, "value": amount})
+
+
+def deploy_fleet(size=DEFAULT_SIZE, seed=0, ilk="ETH-C"):
+    rng = random.Random(seed)
+    params = ILKS[ilk]
+    gov = accounts.at(YCHAD, force=True)
+    strategist, guardian, management = accounts[0], accounts[1], accounts[2]
+    want = Contract(params["want"])
+    osm_proxy = Contract(params["osm_proxy"])
+    Vault = _vault_container()
+
+    if len(MakerDaiDelegateLib) == 0:
+        MakerDaiDelegateLib.deploy({"from": gov})
+    cloner = strategist.deploy(
+        MakerDaiDelegateCloner,
+        # The original strategy needs a vault of its own
+        _new_vault(Vault, want, gov, guardian, management),
+        YVDAI,
+        f"StrategyMakerV2{want.symbol()}",
+        params["ilk"],
+        params["gem_join"],
+        params["osm_proxy"],
+        params["chainlink"],
+    )
+
+    manifest = {
+        "chain_id": chain.id,
+        "network": network.show_active(),
+        "created": int(time.time()),
+        "seed": seed,
+        "ilk": ilk,
+        "cloner": cloner.address,
+        "original": cloner.original(),
+        "vaults": [],
+        "strategies": [],
+    }
+
+    for first in range(0, size, STRATEGIES_PER_VAULT):
+        vault = _new_vault(Vault, want, gov, guardian, management)
+        count = min(STRATEGIES_PER_VAULT, size - first)
+        # Each strategy gets its own deposit through its share of debt
+        deposits = [int(rng.uniform(*DEPOSIT) * 1e18) for _ in range(count)]
+        deposit = sum(deposits)
+
+        strategies = []
+        for i, amount in enumerate(deposits):
+            debt_ratio = 10_000 * amount // deposit
+            tx = cloner.cloneMakerDaiDelegate(
+                vault,
+                strategist,
+                strategist,
+                strategist,
+                YVDAI,
+                f"StrategyMakerV2{want.symbol()}-{first + i}",
+                params["ilk"],
+                params["gem_join"],
+                params["osm_proxy"],
+                params["chainlink"],
+                {"from": strategist},
+            )
+            strategy = Strategy.at(tx.return_value)
+
+            ratio = round(rng.uniform(*COLLATERALIZATION_RATIO), 4)
+            tolerance = round(rng.uniform(*REBALANCE_TOLERANCE), 4)
+            strategy.setCollateralizationRatio(int(ratio * 1e18), {"from": gov})
+            strategy.setRebalanceTolerance(int(tolerance * 1e18), {"from": gov})
+            strategy.setLeaveDebtBehind(False, {"from": gov})
+            strategy.setMaxAcceptableBaseFee(1500 * 1e9, {"from": gov})
+            osm_proxy.setAuthorized(strategy, {"from": gov})
+            vault.addStrategy(
+                strategy, debt_ratio, 0, 2 ** 256 - 1, 1_000, {"from": gov}
+            )
+
+            strategies.append(
+                {
+                    "address": strategy.address,
+                    "vault": vault.address,
+                    "collateralization_ratio": ratio,
+                    "rebalance_tolerance": tolerance,
+                    "debt_ratio": debt_ratio,
+                    "deposit": amount,
+                }
+            )
+
+        _fund(strategist, want, deposit)
+        want.approve(vault, deposit, {"from": strategist})
+        vault.deposit(deposit, {"from": strategist})
+
+        chain.sleep(1)
+        for s in strategies:
+            Strategy.at(s["address"]).harvest({"from": gov})
+
+        manifest["vaults"].append({"address": vault.address, "deposit": deposit})
+        manifest["strategies"] += strategies
+        print(f"Deployed {len(manifest['strategies'])}/{size} strategies")
+
+    manifest["block"] = chain.height
+    return manifest
+
+
+def _new_vault(Vault, want, gov, guardian, management):
+    vault = guardian.deploy(Vault)
+    vault.initialize(want, gov, guardian, "", "", guardian, management)
+    vault.setDepositLimit(2 ** 256 - 1, {"from": gov})
+    vault.setManagement(management, {"from": gov})
+    return vault
+
+
+def save_manifest(manifest, path=DEFAULT_MANIFEST):
+    Path(path).write_text(json.dumps(manifest, indent=2) + "\n")
+
+
+def load_manifest(path=DEFAULT_MANIFEST):
+    # The manifest at `path` if its fleet is deployed on the connected chain
+    path = Path(path)
+    if not path.exists():
+        return None
+
+    manifest = json.loads(path.read_text())
+    if manifest["chain_id"] != chain.id or chain.height < manifest["block"]:
+        return None
+    addresses = [manifest["cloner"]] + [s["address"] for s in manifest["strategies"]]
+    if any(web3.eth.get_code(a) in (b"", "0x") for a in addresses):
+        return None
+    return manifest
+
+
+def main(size=DEFAULT_SIZE, path=DEFAULT_MANIFEST, seed=0):
+    size = int(size)
+    print(f"You are using the '{network.show_active()}' network")
+
+    manifest = load_manifest(path)
+    if manifest is not None and len(manifest["strategies"]) >= size:
+        print(f"Reusing the {len(manifest['strategies'])} strategies in {path}")
+        return manifest
+
+    manifest = deploy_fleet(size, int(seed))
+    save_manifest(manifest, path)
+    print(f"Saved the manifest of {size} strategies to {path}")
+    return manifest
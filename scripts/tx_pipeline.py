@@ -0,0 +1,346 @@
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from scripts.bundle import BundledContract
+from scripts.rpc import RPCError
+
+# Transaction pipeline for keepers that send many transactions at once, e.g.
+# a tend() to every clone of an ilk after an OSM drop. Nonces are handed out
+# locally, gas is estimated in one batch, transactions are signed in
+# parallel and broadcast together in one eth_sendRawTransaction batch, so
+# they can all land in the next block instead of one per round trip.
+#
+# poll() tracks inclusion. A transaction still pending `stuck_blocks` after
+# it was sent is replaced by the same transaction with fees bumped by at
+# least `bump_percent` (nodes require 10% to accept a replacement). The
+# hashes of a nonce are all kept, so whichever version is mined is found.
+# Fees never go above `max_fee_per_gas`: once the cap leaves no room for a
+# 10% bump the transaction is no longer replaced
+
+DEFAULT_WORKERS = 8
+DEFAULT_STUCK_BLOCKS = 3
+DEFAULT_BUMP_PERCENT = 15
+# Smallest bump nodes accept for a replacement
+MIN_REPLACEMENT_PERCENT = 10
+# Used when the node does not implement eth_maxPriorityFeePerGas
+DEFAULT_PRIORITY_FEE = 2 * 10 ** 9
+# Margin on top of eth_estimateGas, the state can move before inclusion
+GAS_MARGIN_PERCENT = 20
+# Errors meaning the node already has this exact transaction
+KNOWN_ERRORS = ("already known", "known transaction", "already imported")
+FEE_FIELDS = ("gasPrice", "maxFeePerGas", "maxPriorityFeePerGas")
+
+
+def _bump(value, percent):
+    return value + -(-value * percent // 100)
+
+
+class NonceManager:
+    # Next nonce of `address`, synced from the node once and then counted
+    # locally so a batch does not wait for the previous one to be mined
+    def __init__(self, rpc, address):
+        self.rpc = rpc
+        self.address = address
+        self._next = None
+        self._lock = threading.Lock()
+
+    def reserve(self, count):
+        with self._lock:
+            if self._next is None:
+                self._next = int(
+                    self.rpc.request(
+                        "eth_getTransactionCount", [self.address, "pending"]
+                    ),
+                    16,
+                )
+            nonces = list(range(self._next, self._next + count))
+            self._next += count
+            return nonces
+
+    def reset(self):
+        # Next reserve() asks the node again
+        with self._lock:
+            self._next = None
+
+
+class TxPipeline:
+    def __init__(
+        self,
+        rpc,
+        account,
+        workers=DEFAULT_WORKERS,
+        stuck_blocks=DEFAULT_STUCK_BLOCKS,
+        bump_percent=DEFAULT_BUMP_PERCENT,
+        max_fee_per_gas=None,
+    ):
+        # `account` is an eth_account LocalAccount
+        self.rpc = rpc
+        self.account = account
+        self.address = account.address
+        self.workers = workers
+        self.stuck_blocks = stuck_blocks
+        self.bump_percent = bump_percent
+        self.max_fee_per_gas = max_fee_per_gas
+        self.chain_id = int(rpc.request("eth_chainId"), 16)
+        self.nonces = NonceManager(rpc, self.address)
+
+        # nonce -> {"tx", "hashes", "block"} of transactions not mined yet
+        self.inflight = {}
+        # every hash sent -> hash mined for its nonce
+        self.mined = {}
+        self.stats = {
+            "estimate_errors": 0,
+            "signed": 0,
+            "broadcast": 0,
+            "send_errors": 0,
+            "fillers": 0,
+            "replaced": 0,
+            "capped": 0,
+            "included": 0,
+            "reverted": 0,
+            "dropped": 0,
+        }
+
+    def fees(self):
+        # EIP-1559 fees with room for the base fee to double, or a legacy
+        # gas price on chains without a base fee
+        block = self.rpc.get_block("latest")
+        if block.get("baseFeePerGas") is None:
+            return {"gasPrice": self._capped(int(self.rpc.request("eth_gasPrice"), 16))}
+        try:
+            tip = int(self.rpc.request("eth_maxPriorityFeePerGas"), 16)
+        except RPCError:
+            tip = DEFAULT_PRIORITY_FEE
+        max_fee = self._capped(2 * int(block["baseFeePerGas"], 16) + tip)
+        return {"maxFeePerGas": max_fee, "maxPriorityFeePerGas": min(tip, max_fee)}
+
+    def _capped(self, fee):
+        if self.max_fee_per_gas is None:
+            return fee
+        return min(fee, self.max_fee_per_gas)
+
+    def _bumped(self, tx, fresh):
+        # Every fee moves by at least bump_percent, or to the fresh estimate
+        # when the market moved further, up to max_fee_per_gas. None when
+        # the cap leaves less than the bump nodes require
+        fees = {
+            k: max(_bump(tx[k], self.bump_percent), fresh.get(k, 0))
+            for k in FEE_FIELDS
+            if k in tx
+        }
+        for k in ("gasPrice", "maxFeePerGas"):
+            if k in fees:
+                fees[k] = self._capped(fees[k])
+        if "maxPriorityFeePerGas" in fees:
+            fees["maxPriorityFeePerGas"] = min(
+                fees["maxPriorityFeePerGas"], fees["maxFeePerGas"]
+            )
+        if any(fees[k] < _bump(tx[k], MIN_REPLACEMENT_PERCENT) for k in fees):
+            return None
+        return fees
+
+    def _sign(self, tx):
+        signed = self.account.sign_transaction(tx)
+        raw = getattr(signed, "raw_transaction", None) or signed.rawTransaction
+        return "0x" + bytes(signed.hash).hex(), "0x" + bytes(raw).hex()
+
+    def _sign_all(self, txs):
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            signed = list(executor.map(self._sign, txs))
+        self.stats["signed"] += len(signed)
+        return signed
+
+    def _broadcast(self, signed):
+        # One batch for every transaction. Returns the RPCError of those
+        # the node refused, None for the others
+        responses = self.rpc.batch(
+            [("eth_sendRawTransaction", [raw]) for _, raw in signed],
+            raise_on_error=False,
+        )
+        errors = []
+        for response in responses:
+            if isinstance(response, RPCError) and not any(
+                e in response.message.lower() for e in KNOWN_ERRORS
+            ):
+                errors.append(response)
+            else:
+                errors.append(None)
+        self.stats["broadcast"] += errors.count(None)
+        return errors
+
+    def submit(self, txs, fees=None):
+        # Sends every {"to", "data", "value"?, "gas"?} in `txs` in the next
+        # block if possible. Returns, in order, the hash of each transaction
+        # or the RPCError that kept it from being sent
+        results = [None] * len(txs)
+        txs = [{"from": self.address, "value": 0, **tx} for tx in txs]
+
+        # Transactions that would revert get no nonce, so they leave no gap
+        need_gas = [i for i, tx in enumerate(txs) if "gas" not in tx]
+        estimates = self.rpc.batch(
+            [
+                ("eth_estimateGas", [{**txs[i], "value": hex(txs[i]["value"])}])
+                for i in need_gas
+            ],
+            raise_on_error=False,
+        )
+        for i, estimate in zip(need_gas, estimates):
+            if isinstance(estimate, RPCError):
+                self.stats["estimate_errors"] += 1
+                results[i] = estimate
+            else:
+                gas = int(estimate, 16)
+                txs[i]["gas"] = gas + gas * GAS_MARGIN_PERCENT // 100
+
+        ready = [i for i in range(len(txs)) if results[i] is None]
+        if not ready:
+            return results
+        fees = fees or self.fees()
+        block = self.rpc.block_number()
+        for i, nonce in zip(ready, self.nonces.reserve(len(ready))):
+            tx = {k: v for k, v in txs[i].items() if k != "from"}
+            txs[i] = {**tx, **fees, "nonce": nonce, "chainId": self.chain_id}
+
+        signed = self._sign_all([txs[i] for i in ready])
+        errors = self._broadcast(signed)
+        gaps = []
+        for i, (tx_hash, _), error in zip(ready, signed, errors):
+            if error is not None:
+                self.stats["send_errors"] += 1
+                results[i] = error
+                gaps.append(txs[i])
+                continue
+            results[i] = tx_hash
+            self.inflight[txs[i]["nonce"]] = {
+                "tx": txs[i],
+                "hashes": [tx_hash],
+                "block": block,
+            }
+        if gaps:
+            self._fill(gaps, block)
+        return results
+
+    def _fill(self, txs, block):
+        # A refused transaction leaves its nonce unused and every later one
+        # stuck behind it. It is taken by an empty transfer to ourselves
+        fillers = [
+            {
+                **{k: tx[k] for k in ("nonce", "chainId", *FEE_FIELDS) if k in tx},
+                "to": self.address,
+                "value": 0,
+                "data": "0x",
+                "gas": 21000,
+            }
+            for tx in txs
+        ]
+        signed = self._sign_all(fillers)
+        for tx, (tx_hash, _), error in zip(fillers, signed, self._broadcast(signed)):
+            if error is not None:
+                # The local nonce is off, e.g. another process used the key
+                self.nonces.reset()
+                continue
+            self.stats["fillers"] += 1
+            self.inflight[tx["nonce"]] = {"tx": tx, "hashes": [tx_hash], "block": block}
+
+    def latest(self, tx_hash):
+        # The hash that replaced `tx_hash`, or the one mined for its nonce
+        if tx_hash in self.mined:
+            return self.mined[tx_hash]
+        for entry in self.inflight.values():
+            if tx_hash in entry["hashes"]:
+                return entry["hashes"][-1]
+        return tx_hash
+
+    def poll(self):
+        # Settles mined transactions and replaces stuck ones. Returns the
+        # receipts mined since the previous poll
+        if not self.inflight:
+            return []
+        head = self.rpc.block_number()
+        entries = sorted(self.inflight.items())
+        hashes = [(nonce, h) for nonce, entry in entries for h in entry["hashes"]]
+        responses = self.rpc.batch(
+            [("eth_getTransactionReceipt", [h]) for _, h in hashes]
+            + [("eth_getTransactionCount", [self.address, "latest"])],
+            raise_on_error=False,
+        )
+        receipts, count = responses[:-1], responses[-1]
+
+        mined = []
+        for (nonce, tx_hash), receipt in zip(hashes, receipts):
+            if not isinstance(receipt, dict) or nonce not in self.inflight:
+                continue
+            for h in self.inflight.pop(nonce)["hashes"]:
+                self.mined[h] = tx_hash
+            mined.append(receipt)
+            if int(receipt["status"], 16) == 1:
+                self.stats["included"] += 1
+            else:
+                self.stats["reverted"] += 1
+
+        if not isinstance(count, RPCError):
+            # Nonces used by none of our hashes, e.g. sent from another process
+            for nonce in [n for n in self.inflight if n < int(count, 16)]:
+                del self.inflight[nonce]
+                self.stats["dropped"] += 1
+
+        stuck = [
+            (nonce, entry)
+            for nonce, entry in sorted(self.inflight.items())
+            if head - entry["block"] >= self.stuck_blocks and not entry.get("capped")
+        ]
+        if stuck:
+            self._replace(stuck, head)
+        return mined
+
+    def _replace(self, stuck, head):
+        fresh = self.fees()
+        replacements = []
+        for _, entry in stuck:
+            fees = self._bumped(entry["tx"], fresh)
+            if fees is None:
+                # Left as is, it may still be mined once the base fee drops
+                self.stats["capped"] += 1
+                entry["capped"] = True
+                continue
+            replacements.append((entry, {**entry["tx"], **fees}))
+        if not replacements:
+            return
+
+        signed = self._sign_all([tx for _, tx in replacements])
+        for (entry, tx), (tx_hash, _), error in zip(
+            replacements, signed, self._broadcast(signed)
+        ):
+            if error is not None:
+                # Typically mined meanwhile, the next poll finds the receipt
+                self.stats["send_errors"] += 1
+                continue
+            self.stats["replaced"] += 1
+            entry["tx"] = tx
+            entry["hashes"].append(tx_hash)
+            entry["block"] = head
+
+
+class PipelineSender:
+    # Keeper sender that sends every triggered strategy of a block together
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.address = pipeline.address
+
+    def send(self, strategy, action):
+        (result,) = self.send_many([(strategy, action)])
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def send_many(self, actions):
+        return self.pipeline.submit(
+            [BundledContract("Strategy", s).encode(action) for s, action in actions]
+        )
+
+    def latest(self, tx_hash):
+        return self.pipeline.latest(tx_hash)
+
+    def poll(self):
+        self.pipeline.poll()
@@ -0,0 +1,114 @@
+import threading
+
+from eth_utils import to_checksum_address
+
+from scripts.bundle import BundledContract
+from scripts.cache import shared_cache
+from scripts.maker import MANAGER, RAY, VAT
+
+# Reads the collateral and debt of a whole fleet straight from the Vat:
+# vat.ilks(ilk) once per ilk and vat.urns(ilk, urn) once per strategy in a
+# single batch, instead of going through balanceOfMakerVault and
+# balanceOfDebt, which resolve the urn again on every call
+
+# strategy -> (cdpId, ilk). The ilk of a strategy is fixed, the cdpId only
+# moves with shiftToCdp and is checked on every read
+_cdps = {}
+# cdpId -> urn. The manager never reassigns the urn of a cdp
+_urns = {}
+_lock = threading.Lock()
+
+
+def debt_for_urn(art, rate):
+    # Same rounding as MakerDaiDelegateLib.debtForCdp: art.mul(rate).div(RAY)
+    return art * rate // RAY
+
+
+def forget(strategy=None):
+    # Drops what is cached for `strategy`, or for every strategy
+    with _lock:
+        if strategy is None:
+            _cdps.clear()
+            _urns.clear()
+        else:
+            _cdps.pop(to_checksum_address(str(strategy)), None)
+
+
+def _load_urns(rpc, cdp_ids, block=None):
+    manager = BundledContract("DssCdpManager", MANAGER)
+    missing = sorted(set(cdp_ids) - set(_urns))
+    if not missing:
+        return
+
+    urns = rpc.call_many([(manager, "urns", cdp_id) for cdp_id in missing], block)
+    with _lock:
+        _urns.update(zip(missing, urns))
+
+
+def resolve_urns(rpc, strategies, block=None):
+    # {strategy: (cdpId, ilk, urn)}, reading only what is not cached yet
+    strategies = [to_checksum_address(str(s)) for s in strategies]
+    missing = [s for s in strategies if s not in _cdps]
+    if missing:
+        results = rpc.call_many(
+            [
+                (BundledContract("Strategy", s), fn_name)
+                for s in missing
+                for fn_name in ("cdpId", "ilk")
+            ],
+            block,
+        )
+        with _lock:
+            for i, s in enumerate(missing):
+                _cdps[s] = (results[2 * i], results[2 * i + 1])
+
+    _load_urns(rpc, [_cdps[s][0] for s in strategies], block)
+    return {s: _cdps[s] + (_urns[_cdps[s][0]],) for s in strategies}
+
+
+def read_positions(rpc, strategies, block=None):
+    # {strategy: position} with the values balanceOfMakerVault (collateral)
+    # and balanceOfDebt (debt) return at `block`
+    if block is None:
+        block = rpc.block_number()
+
+    resolved = resolve_urns(rpc, strategies, block)
+    strategies = list(resolved)
+    ilks = sorted({ilk for _, ilk, _ in resolved.values()})
+    vat = BundledContract("Vat", VAT)
+
+    calls = [(vat, "ilks", ilk) for ilk in ilks]
+    for s in strategies:
+        cdp_id, ilk, urn = resolved[s]
+        calls.append((vat, "urns", ilk, urn))
+        # Checked alongside so a shiftToCdp is noticed in the same batch
+        calls.append((BundledContract("Strategy", s), "cdpId"))
+    results = rpc.call_many(calls, block, cache=shared_cache())
+
+    rates = {ilk: r["rate"] for ilk, r in zip(ilks, results)}
+    results = results[len(ilks) :]
+
+    shifted = [
+        s for i, s in enumerate(strategies) if results[2 * i + 1] != resolved[s][0]
+    ]
+    if shifted:
+        with _lock:
+            for s in shifted:
+                _cdps.pop(s, None)
+        # Pinned to the same block, so the second pass sees matching cdpIds
+        return read_positions(rpc, strategies, block)
+
+    positions = {}
+    for i, s in enumerate(strategies):
+        cdp_id, ilk, urn = resolved[s]
+        vat_urn = results[2 * i]
+        positions[s] = {
+            "block": block,
+            "cdp_id": cdp_id,
+            "urn": urn,
+            "collateral": vat_urn["ink"],
+            "art": vat_urn["art"],
+            "rate": rates[ilk],
+            "debt": debt_for_urn(vat_urn["art"], rates[ilk]),
+        }
+    return positions
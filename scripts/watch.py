@@ -0,0 +1,308 @@
+import time
+
+from eth_utils import keccak, to_checksum_address
+
+from scripts.alerts import publish_reports
+from scripts.bundle import BundledContract
+from scripts.cache import shared_cache
+from scripts.fleet import DEFAULT_CONCURRENCY, monitor_fleet
+from scripts.maker import MANAGER, SPOTTER, VAT
+from scripts.monitor_lite import collect_strategy_data, load_strategy_contracts
+from scripts.rpc import RPCError
+from scripts.rpc_pool import connect
+from scripts.settings import monitor_settings
+from scripts.store import DEFAULT_PATH, SnapshotStore
+
+# Streaming monitor: follows new heads and only refreshes the strategies a
+# block may have touched. Run it with `python -m scripts.watch`
+
+DEFAULT_POLL_INTERVAL = 2
+# Longest wait between polls after consecutive failures
+MAX_BACKOFF = 60
+
+# Every strategy is refreshed at least this often, for the state that moves
+# without logs (base fee in tendTrigger, yvDAI locked profit unlocking, ...)
+DEFAULT_FULL_REFRESH_BLOCKS = 300
+
+
+def _topic(value):
+    if isinstance(value, str):
+        value = bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    return "0x" + value.rjust(32, b"\0").hex()
+
+
+def _event(signature):
+    return "0x" + keccak(text=signature).hex()
+
+
+def _note(signature):
+    # Vat calls are logged by LibNote as anonymous log4 with the selector
+    # left aligned in topic0 and the first three arguments as topics
+    return "0x" + keccak(text=signature)[:4].ljust(32, b"\0").hex()
+
+
+VAT_FROB = _note("frob(bytes32,address,address,address,int256,int256)")
+VAT_GRAB = _note("grab(bytes32,address,address,address,int256,int256)")
+VAT_FORK = _note("fork(bytes32,address,address,int256,int256)")
+VAT_FOLD = _note("fold(bytes32,address,int256)")
+SPOTTER_POKE = _event("Poke(bytes32,bytes32,uint256)")
+OSM_LOG_VALUE = _event("LogValue(bytes32)")
+TRANSFER = _event("Transfer(address,address,uint256)")
+STRATEGY_REPORTED = _event(
+    "StrategyReported(address,uint256,uint256,uint256,uint256,uint256,uint256,uint256,uint256)"
+)
+
+
+def in_bloom(bloom, value):
+    # logsBloom membership test from the yellow paper: three bits out of
+    # 2048, picked by the first three byte pairs of keccak(value)
+    if isinstance(bloom, str):
+        bloom = bytes.fromhex(bloom[2:])
+    if isinstance(value, str):
+        value = bytes.fromhex(value[2:])
+
+    digest = keccak(value)
+    for i in range(0, 6, 2):
+        bit = int.from_bytes(digest[i : i + 2], "big") & 2047
+        if not bloom[255 - bit // 8] & (1 << (bit % 8)):
+            return False
+    return True
+
+
+def watch_targets(rpc, s, block=None):
+    # Addresses and topics whose logs may change what is reported for `s`
+    contracts = load_strategy_contracts(rpc, s, block)
+    strategy = contracts["strategy"]
+    cdp_id, osm = rpc.call_many(
+        [(strategy, "cdpId"), (strategy, "wantToUSDOSMProxy")], block
+    )
+    urn, ilk_params = rpc.call_many(
+        [
+            (BundledContract("DssCdpManager", MANAGER), "urns", cdp_id),
+            (BundledContract("Spotter", SPOTTER), "ilks", contracts["ilk"]),
+        ],
+        block,
+    )
+
+    return {
+        "strategy": strategy.address,
+        "ilk": _topic(contracts["ilk"]),
+        "urn": _topic(urn),
+        "pip": ilk_params["pip"],
+        "osm": osm,
+        "vault": contracts["vault"].address,
+        "yvault": contracts["yvault"].address,
+    }
+
+
+def _filters(target):
+    # (address, [topics that must all be present]) for every relevant log
+    strategy = _topic(target["strategy"])
+    return [
+        (target["strategy"], []),
+        (VAT, [VAT_FROB, target["ilk"], target["urn"]]),
+        (VAT, [VAT_GRAB, target["ilk"], target["urn"]]),
+        (VAT, [VAT_FORK, target["ilk"], target["urn"]]),
+        # Stability fees accrued on the ilk change the debt of every urn
+        (VAT, [VAT_FOLD, target["ilk"]]),
+        (SPOTTER, [SPOTTER_POKE]),
+        (target["pip"], [OSM_LOG_VALUE]),
+        # The proxy the strategy reads prices from, when it logs them itself
+        (target["osm"], [OSM_LOG_VALUE]),
+        (target["yvault"], [TRANSFER, strategy]),
+        # Any report moves the yvDAI price per share
+        (target["yvault"], [STRATEGY_REPORTED]),
+        (target["vault"], [STRATEGY_REPORTED, strategy]),
+    ]
+
+
+def may_touch(bloom, target):
+    return any(
+        in_bloom(bloom, address) and all(in_bloom(bloom, t) for t in topics)
+        for address, topics in _filters(target)
+    )
+
+
+def log_touches(log, target):
+    address = to_checksum_address(log["address"])
+    topics = [t.lower() for t in log["topics"]]
+    for filter_address, filter_topics in _filters(target):
+        if address != filter_address or not set(filter_topics) <= set(topics):
+            continue
+        if filter_topics == [SPOTTER_POKE]:
+            # The ilk of a poke is not indexed, it is the first data word
+            if log["data"][:66].lower() != target["ilk"]:
+                continue
+        return True
+    return False
+
+
+class Watcher:
+    def __init__(
+        self,
+        rpc,
+        strategies,
+        settings=None,
+        store=None,
+        full_refresh_blocks=DEFAULT_FULL_REFRESH_BLOCKS,
+    ):
+        self.rpc = rpc
+        self.strategies = [to_checksum_address(s) for s in strategies]
+        self.settings = settings or {}
+        # Opened on the first report, subclasses that do not report never do
+        self.store = store
+        self.full_refresh_blocks = full_refresh_blocks
+
+        self.stats = {
+            "blocks": 0,
+            "bloom_hits": 0,
+            "refreshes": 0,
+            "reorgs": 0,
+            "errors": 0,
+        }
+        self.targets = {}
+        self.head = None
+        self._last_full_refresh = None
+        self._filter_id = None
+
+    def _new_headers(self):
+        # New block headers in order, from a block filter when the node
+        # supports it, otherwise by polling the block number
+        if self._filter_id is None:
+            try:
+                self._filter_id = self.rpc.request("eth_newBlockFilter")
+            except RPCError:
+                self._filter_id = False
+
+        if self.head is None:
+            # Start from (or after a reorg, resync to) the current head
+            return [self.rpc.get_block()]
+
+        hashes = None
+        if self._filter_id:
+            try:
+                hashes = self.rpc.request("eth_getFilterChanges", [self._filter_id])
+            except RPCError:
+                # Filters expire when they are not polled for a while
+                self._filter_id = None
+
+        if hashes is not None:
+            calls = [("eth_getBlockByHash", [h, False]) for h in hashes]
+        else:
+            number = self.rpc.block_number()
+            calls = [
+                ("eth_getBlockByNumber", [hex(n), False])
+                for n in range(int(self.head["number"], 16) + 1, number + 1)
+            ]
+
+        headers = [h for h in self.rpc.batch(calls) if h is not None]
+        return sorted(headers, key=lambda h: int(h["number"], 16))
+
+    def _header(self, header):
+        # Called with every new head before its strategies are refreshed
+        pass
+
+    def _refresh(self, strategies, block, timestamp):
+        results, _ = monitor_fleet(
+            strategies,
+            lambda s: collect_strategy_data(self.rpc, s, block),
+            self.settings.get("concurrency", DEFAULT_CONCURRENCY),
+        )
+        if self.store is None:
+            self.store = SnapshotStore(self.settings.get("store", DEFAULT_PATH))
+        publish_reports(results, timestamp, self.settings, self.store)
+        self.stats["refreshes"] += len(strategies)
+
+    def _refresh_all(self, header):
+        block = int(header["number"], 16)
+        self.targets = {s: watch_targets(self.rpc, s, block) for s in self.strategies}
+        self._refresh(self.strategies, block, int(header["timestamp"], 16))
+        self._last_full_refresh = block
+
+    def _touched(self, header):
+        targets = {
+            s: t for s, t in self.targets.items() if may_touch(header["logsBloom"], t)
+        }
+        if not targets:
+            return []
+
+        self.stats["bloom_hits"] += 1
+        addresses = {a for t in targets.values() for a, _ in _filters(t)}
+        logs = self.rpc.request(
+            "eth_getLogs", [{"blockHash": header["hash"], "address": sorted(addresses)}]
+        )
+        return [
+            s
+            for s, target in targets.items()
+            if any(log_touches(log, target) for log in logs)
+        ]
+
+    def poll(self):
+        # Processes the heads seen since the last call and returns the
+        # strategies that were refreshed
+        refreshed = set()
+        for header in self._new_headers():
+            if self.head is not None and header["hash"] == self.head["hash"]:
+                continue
+            block = int(header["number"], 16)
+            self.stats["blocks"] += 1
+
+            if self.head is not None and header["parentHash"] != self.head["hash"]:
+                # Reorg or a gap we cannot account for: block numbers are
+                # reused, so nothing cached by number can be trusted
+                self.stats["reorgs"] += 1
+                shared_cache().clear()
+                self.head = None
+
+            self._header(header)
+            if (
+                self.head is None
+                or block - self._last_full_refresh >= self.full_refresh_blocks
+            ):
+                self._refresh_all(header)
+                refreshed.update(self.strategies)
+            else:
+                touched = self._touched(header)
+                if touched:
+                    self._refresh(touched, block, int(header["timestamp"], 16))
+                    refreshed.update(touched)
+
+            self.head = header
+        return refreshed
+
+    def _tick(self):
+        for s in self.poll():
+            print(f"{s} refreshed at block {int(self.head['number'], 16)}")
+
+    def run(self, poll_interval=DEFAULT_POLL_INTERVAL):
+        failures = 0
+        while True:
+            try:
+                self._tick()
+                failures = 0
+            except Exception as e:
+                # Node timeouts and errors are transient, the next poll
+                # starts again from the last head seen
+                failures += 1
+                self.stats["errors"] += 1
+                print(f"Poll failed ({failures} in a row): {e!r}")
+            time.sleep(min(poll_interval * 2 ** failures, MAX_BACKOFF))
+
+
+def main():
+    settings = monitor_settings()
+    watch = settings.get("watch", {})
+
+    watcher = Watcher(
+        connect(settings),
+        settings.get("strategies", []),
+        settings,
+        full_refresh_blocks=watch.get(
+            "full_refresh_blocks", DEFAULT_FULL_REFRESH_BLOCKS
+        ),
+    )
+    watcher.run(watch.get("poll_interval", DEFAULT_POLL_INTERVAL))
+
+
+if __name__ == "__main__":
+    main()
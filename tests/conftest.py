@@ -1,5 +1,14 @@
 import pytest
-from brownie import config, convert, interface, Contract
+from brownie import chain, config, convert, interface, Contract, web3
+
+from scripts.cache import shared_cache
+from scripts.profiler import profile_web3
+
+
+@pytest.fixture(scope="session", autouse=True)
+def rpc_profile():
+    # RPC_PROFILE=1 brownie test prints where the test session's RPC calls go
+    yield profile_web3(web3)
 
 
 @pytest.fixture(autouse=True)
@@ -7,6 +16,13 @@ def isolation(fn_isolation):
     pass
 
 
+@pytest.fixture(autouse=True)
+def block_cache():
+    # Block numbers are reused when the chain is reverted between tests
+    shared_cache().clear()
+    yield shared_cache()
+
+
 @pytest.fixture(autouse=True)
 def lib(gov, MakerDaiDelegateLib):
     yield MakerDaiDelegateLib.deploy({"from": gov})
@@ -234,6 +250,32 @@ def RELATIVE_APPROX():
     yield 1e-5
 
 
+@pytest.fixture
+def deposit_and_harvest(token, vault, amount, user, gov):
+    # Deposits into the vault and harvests, so `strategy` has a cdp and yvDAI
+    def deposit_and_harvest(strategy, depositor=user, deposit=amount):
+        token.approve(vault.address, deposit, {"from": depositor})
+        vault.deposit(deposit, {"from": depositor})
+        chain.sleep(1)
+        return strategy.harvest({"from": gov})
+
+    yield deposit_and_harvest
+
+
+@pytest.fixture
+def setup_osm(custom_osm, lib):
+    # Prices a TestStrategy with custom_osm, both reads valid at the spot
+    # price. Returns the spot price
+    def setup_osm(test_strategy):
+        test_strategy.setCustomOSM(custom_osm)
+        spot = lib.getSpotPrice(test_strategy.ilk())
+        custom_osm.setCurrentPrice(spot, False)
+        custom_osm.setFuturePrice(spot, False)
+        return spot
+
+    yield setup_osm
+
+
 # Obtaining the bytes32 ilk (verify its validity before using)
 # >>> ilk = ""
 # >>> for i in "YFI-A":
@@ -0,0 +1,88 @@
+import pytest
+
+from brownie import chain, web3
+
+from scripts.backfill import Backfill
+from scripts.rpc import JsonRpc, RPCError
+from scripts.rpc_pool import RpcPool
+from scripts.store import SnapshotStore
+
+
+class SmallBatchRpc(JsonRpc):
+    # Stand-in for a provider that rejects batches above a size limit
+    def __init__(self, endpoint, limit):
+        super().__init__(endpoint)
+        self.limit = limit
+
+    def batch(self, calls, raise_on_error=True):
+        if len(calls) > self.limit:
+            raise RPCError({"code": -32005, "message": "batch too large"})
+        return super().batch(calls, raise_on_error)
+
+
+@pytest.fixture
+def history(vault, strategy, token, amount, user, gov):
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    start = chain.height
+
+    for _ in range(3):
+        chain.sleep(3600)
+        strategy.harvest({"from": gov})
+        chain.mine(2)
+    return start, chain.height
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SnapshotStore(tmp_path / "monitor.db")
+    yield store
+    store.close()
+
+
+def test_backfill_matches_historical_reads(strategy, history, store):
+    start, end = history
+    rpc = JsonRpc(web3.provider.endpoint_uri)
+
+    stats = Backfill(rpc, store).run([strategy.address], start, end, step=2)
+    blocks = list(range(start, end + 1, 2))
+    assert stats["snapshots"] == len(blocks)
+    assert store.blocks(strategy.address) == set(blocks)
+
+    for block in blocks:
+        snapshot = store.latest(strategy.address, before_block=block + 1)
+        assert snapshot["block"] == block
+        assert snapshot["debt"] == strategy.balanceOfDebt(block_identifier=block) / 1e18
+        assert snapshot["timestamp"] == web3.eth.get_block(block).timestamp
+
+    # Everything is checkpointed, a second run sends nothing
+    requests = rpc.requests
+    assert Backfill(rpc, store).run([strategy.address], start, end, 2)["batches"] == 0
+    assert rpc.requests == requests
+
+
+def test_backfill_shrinks_batches_on_node_errors(strategy, history, store):
+    start, end = history
+    rpc = SmallBatchRpc(web3.provider.endpoint_uri, limit=30)
+
+    backfill = Backfill(rpc, store, batch_size=240)
+    stats = backfill.run([strategy.address], start, end, step=1)
+
+    assert stats["retries"] > 0
+    assert stats["snapshots"] == end - start + 1
+    assert backfill.batch_size <= 2 * 30
+
+
+def test_pooled_backfill_goes_through_the_limiter(strategy, history, store):
+    start, end = history
+    rpc = RpcPool([web3.provider.endpoint_uri])
+    limit = rpc.limiter.limit
+
+    # A few jobs per batch, sent concurrently
+    stats = Backfill(rpc, store, batch_size=40).run(
+        [strategy.address], start, end, step=1
+    )
+    assert stats["snapshots"] == end - start + 1
+    assert stats["batches"] > 1
+    # Each successful batch raised the AIMD limit
+    assert rpc.limiter.limit > limit
@@ -0,0 +1,166 @@
+import random
+
+from brownie import chain, web3
+
+from scripts.base_fee import (
+    BaseFeeForecaster,
+    BaseFeeGate,
+    header_next_base_fee,
+    next_base_fee,
+)
+from scripts.keeper import BrownieSender, Keeper
+from scripts.rpc import JsonRpc
+
+GWEI = 10 ** 9
+
+
+def make_chain(rng, length, base_fee=40 * GWEI, gas_limit=30_000_000):
+    headers = []
+    for number in range(length):
+        header = {
+            "number": hex(number),
+            "hash": f"0x{number + 1:064x}",
+            "parentHash": f"0x{number:064x}",
+            "baseFeePerGas": hex(base_fee),
+            "gasUsed": hex(rng.randint(0, gas_limit)),
+            "gasLimit": hex(gas_limit),
+        }
+        headers.append(header)
+        base_fee = header_next_base_fee(header)
+    return headers
+
+
+def test_next_base_fee_matches_go_ethereum():
+    # core/misc/eip1559 test vectors
+    assert next_base_fee(GWEI, 10_000_000, 20_000_000) == GWEI
+    assert next_base_fee(GWEI, 9_000_000, 20_000_000) == 987_500_000
+    assert next_base_fee(GWEI, 11_000_000, 20_000_000) == 1_012_500_000
+    # At least one wei up, and at most 1/8 either way
+    assert next_base_fee(7, 10_000_001, 20_000_000) == 8
+    assert next_base_fee(GWEI, 0, 20_000_000) == GWEI * 7 // 8
+    assert next_base_fee(GWEI, 20_000_000, 20_000_000) == GWEI * 9 // 8
+
+
+def test_earliest_block_is_a_lower_bound():
+    rng = random.Random(0)
+    headers = make_chain(rng, 2000)
+    for start in range(20, 1900, 37):
+        forecaster = BaseFeeForecaster()
+        for h in headers[start - 20 : start + 1]:
+            forecaster.add(h)
+        max_base_fee = forecaster.base_fee() * rng.randint(20, 120) // 100
+
+        earliest = forecaster.earliest_block(max_base_fee)
+        opens = [
+            int(h["number"], 16)
+            for h in headers[start:]
+            if int(h["baseFeePerGas"], 16) <= max_base_fee
+        ]
+        if opens:
+            assert earliest <= opens[0]
+
+
+def test_forecast_follows_utilization():
+    rng = random.Random(1)
+    forecaster = BaseFeeForecaster()
+    for h in make_chain(rng, 30):
+        forecaster.add(h)
+    fees = forecaster.forecast(10)
+    assert fees[0] == forecaster.next_base_fee()
+    used, limit = forecaster.utilization()
+    # Busier than the target pushes the forecast up, quieter pulls it down
+    assert (fees[-1] >= fees[0]) == (2 * used >= limit)
+
+
+def test_gate_defers_strategies_until_they_can_open():
+    rng = random.Random(2)
+    headers = make_chain(rng, 200)
+    gate = BaseFeeGate()
+    gate.add(headers[0])
+    base_fee = gate.forecaster.base_fee()
+    cheap, dear = "0x" + "11" * 20, "0x" + "22" * 20
+    gate.max_base_fees = {cheap: base_fee, dear: base_fee // 2}
+
+    assert gate.split([cheap, dear]) == ([cheap], [dear])
+    earliest = gate.waiting[dear]
+    assert earliest >= 6
+
+    opened_at = None
+    for h in headers[1:]:
+        gate.add(h)
+        opened = gate.opened()
+        if opened:
+            opened_at = int(h["number"], 16)
+            assert opened == [dear]
+            break
+        # Never reported before the gate can open
+        assert gate.waiting[dear] > int(h["number"], 16)
+    if opened_at is not None:
+        assert opened_at >= earliest
+        assert gate.is_open(dear)
+
+
+def test_forecast_matches_recorded_headers(token, user, gov):
+    # Record a header sequence from the node with busy and empty blocks
+    for i in range(12):
+        if i % 3 == 0:
+            chain.mine(1)
+        else:
+            token.approve(gov, i, {"from": user})
+    rpc = JsonRpc(web3.provider.endpoint_uri)
+    head = rpc.block_number()
+    headers = rpc.batch(
+        [("eth_getBlockByNumber", [hex(n), False]) for n in range(head - 11, head + 1)]
+    )
+
+    forecaster = BaseFeeForecaster()
+    for parent, child in zip(headers, headers[1:]):
+        forecaster.add(parent)
+        assert forecaster.next_base_fee() == int(child["baseFeePerGas"], 16)
+        assert forecaster.forecast(1) == [int(child["baseFeePerGas"], 16)]
+
+
+def test_keeper_skips_harvest_trigger_while_gate_is_closed(
+    vault, strategy, token, amount, user, gov, keeper, tmp_path
+):
+    strategy.setKeeper(keeper, {"from": gov})
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    base_fee = web3.eth.get_block("latest")["baseFeePerGas"]
+    strategy.setMaxAcceptableBaseFee(base_fee // 2, {"from": gov})
+    chain.sleep(strategy.maxReportDelay() + 1)
+    chain.mine(1)
+    assert not strategy.harvestTrigger(1)
+
+    gate = BaseFeeGate()
+    k = Keeper(
+        JsonRpc(web3.provider.endpoint_uri),
+        [strategy.address],
+        BrownieSender(keeper),
+        state_path=tmp_path / "keeper.json",
+        confirmations=1,
+        actions=["harvest"],
+        gate=gate,
+    )
+    k.poll()
+    assert k.stats["gated"] == 1
+    assert k.stats["refreshes"] == 0
+    earliest = gate.waiting[strategy.address]
+    assert earliest > chain.height
+
+    # Evaluating it again while the gate is closed is the same deferral
+    k.evaluate([strategy.address], chain.height)
+    assert k.stats["gated"] == 1
+
+    # Empty blocks lower the base fee by 1/8 each, the gate opens exactly then
+    while chain.height < earliest - 1:
+        chain.mine(1)
+        k.poll()
+        assert k.stats["refreshes"] == 0
+    chain.mine(1)
+    k.poll()
+    assert strategy.isCurrentBaseFeeAcceptable()
+    assert k.pending[strategy.address]["action"] == "harvest"
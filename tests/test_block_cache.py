@@ -0,0 +1,37 @@
+from brownie import chain
+
+from scripts.cache import BlockCache
+
+
+def test_read_through_cache_counts_hits_and_misses(strategy, block_cache):
+    block = chain.height
+
+    debt = block_cache.call(strategy.balanceOfDebt, block=block)
+    assert block_cache.call(strategy.balanceOfDebt, block=block) == debt
+    assert block_cache.call(strategy.tendTrigger, 1, block=block) is False
+    assert block_cache.call(strategy.tendTrigger, 1, block=block) is False
+
+    assert block_cache.stats()["hits"] == 2
+    assert block_cache.stats()["misses"] == 2
+    assert len(block_cache) == 2
+
+
+def test_old_blocks_are_evicted():
+    cache = BlockCache(max_blocks=2, max_entries=3)
+
+    cache.put(1, "0xAbc", "0x01", 1)
+    cache.put(2, "0xAbc", "0x01", 2)
+    cache.put(3, "0xAbc", "0x01", 3)
+    assert cache.get(1, "0xabc", "0x01") == (False, None)
+    assert cache.get(3, "0xabc", "0x01") == (True, 3)
+
+    # Blocks older than everything kept are not cached once full
+    cache.put(1, "0xAbc", "0x01", 1)
+    assert cache.get(1, "0xabc", "0x01") == (False, None)
+
+    # The entry bound drops the oldest block first
+    cache.put(3, "0xAbc", "0x02", 3)
+    cache.put(3, "0xAbc", "0x03", 3)
+    assert cache.get(2, "0xabc", "0x01") == (False, None)
+    assert len(cache) == 3
+    assert cache.stats()["evictions"] == 2
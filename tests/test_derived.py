@@ -0,0 +1,138 @@
+import pytest
+
+from brownie import web3
+from eth_utils import to_checksum_address
+
+from scripts.benchmarks.fake_rpc import FakeNode
+from scripts.bundle import BundledContract
+from scripts.cache import shared_cache
+from scripts.derived import collect_derived_data, forget, read_fleet
+from scripts.rpc import JsonRpc, RPCError
+
+
+def assert_matches_views(strategy, vault, yvault):
+    block = web3.eth.block_number
+    data = collect_derived_data(JsonRpc(web3.provider.endpoint_uri), strategy, block)
+
+    def view(fn, *args):
+        return fn(*args, block_identifier=block)
+
+    assert data["collateral"] == view(strategy.balanceOfMakerVault)
+    assert data["debt"] == view(strategy.balanceOfDebt)
+    assert data["current_ratio"] == view(strategy.getCurrentMakerVaultRatio)
+    assert data["tend_trigger"] == view(strategy.tendTrigger, 1)
+    assert data["estimated_total_assets"] == view(strategy.estimatedTotalAssets)
+    assert data["shares"] == view(yvault.balanceOf, strategy)
+    assert data["debt_ratio"] == view(vault.strategies, strategy)["debtRatio"]
+    return data
+
+
+def test_derived_values_match_views(
+    vault, strategy, amount, yvault, deposit_and_harvest, RELATIVE_APPROX
+):
+    forget()
+    deposit_and_harvest(strategy)
+
+    data = assert_matches_views(strategy, vault, yvault)
+    assert pytest.approx(data["estimated_total_assets"], rel=RELATIVE_APPROX) == amount
+    assert data["tend_trigger"] is False
+
+
+def test_derived_tend_trigger_follows_osm_price(
+    vault, test_strategy, custom_osm, yvault, deposit_and_harvest, setup_osm
+):
+    forget()
+    deposit_and_harvest(test_strategy)
+    spot = setup_osm(test_strategy)
+
+    # OSM reads that revert are ignored, as in the strategy
+    custom_osm.setCurrentPrice(0, True)
+    custom_osm.setFuturePrice(0, True)
+    assert_matches_views(test_strategy, vault, yvault)
+
+    # A lower next price pushes the ratio under the band
+    custom_osm.setFuturePrice(spot * 7 // 10, False)
+    assert assert_matches_views(test_strategy, vault, yvault)["tend_trigger"]
+
+    # A lower current price with a higher next one
+    custom_osm.setCurrentPrice(spot * 8 // 10, False)
+    custom_osm.setFuturePrice(spot * 3 // 2, False)
+    assert_matches_views(test_strategy, vault, yvault)
+
+
+def test_derived_tend_trigger_follows_base_fee(
+    vault, strategy, gov, yvault, deposit_and_harvest
+):
+    forget()
+    strategy.setCollateralizationRatio(3 * 1e18, {"from": gov})
+    deposit_and_harvest(strategy)
+
+    # Far above the new target ratio, so only the base fee is in the way
+    strategy.setCollateralizationRatio(2 * 1e18, {"from": gov})
+    strategy.setMaxAcceptableBaseFee(0, {"from": gov})
+    assert not assert_matches_views(strategy, vault, yvault)["tend_trigger"]
+
+    strategy.setMaxAcceptableBaseFee(2 ** 256 - 1, {"from": gov})
+    assert assert_matches_views(strategy, vault, yvault)["tend_trigger"]
+
+
+def test_derived_reads_are_aggregated():
+    forget()
+    shared_cache().clear()
+    node = FakeNode().start()
+    try:
+        rpc = JsonRpc(node.url)
+        strategies = [f"0x{i + 1:040x}" for i in range(3)]
+        for s in strategies:
+            collect_derived_data(rpc, s, node.block)
+
+        node.block += 1
+        node.reset_counters()
+        for s in strategies:
+            collect_derived_data(rpc, s, node.block)
+        # One request per strategy: a multicall and the two OSM reads, the
+        # shared reads of the ilk come from the first strategy's multicall
+        assert node.requests == len(strategies)
+        assert node.calls == 3 * len(strategies)
+    finally:
+        node.shutdown()
+        forget()
+        shared_cache().clear()
+
+
+def test_aggregate_matches_call_many(strategy, token, deposit_and_harvest):
+    forget()
+    deposit_and_harvest(strategy)
+    rpc = JsonRpc(web3.provider.endpoint_uri)
+    block = web3.eth.block_number
+    s = BundledContract("Strategy", strategy.address)
+    calls = [
+        (s, "balanceOfDebt"),
+        (s, "estimatedTotalAssets"),
+        (BundledContract("Strategy", token.address), "balanceOfDebt"),
+    ]
+    aggregated = rpc.aggregate(calls, block, raise_on_error=False)
+    assert aggregated[:2] == rpc.call_many(calls[:2], block)
+    # Failures come back as errors, as with call_many
+    assert isinstance(aggregated[2], RPCError)
+
+
+def test_read_errors_are_kept_per_strategy():
+    forget()
+    shared_cache().clear()
+    node = FakeNode().start()
+    try:
+        rpc = JsonRpc(node.url)
+        strategies = [f"0x{i + 1:040x}" for i in range(3)]
+        read_fleet(rpc, strategies, node.block)
+
+        # Every eth_call fails on the next block
+        node.block += 1
+        node.error_rate = 1.0
+        fleet = read_fleet(rpc, strategies, node.block)
+        assert set(fleet) == {to_checksum_address(s) for s in strategies}
+        assert all(isinstance(read, RPCError) for read in fleet.values())
+    finally:
+        node.shutdown()
+        forget()
+        shared_cache().clear()
@@ -0,0 +1,56 @@
+import requests
+import threading
+
+from brownie import chain, web3
+
+from scripts.exporter import ScrapeCache, make_server
+from scripts.rpc import JsonRpc
+
+
+def strategy_metrics(exposition):
+    return [l for l in exposition.split("\n") if "_exporter_" not in l]
+
+
+def test_scrapes_within_a_block_are_served_from_cache(
+    vault, strategy, token, amount, user, gov
+):
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    rpc = JsonRpc(web3.provider.endpoint_uri)
+    cache = ScrapeCache(rpc, [strategy.address], block_poll_interval=3600)
+
+    first = cache.scrape()
+    requests_after_first_scrape = rpc.requests
+    for _ in range(10):
+        assert strategy_metrics(cache.scrape()) == strategy_metrics(first)
+    assert rpc.requests == requests_after_first_scrape
+    assert cache.stats["cache_hits"] == 10
+
+    debt = strategy.balanceOfDebt() / 1e18
+    assert f'maker_dai_delegate_debt{{strategy="{strategy.address}"' in first
+    assert f"{debt}" in first
+    assert f"maker_dai_delegate_block {chain.height}" in first
+
+    # A new block invalidates the cache once the head is polled again
+    chain.mine()
+    cache.block_poll_interval = 0
+    assert f"maker_dai_delegate_block {chain.height}" in cache.scrape()
+    assert cache.stats["refreshes"] == 2
+
+
+def test_metrics_endpoint(strategy):
+    cache = ScrapeCache(JsonRpc(web3.provider.endpoint_uri), [strategy.address])
+    server = make_server(cache, host="127.0.0.1", port=0)
+    host, port = server.server_address
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        r = requests.get(f"http://{host}:{port}/metrics")
+        assert r.status_code == 200
+        assert "maker_dai_delegate_collateralization_ratio" in r.text
+        assert requests.get(f"http://{host}:{port}/other").status_code == 404
+    finally:
+        server.shutdown()
@@ -0,0 +1,107 @@
+import random
+
+import pytest
+
+from scripts.bundle import BundledContract, Function, encode, load_bundle
+from scripts.fast_abi import HOT_VIEWS, FastFunction, VatIlk, precompile
+
+
+def hot_abis():
+    return [
+        (name, entry)
+        for name, abi in sorted(load_bundle().items())
+        for entry in abi
+        if entry["type"] == "function"
+        and f"{entry['name']}({','.join(i['type'] for i in entry['inputs'])})"
+        in HOT_VIEWS
+    ]
+
+
+def random_value(rng, abi_type):
+    if abi_type == "uint256":
+        return rng.choice(
+            [0, 1, 2 ** 256 - 1, rng.getrandbits(256), rng.getrandbits(64)]
+        )
+    if abi_type == "bool":
+        return rng.choice([True, False])
+    if abi_type == "address":
+        return "0x" + rng.getrandbits(160).to_bytes(20, "big").hex()
+    if abi_type == "bytes32":
+        return rng.getrandbits(256).to_bytes(32, "big")
+    raise ValueError(abi_type)
+
+
+def test_every_hot_view_is_precompiled():
+    abis = hot_abis()
+    assert {(name, e["name"]) for name, e in abis} >= {
+        ("Strategy", "balanceOfDebt"),
+        ("Strategy", "balanceOfMakerVault"),
+        ("Strategy", "tendTrigger"),
+        ("IVault", "pricePerShare"),
+        ("IVault", "balanceOf"),
+        ("IVault", "strategies"),
+        ("ERC20", "balanceOf"),
+        ("Vat", "ilks"),
+        ("Vat", "urns"),
+        ("Spotter", "ilks"),
+        ("Jug", "ilks"),
+        ("DssCdpManager", "urns"),
+    }
+    for name, entry in abis:
+        assert isinstance(precompile(entry), FastFunction), (name, entry["name"])
+        assert isinstance(
+            BundledContract(name, "0x" + "11" * 20).functions[entry["name"]],
+            FastFunction,
+        )
+
+
+def test_fast_path_matches_eth_abi():
+    rng = random.Random(0)
+    for name, entry in hot_abis():
+        fast = precompile(entry)
+        generic = Function(entry)
+        assert fast.selector == generic.selector
+
+        for _ in range(50):
+            args = [random_value(rng, t) for t in generic.input_types]
+            assert fast.encode_input(*args) == generic.encode_input(*args)
+
+            values = [random_value(rng, t) for t in generic.output_types]
+            data = encode(generic.output_types, values)
+            expected = generic.decode_output(data)
+            assert fast.decode_output(data) == expected
+            assert fast.decode_output("0x" + data.hex()) == expected
+
+
+def test_records_behave_like_return_values():
+    ilk = VatIlk(1, 2, 3, 4, 5)
+    assert ilk.rate == ilk["rate"] == ilk[1] == 2
+    assert list(ilk) == [1, 2, 3, 4, 5]
+    art, rate, *_ = ilk
+    assert (art, rate) == (1, 2)
+    expected = {"Art": 1, "rate": 2, "spot": 3, "line": 4, "dust": 5}
+    assert ilk.dict() == dict(ilk) == expected
+    assert ilk == ilk.dict()
+    assert not hasattr(ilk, "__dict__")
+
+
+def test_invalid_data_is_rejected():
+    vat_urns = BundledContract("Vat", "0x" + "11" * 20).functions["urns"]
+    with pytest.raises(ValueError):
+        vat_urns.decode_output("0x" + "00" * 32)
+    with pytest.raises(ValueError):
+        vat_urns.encode_input(b"\0" * 33, "0x" + "22" * 20)
+
+    balance_of = BundledContract("ERC20", "0x" + "11" * 20).functions["balanceOf"]
+    with pytest.raises(ValueError):
+        balance_of.decode_output("0x")
+    with pytest.raises(ValueError):
+        balance_of.encode_input("0x1234")
+    with pytest.raises(TypeError):
+        balance_of.encode_input()
+
+
+def test_other_functions_keep_the_generic_path():
+    strategy = BundledContract("Strategy", "0x" + "11" * 20)
+    assert isinstance(strategy.functions["name"], Function)
+    assert isinstance(strategy.functions["getCurrentMakerVaultRatio"], Function)
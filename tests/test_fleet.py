@@ -0,0 +1,47 @@
+import threading
+import time
+
+from scripts.fleet import monitor_fleet
+
+
+def test_fleet_runs_concurrently_within_limit():
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def collect(strategy):
+        nonlocal in_flight, max_in_flight
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+        time.sleep(0.2 if strategy == "slow" else 0.05)
+        with lock:
+            in_flight -= 1
+        return strategy.upper()
+
+    strategies = ["slow"] + [f"s{i}" for i in range(7)]
+    results, elapsed = monitor_fleet(strategies, collect, concurrency=8)
+
+    assert [r["result"] for r in results] == [s.upper() for s in strategies]
+    assert max_in_flight == 8
+    # Wall time follows the slowest strategy instead of the sum of all of them
+    assert elapsed < 0.2 + 7 * 0.05
+    assert results[0]["elapsed"] >= 0.2
+
+    max_in_flight = 0
+    _, elapsed = monitor_fleet(strategies, collect, concurrency=2)
+    assert max_in_flight == 2
+    assert elapsed >= (0.2 + 7 * 0.05) / 2
+
+
+def test_fleet_reports_errors_per_strategy():
+    def collect(strategy):
+        if strategy == "broken":
+            raise ValueError("reverted")
+        return strategy
+
+    results, _ = monitor_fleet(["ok", "broken"], collect)
+
+    assert results[0]["result"] == "ok" and results[0]["error"] is None
+    assert results[1]["result"] is None
+    assert isinstance(results[1]["error"], ValueError)
@@ -0,0 +1,105 @@
+import pytest
+
+from brownie import reverts, web3
+
+from scripts.health_check import prepare_return, predict_health_checks
+from scripts.maker import WAD
+from scripts.rpc import JsonRpc
+
+MAX_BPS = 10_000
+
+
+def test_prepare_return_follows_the_contract():
+    price = 2000 * WAD
+    # Profit in loose want is taken as is
+    assert prepare_return(110, 100, 0, 10, 100, 0, 0, 2 * WAD, price) == (10, 0, 0)
+    # yVault value above the debt is sold for want
+    profit, loss, payment = prepare_return(
+        10 ** 18 + 10 ** 15,
+        10 ** 18,
+        0,
+        0,
+        10 ** 18,
+        900 * WAD,
+        902 * WAD,
+        2 * WAD,
+        price,
+    )
+    assert (profit, loss, payment) == (10 ** 15, 0, 0)
+    # Debt outstanding is freed from collateral, what cannot be freed is lost
+    assert prepare_return(50, 100, 60, 0, 50, 0, 0, 2 * WAD, price) == (0, 10, 50)
+    # Collateral backing unpaid debt stays locked
+    profit, loss, payment = prepare_return(
+        10 ** 18, 10 ** 18, 10 ** 18, 0, 10 ** 18, 1000 * WAD, 0, 2 * WAD, price
+    )
+    assert (profit, payment) == (0, 0) and loss == 10 ** 18
+
+
+@pytest.mark.parametrize("over", [True, False])
+def test_profit_prediction_matches_harvest(
+    vault,
+    strategy,
+    token,
+    token_whale,
+    gov,
+    healthCheck,
+    deposit_and_harvest,
+    RELATIVE_APPROX,
+    over,
+):
+    deposit_and_harvest(strategy, token_whale, 1000 * 10 ** token.decimals())
+    profit_limit = healthCheck.profitLimitRatio()
+    total_debt = vault.strategies(strategy).dict()["totalDebt"]
+    ratio = profit_limit + 1 if over else profit_limit - 1
+    token.transfer(strategy, total_debt * ratio // MAX_BPS, {"from": token_whale})
+
+    rpc = JsonRpc(web3.provider.endpoint_uri)
+    prediction = predict_health_checks(rpc, [strategy.address])[strategy.address]
+    assert prediction["do_health_check"]
+    assert prediction["profit_limit"] == total_debt * profit_limit // MAX_BPS
+    assert prediction["passes"] == (not over)
+
+    if over:
+        with reverts("!healthcheck"):
+            strategy.harvest({"from": gov})
+    else:
+        tx = strategy.harvest({"from": gov})
+        reported = tx.events["StrategyReported"]
+        assert (
+            pytest.approx(prediction["profit"], rel=RELATIVE_APPROX) == reported["gain"]
+        )
+        assert prediction["loss"] == reported["loss"] == 0
+
+
+@pytest.mark.parametrize("over", [True, False])
+def test_loss_prediction_matches_harvest(
+    vault,
+    test_strategy,
+    token,
+    token_whale,
+    gov,
+    healthCheck,
+    deposit_and_harvest,
+    over,
+):
+    deposit_and_harvest(test_strategy, token_whale, 10 ** token.decimals())
+    loss_limit = healthCheck.lossLimitRatio()
+    ratio = loss_limit + 1 if over else loss_limit - 1
+    test_strategy.freeCollateral(
+        test_strategy.balanceOfMakerVault() * (0.5 + ratio / MAX_BPS)
+    )
+    token.transfer(token_whale, token.balanceOf(test_strategy), {"from": test_strategy})
+    vault.updateStrategyDebtRatio(test_strategy, 5_000, {"from": gov})
+
+    rpc = JsonRpc(web3.provider.endpoint_uri)
+    prediction = predict_health_checks(rpc, [test_strategy.address])[
+        test_strategy.address
+    ]
+    assert prediction["loss"] > 0
+    assert prediction["passes"] == (not over)
+
+    if over:
+        with reverts("!healthcheck"):
+            test_strategy.harvest({"from": gov})
+    else:
+        test_strategy.harvest({"from": gov})
@@ -0,0 +1,112 @@
+from brownie import chain, web3
+
+from scripts.keeper import BrownieSender, Keeper
+from scripts.rpc import JsonRpc
+
+
+def new_keeper(strategy, keeper, tmp_path, **kwargs):
+    return Keeper(
+        JsonRpc(web3.provider.endpoint_uri),
+        [strategy.address],
+        BrownieSender(keeper),
+        state_path=tmp_path / "keeper.json",
+        **kwargs,
+    )
+
+
+def test_keeper_tends_when_osm_price_drops(
+    test_strategy,
+    custom_osm,
+    strategist,
+    keeper,
+    deposit_and_harvest,
+    setup_osm,
+    tmp_path,
+):
+    test_strategy.setKeeper(keeper, {"from": strategist})
+    deposit_and_harvest(test_strategy)
+    spot = setup_osm(test_strategy)
+
+    k = new_keeper(test_strategy, keeper, tmp_path, confirmations=1, actions=["tend"])
+    k.poll()
+    assert k.stats["sent"] == 0
+
+    # Quiet blocks do not evaluate anything
+    chain.mine(3)
+    refreshes = k.stats["refreshes"]
+    k.poll()
+    assert k.stats["refreshes"] == refreshes
+
+    # The OSM log wakes the keeper up
+    custom_osm.setFuturePrice(spot * 7 // 10, False)
+    assert test_strategy.tendTrigger(1)
+    k.poll()
+    assert k.stats["sent"] == 1
+    assert k.pending[test_strategy.address]["action"] == "tend"
+    assert not test_strategy.tendTrigger(1)
+
+    # Settled once confirmed, and not sent again
+    chain.mine(1)
+    k.poll()
+    assert k.stats["confirmed"] == 1
+    assert k.pending == {}
+    assert k.stats["sent"] == 1
+
+
+def test_keeper_survives_restart_and_reorg(
+    test_strategy,
+    custom_osm,
+    strategist,
+    keeper,
+    deposit_and_harvest,
+    setup_osm,
+    tmp_path,
+):
+    test_strategy.setKeeper(keeper, {"from": strategist})
+    deposit_and_harvest(test_strategy)
+    spot = setup_osm(test_strategy)
+
+    k = new_keeper(test_strategy, keeper, tmp_path, confirmations=3, actions=["tend"])
+    k.poll()
+
+    chain.snapshot()
+    custom_osm.setFuturePrice(spot * 7 // 10, False)
+    k.poll()
+    assert k.stats["sent"] == 1
+
+    # A restart picks the unconfirmed tend up instead of sending another one
+    restarted = new_keeper(
+        test_strategy, keeper, tmp_path, confirmations=3, actions=["tend"]
+    )
+    assert restarted.pending == k.pending
+    restarted.poll()
+    assert restarted.stats["sent"] == 0
+
+    # The reorg drops the price move and the tend with it
+    chain.revert()
+    chain.mine(3)
+    restarted.poll()
+    assert restarted.stats["reorgs"] == 1
+    assert restarted.stats["dropped"] == 1
+    assert restarted.pending == {}
+    assert restarted.stats["sent"] == 0
+    assert not test_strategy.tendTrigger(1)
+
+
+def test_keeper_harvests_when_report_is_due(
+    vault, strategy, gov, keeper, deposit_and_harvest, tmp_path
+):
+    strategy.setKeeper(keeper, {"from": gov})
+    deposit_and_harvest(strategy)
+
+    chain.sleep(strategy.maxReportDelay() + 1)
+    chain.mine(1)
+
+    k = new_keeper(strategy, keeper, tmp_path, confirmations=1)
+    k.poll()
+    assert k.pending[strategy.address]["action"] == "harvest"
+
+    chain.mine(1)
+    k.poll()
+    assert k.stats["confirmed"] == 1
+    assert vault.strategies(strategy).dict()["lastReport"] == chain[-2].timestamp
@@ -0,0 +1,25 @@
+from brownie import chain
+
+from scripts.monitor import (
+    collect_strategy_data,
+    collect_strategy_data_serial,
+    print_monitoring_info_for_strategy,
+)
+from scripts.report import format_report
+
+
+def test_multicall_matches_serial_reads(vault, strategy, token, amount, user, gov):
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    batched = collect_strategy_data(strategy)
+    serial = collect_strategy_data_serial(strategy)
+
+    assert batched["block"] == chain.height
+    for key, value in serial.items():
+        if key != "block":
+            assert batched[key] == value
+
+    assert print_monitoring_info_for_strategy(strategy) == format_report(serial)
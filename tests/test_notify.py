@@ -0,0 +1,94 @@
+import json
+import threading
+import time
+
+import pytest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scripts.notify import MAX_MESSAGE_LENGTH, TelegramNotifier
+
+
+class FakeTelegram(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server.requests.append(body)
+        time.sleep(server.delay)
+
+        if server.responses:
+            status, response = server.responses.pop(0)
+        else:
+            status, response = 200, {"ok": True}
+            server.messages.append(body["text"])
+
+        data = json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def telegram():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTelegram)
+    server.requests = []
+    server.messages = []
+    server.responses = []
+    server.delay = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+
+
+def notifier_for(server, **kwargs):
+    host, port = server.server_address
+    return TelegramNotifier(
+        "key", api=f"http://{host}:{port}", min_interval=0, backoff=0, **kwargs
+    )
+
+
+def test_slow_delivery_does_not_block_sender(telegram):
+    telegram.delay = 0.5
+    notifier = notifier_for(telegram, linger=0)
+
+    start = time.perf_counter()
+    notifier.send("report")
+    assert time.perf_counter() - start < 0.1
+
+    notifier.close()
+    assert telegram.messages == ["report"]
+
+
+def test_rate_limited_message_is_retried(telegram):
+    telegram.responses = [(429, {"ok": False, "parameters": {"retry_after": 0}})]
+    notifier = notifier_for(telegram)
+
+    notifier.send("report")
+    notifier.close()
+
+    assert len(telegram.requests) == 2
+    assert telegram.messages == ["report"]
+    assert notifier.sent == 1 and notifier.failed == 0
+
+
+def test_reports_are_coalesced_and_split_to_size_limit(telegram):
+    notifier = notifier_for(telegram)
+
+    for i in range(3):
+        notifier.send(f"```\nreport {i}\n```")
+    notifier.flush()
+    assert telegram.messages == ["\n".join(f"```\nreport {i}\n```" for i in range(3))]
+
+    long_report = "```\n" + "\n".join("x" * 100 for _ in range(100)) + "\n```"
+    notifier.send(long_report)
+    notifier.close()
+
+    chunks = telegram.messages[1:]
+    assert len(chunks) == 3
+    assert all(len(c) <= MAX_MESSAGE_LENGTH for c in chunks)
+    assert all(c.startswith("```\n") and c.endswith("\n```") for c in chunks)
@@ -0,0 +1,107 @@
+import pytest
+
+from brownie import Contract, accounts, chain, web3
+
+from scripts.bundle import encode
+from scripts.maker import SPOTTER, VAT
+from scripts.preflight import _revert_chain, decode_revert, fork_preflight, preflight
+from scripts.rpc import JsonRpc
+
+
+def test_revert_data_is_decoded():
+    error = "0x08c379a0" + encode(["string"], ["!healthcheck"]).hex()
+    assert decode_revert(error) == "!healthcheck"
+    assert decode_revert("0x4e487b71" + f"{0x11:064x}") == "Panic(0x11)"
+    assert decode_revert("0x") is None
+
+
+def test_revert_chain_follows_bubbling():
+    strategy, lib, osm = "0x" + "11" * 20, "0x" + "22" * 20, "0x" + "33" * 20
+
+    def log(depth, pc, op, to=None):
+        return {
+            "depth": depth,
+            "pc": pc,
+            "op": op,
+            "stack": ["0x0", "0x" + to[2:], "0x5"] if to else [],
+        }
+
+    logs = [
+        log(1, 0, "CALL", strategy),
+        # A caught OSM revert is not the reason
+        log(2, 10, "STATICCALL", osm),
+        log(3, 0, "REVERT"),
+        log(2, 11, "ISZERO"),
+        log(2, 12, "DELEGATECALL", lib),
+        log(3, 40, "REVERT"),
+        log(2, 13, "RETURNDATACOPY"),
+        log(2, 14, "REVERT"),
+        log(1, 5, "POP"),
+    ]
+    assert _revert_chain(logs) == [(strategy, 14), (lib, 40)]
+
+    logs[4:8] = [log(2, 30, "REVERT")]
+    assert _revert_chain(logs) == [(strategy, 30)]
+
+
+def test_preflight_predicts_harvest(strategy, deposit_and_harvest, RELATIVE_APPROX):
+    deposit_and_harvest(strategy)
+    # Some profit in yvDAI
+    chain.sleep(7 * 24 * 3600)
+    chain.mine(1)
+
+    rpc = JsonRpc(web3.provider.endpoint_uri)
+    outcomes = preflight(rpc, [strategy.address], "harvest")
+    outcome = outcomes[strategy.address]
+    assert outcome["ok"] and outcome["reason"] is None
+
+    tx = strategy.harvest({"from": strategy.keeper()})
+    reported = tx.events["StrategyReported"]
+    assert pytest.approx(outcome["profit"], rel=RELATIVE_APPROX) == reported["gain"]
+    assert outcome["loss"] == reported["loss"]
+    assert outcome["collateral"] == strategy.balanceOfMakerVault()
+    assert (
+        pytest.approx(outcome["debt"], rel=RELATIVE_APPROX) == strategy.balanceOfDebt()
+    )
+    assert (
+        pytest.approx(outcome["ratio"], rel=RELATIVE_APPROX)
+        == strategy.getCurrentMakerVaultRatio()
+    )
+    assert 0 < outcome["gas_used"] < tx.gas_used
+
+
+def test_preflight_reports_reverts_without_sending(
+    test_strategy, strategist, deposit_and_harvest
+):
+    deposit_and_harvest(test_strategy)
+
+    # A zero spot price makes _getWantTokenPrice revert
+    ilk = test_strategy.ilk()
+    web3.provider.make_request("evm_setAccountBalance", [SPOTTER, hex(10 ** 18)])
+    Contract(VAT).file["bytes32,bytes32,uint256"](
+        ilk,
+        "spot".encode().ljust(32, b"\0"),
+        0,
+        {"from": accounts.at(SPOTTER, force=True)},
+    )
+
+    rpc = JsonRpc(web3.provider.endpoint_uri)
+    nonce = web3.eth.get_transaction_count(strategist.address)
+    for action in ("harvest", "tend"):
+        outcome = preflight(
+            rpc,
+            [test_strategy.address],
+            action,
+            keepers={test_strategy.address: strategist.address},
+        )[test_strategy.address]
+        assert not outcome["ok"]
+        # Ganache cannot trace calls, a geth node gives the dev comment here
+        assert outcome["reason"] in ("dev: invalid spot price", "reverted")
+        assert outcome["gas_used"] > 0
+    assert web3.eth.get_transaction_count(strategist.address) == nonce
+
+    outcome = fork_preflight(rpc, [test_strategy.address], "harvest", strategist)[
+        test_strategy.address
+    ]
+    assert not outcome["ok"]
+    assert outcome["reason"] == "dev: invalid spot price"
@@ -0,0 +1,129 @@
+import random
+
+from brownie import chain, web3
+
+from scripts.derived import current_ratio
+from scripts.maker import RAY, WAD
+from scripts.price_index import PriceIndex, critical_prices
+from scripts.rpc import JsonRpc
+
+ILK = b"ETH-C".ljust(32, b"\0")
+MAT = 17 * RAY // 10
+
+
+def random_position(rng):
+    ink = rng.randint(1, 10 ** 6) * 10 ** rng.randint(12, 18)
+    debt = rng.choice([0, rng.randint(1, 10 ** 9) * 10 ** rng.randint(10, 18)])
+    ratio = rng.randint(19 * WAD // 10, 3 * WAD)
+    tolerance = rng.randint(WAD // 100, WAD // 10)
+    return ink, debt, ratio, tolerance
+
+
+def sides(ink, debt, ratio, tolerance, price):
+    # What the contracts compute at `price`, by brute force
+    current = current_ratio(ink, debt, price, price)
+    return {
+        "repay": current < ratio - tolerance,
+        "mint": current > ratio + tolerance,
+        "liquidation": current < MAT * WAD // RAY,
+    }
+
+
+def test_critical_prices_are_exact():
+    rng = random.Random(0)
+    for _ in range(500):
+        ink, debt, ratio, tolerance = random_position(rng)
+        for kind, level in critical_prices(ink, debt, ratio, tolerance, MAT).items():
+            if level < 2:
+                # A zero price reverts, nothing to flip
+                continue
+            below = sides(ink, debt, ratio, tolerance, level - 1)[kind]
+            at = sides(ink, debt, ratio, tolerance, level)[kind]
+            # Each side flips exactly at its level
+            assert below != at, (kind, ink, debt, ratio, tolerance)
+            assert at == (kind == "mint")
+
+
+def test_index_matches_brute_force():
+    rng = random.Random(1)
+    index = PriceIndex()
+    positions = {}
+    for i in range(200):
+        s = f"0x{i:040x}"
+        positions[s] = random_position(rng)
+        index.update(s, ILK, *positions[s], MAT)
+
+    # Incremental updates: positions move and some are closed
+    for s in rng.sample(sorted(positions), 50):
+        positions[s] = random_position(rng)
+        index.update(s, ILK, *positions[s], MAT)
+    for s in rng.sample(sorted(positions), 10):
+        positions[s] = (0,) + positions[s][1:]
+        index.update(s, ILK, *positions[s], MAT)
+    assert len(index) == 190
+
+    levels = sorted(p for _, ls in index.entries.values() for p in ls.values())
+    ticks = [max(1, rng.choice(levels) + rng.randint(-1, 1)) for _ in range(100)]
+    for old, new in zip(ticks, ticks[1:]):
+        expected = {kind: set() for kind in ("repay", "mint", "liquidation")}
+        flipped = {kind: set() for kind in expected}
+        for s, position in positions.items():
+            if position[0] == 0:
+                continue
+            before = sides(*position, old)
+            after = sides(*position, new)
+            for kind in expected:
+                if after[kind]:
+                    expected[kind].add(s)
+                if before[kind] != after[kind]:
+                    flipped[kind].add(s)
+
+        triggered = index.triggered(ILK, new)
+        crossed = index.crossed(ILK, old, new)
+        for kind in expected:
+            assert set(triggered[kind]) == expected[kind]
+            assert set(crossed[kind]) == flipped[kind]
+
+
+def test_other_ilks_are_separate():
+    index = PriceIndex()
+    index.update("0x" + "11" * 20, ILK, 10 * WAD, 5000 * WAD, 2 * WAD, WAD // 10, MAT)
+    other = b"YFI-A".ljust(32, b"\0")
+    assert index.triggered(other, 1) == {"repay": [], "mint": [], "liquidation": []}
+    assert index.triggered(ILK, 1)["repay"] == ["0x" + "11" * 20]
+
+
+def test_tick_reports_crossings_since_the_last_price():
+    index = PriceIndex()
+    s = "0x" + "11" * 20
+    index.update(s, ILK, 10 * WAD, 5000 * WAD, 2 * WAD, WAD // 10, MAT)
+    repay = index.entries[s][1]["repay"]
+
+    assert index.tick(ILK, repay)["repay"] == []
+    assert index.tick(ILK, repay + 10)["repay"] == []
+    assert index.tick(ILK, repay - 1)["repay"] == [s]
+    assert index.tick(ILK, repay - 2)["repay"] == []
+
+
+def test_repay_level_matches_tend_trigger(
+    vault, test_strategy, custom_osm, token, amount, user, gov, lib
+):
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    test_strategy.harvest({"from": gov})
+
+    index = PriceIndex()
+    index.refresh(JsonRpc(web3.provider.endpoint_uri), [test_strategy.address])
+    ilk, levels = index.entries[test_strategy.address]
+    assert levels["repay"] < lib.getSpotPrice(ilk) < levels["mint"]
+
+    test_strategy.setCustomOSM(custom_osm)
+    par = lib.getDaiPar()
+    for price, fires in [(levels["repay"], False), (levels["repay"] - 1, True)]:
+        osm_price = -(-price * par // RAY)
+        custom_osm.setCurrentPrice(osm_price, False)
+        custom_osm.setFuturePrice(osm_price, False)
+        assert test_strategy._getPrice() == price
+        assert test_strategy.tendTrigger(1) == fires
+        assert (test_strategy.address in index.triggered(ilk, price)["repay"]) == fires
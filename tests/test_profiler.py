@@ -0,0 +1,62 @@
+from brownie import web3
+
+from scripts.benchmarks.fake_rpc import FakeNode
+from scripts.bundle import BundledContract, encode
+from scripts.maker import VAT
+from scripts.monitor_lite import collect_strategy_data
+from scripts.profiler import MULTICALL_SELECTORS, Profiler
+from scripts.rpc import JsonRpc
+
+
+def counts(profiler):
+    return {
+        (r["method"], r["contract"], r["function"]): r["count"]
+        for r in profiler.summary()["calls"]
+    }
+
+
+def test_json_rpc_calls_are_attributed():
+    node = FakeNode().start()
+    try:
+        rpc = JsonRpc(node.url)
+        rpc.profiler = profiler = Profiler()
+        collect_strategy_data(rpc, "0x" + "22" * 20, node.block)
+    finally:
+        node.shutdown()
+
+    calls = counts(profiler)
+    assert profiler.summary()["requests"] == rpc.requests == 2
+    assert calls[("eth_call", "Strategy", "balanceOfDebt")] == 1
+    assert calls[("eth_call", "MakerDaiDelegateLib", "getSpotPrice")] == 1
+    assert calls[("eth_call", "IVault", "pricePerShare")] == 1
+    assert "eth_call Strategy.tendTrigger" in profiler.format_summary()
+
+
+def test_multicall_inner_calls_are_attributed():
+    profiler = Profiler()
+    vat = BundledContract("Vat", VAT)
+    inner = [(VAT, bytes.fromhex(vat.encode("ilks", b"ETH-C")["data"][2:]))] * 3
+    selector = "0x399542e9"
+    data = selector + encode(MULTICALL_SELECTORS[selector][1], [False, inner]).hex()
+    multicall = "0x5BA1e12693Dc8F9c48aAD8770482f4739bEeD696"
+
+    profiler.record(
+        {"method": "eth_call", "params": [{"to": multicall, "data": data}, "latest"]},
+        0.01,
+    )
+
+    calls = counts(profiler)
+    assert calls[("eth_call", "Multicall2", "tryBlockAndAggregate")] == 1
+    assert calls[("eth_call (multicall)", "Vat", "ilks")] == 3
+
+
+def test_web3_middleware(strategy):
+    profiler = Profiler()
+    profiler.install(web3)
+    try:
+        strategy.balanceOfDebt()
+        strategy.balanceOfDebt()
+    finally:
+        web3.middleware_onion.remove("rpc_profiler")
+
+    assert counts(profiler)[("eth_call", "Strategy", "balanceOfDebt")] == 2
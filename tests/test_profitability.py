@@ -0,0 +1,178 @@
+import pytest
+
+from brownie import Contract, chain, web3
+
+from scripts import keeper as keeper_module
+from scripts.keeper import BrownieSender, Keeper
+from scripts.maker import JUG, RAY, VAT, WAD
+from scripts.profitability import (
+    COLUMNS,
+    accrued_rate,
+    evaluate,
+    load_columns,
+    rank,
+    report_due,
+    rpow,
+)
+from scripts.rpc import JsonRpc
+
+# 5% a year
+DUTY = 1000000001547125957863212448
+
+
+def columns(**overrides):
+    # Two strategies of one ilk
+    base = {
+        "strategy": ["0xA", "0xB"],
+        "ilk": ["ETH-C", "ETH-C"],
+        "timestamp": [1_000_000, 1_000_000],
+        "want_price": [2000 * WAD, 2000 * WAD],
+        "art": [1000 * WAD, 1000 * WAD],
+        "rate": [RAY, RAY],
+        "debt": [1000 * WAD, 1000 * WAD],
+        "investment_value": [1010 * WAD, 1020 * WAD],
+        "duty": [DUTY, DUTY],
+        "rho": [1_000_000, 1_000_000],
+        "base": [0, 0],
+        "eth_to_want": [WAD, WAD],
+        "due": [False, False],
+    }
+    base.update(overrides)
+    assert set(base) == set(COLUMNS)
+    return base
+
+
+def test_rpow_rounds_like_dss():
+    assert rpow(RAY, 10 ** 6) == RAY
+    assert rpow(2 * RAY, 0) == RAY
+    assert rpow(0, 0) == RAY and rpow(0, 3) == 0
+    assert rpow(3 * RAY // 2, 3) == 3375 * RAY // 1000
+    year = rpow(DUTY, 365 * 24 * 3600)
+    assert pytest.approx(year / RAY, rel=1e-9) == 1.05
+    assert accrued_rate(RAY, DUTY, 0, 100, 100) == RAY
+
+
+def test_net_value_of_harvests():
+    evaluated = evaluate(columns(), 10 ** 9, gas=10 ** 6, delay=0)
+    # Dripped at the timestamp, no fee accrued yet
+    assert evaluated["fee_drag"] == [0, 0]
+    # yVault profit in want at the oracle price
+    assert evaluated["profit"] == [10 * WAD // 2000, 20 * WAD // 2000]
+    # 10**6 gas at 1 gwei, one want per ETH
+    assert evaluated["gas_cost"] == [10 ** 15, 10 ** 15]
+    assert evaluated["net"] == [4 * 10 ** 15, 9 * 10 ** 15]
+    assert rank(evaluated) == ["0xB", "0xA"]
+
+    # A year of fees on 1000 DAI is 50 DAI, more than the profit
+    year = 365 * 24 * 3600
+    evaluated = evaluate(columns(), 10 ** 9, gas=10 ** 6, delay=year)
+    assert pytest.approx(evaluated["fee_drag"][0], rel=1e-6) == 50 * WAD // 2000
+    assert all(net < 0 for net in evaluated["net"])
+
+    # No profit below the debt, gas per strategy and priced in want
+    evaluated = evaluate(
+        columns(investment_value=[900 * WAD, 1020 * WAD], eth_to_want=[WAD, 2 * WAD]),
+        10 ** 9,
+        gas=[10 ** 6, 2 * 10 ** 6],
+        delay=0,
+    )
+    assert evaluated["profit"][0] == 0
+    assert evaluated["gas_cost"] == [10 ** 15, 4 * 10 ** 15]
+
+
+def test_report_due():
+    assert not report_due(100, 50, 60, 0, 0, False)
+    # maxReportDelay passed
+    assert report_due(110, 50, 60, 0, 0, False)
+    # debtRatio lowered, a loss or an emergency exit
+    assert report_due(100, 50, 60, 1, 0, False)
+    assert report_due(100, 50, 60, 0, 1, False)
+    assert report_due(100, 50, 60, 0, 0, True)
+
+
+def test_columns_match_the_chain(strategy, user, yvault, deposit_and_harvest):
+    deposit_and_harvest(strategy)
+    chain.sleep(7 * 24 * 3600)
+    chain.mine(1)
+
+    rpc = JsonRpc(web3.provider.endpoint_uri)
+    block = web3.eth.block_number
+    data, errors = load_columns(rpc, [strategy.address], block)
+    assert errors == {}
+    assert data["strategy"] == [strategy.address]
+    assert data["debt"] == [strategy.balanceOfDebt(block_identifier=block)]
+    assert data["eth_to_want"] == [strategy.ethToWant(WAD, block_identifier=block)]
+    assert data["investment_value"] == [
+        yvault.balanceOf(strategy, block_identifier=block)
+        * yvault.pricePerShare(block_identifier=block)
+        // 10 ** yvault.decimals()
+    ]
+
+    # The projected rate is the one jug.drip sets
+    tx = Contract(JUG).drip(strategy.ilk(), {"from": user})
+    delay = chain[tx.block_number].timestamp - data["timestamp"][0]
+    evaluated = evaluate(data, 0, delay=delay)
+    rate = Contract(VAT).ilks(strategy.ilk())["rate"]
+    assert (
+        accrued_rate(
+            data["rate"][0],
+            data["duty"][0],
+            data["base"][0],
+            data["rho"][0],
+            data["timestamp"][0] + delay,
+        )
+        == rate
+    )
+    assert evaluated["fee_drag"][0] > 0
+    assert evaluated["gas_cost"] == [0]
+
+
+def test_keeper_sends_due_harvests_at_a_loss(
+    strategy, gov, keeper, deposit_and_harvest, tmp_path
+):
+    strategy.setKeeper(keeper, {"from": gov})
+    deposit_and_harvest(strategy)
+    chain.sleep(strategy.maxReportDelay() + 1)
+    chain.mine(1)
+    assert strategy.harvestTrigger(1)
+
+    rpc = JsonRpc(web3.provider.endpoint_uri)
+    assert int(rpc.request("eth_gasPrice"), 16) > 0
+    data, _ = load_columns(rpc, [strategy.address])
+    assert data["due"] == [True]
+    k = Keeper(
+        rpc,
+        [strategy.address],
+        BrownieSender(keeper),
+        state_path=tmp_path / "keeper.json",
+        actions=["harvest"],
+        rank_harvests=True,
+        # This much gas costs more than the profit, but the report is due
+        gas={"harvest": 10 ** 9},
+    )
+    k.poll()
+    assert k.stats["unprofitable"] == 0
+    assert k.stats["sent"] == 1
+    assert strategy.address in k.pending
+
+
+def test_keeper_defers_unprofitable_harvests_once(monkeypatch, tmp_path):
+    a, b = [f"0x{i:040x}" for i in (1, 2)]
+    # Both lose money, only the first has its report due
+    data = columns(
+        strategy=[a, b], investment_value=[900 * WAD, 900 * WAD], due=[True, False]
+    )
+    monkeypatch.setattr(keeper_module, "load_columns", lambda *args: (data, {}))
+    k = Keeper(
+        JsonRpc(web3.provider.endpoint_uri),
+        [a, b],
+        BrownieSender(None),
+        state_path=tmp_path / "keeper.json",
+        rank_harvests=True,
+    )
+    triggered = [(a, "harvest"), (b, "harvest")]
+    assert k._rank(triggered, 1, 10 ** 9) == [(a, "harvest")]
+    assert k.stats["unprofitable"] == 1
+    # Re-evaluated while still deferred
+    assert k._rank(triggered, 2, 10 ** 9) == [(a, "harvest")]
+    assert k.stats["unprofitable"] == 1
@@ -0,0 +1,117 @@
+import json
+import threading
+import time
+
+import pytest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scripts.rpc_pool import AdaptiveLimiter, RpcPool
+
+
+class FakeNode(BaseHTTPRequestHandler):
+    # Answers eth_blockNumber with the port of the server, after `delay`.
+    # Fails with `status` if set, and throttles requests over `max_in_flight`
+    def do_POST(self):
+        server = self.server
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            throttled = server.in_flight > server.max_in_flight
+        try:
+            time.sleep(server.delay)
+            if server.status != 200:
+                self.respond(server.status, {})
+                return
+
+            calls = payload if isinstance(payload, list) else [payload]
+            responses = [
+                {"jsonrpc": "2.0", "id": c["id"], "result": hex(server.server_port)}
+                if not throttled
+                else {
+                    "jsonrpc": "2.0",
+                    "id": c["id"],
+                    "error": {"code": -32005, "message": "limit exceeded"},
+                }
+                for c in calls
+            ]
+            self.respond(200, responses if isinstance(payload, list) else responses[0])
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def respond(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def nodes():
+    servers = []
+
+    def start(delay=0, status=200, max_in_flight=1000):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FakeNode)
+        server.delay = delay
+        server.status = status
+        server.max_in_flight = max_in_flight
+        server.requests = 0
+        server.in_flight = 0
+        server.lock = threading.Lock()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def url(server):
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def test_slow_endpoint_is_hedged(nodes):
+    slow, fast = nodes(delay=1), nodes()
+    rpc = RpcPool([url(slow), url(fast)])
+
+    start = time.perf_counter()
+    assert rpc.block_number() == fast.server_port
+    assert time.perf_counter() - start < 0.75
+    assert rpc.hedges == 1 and rpc.hedge_wins == 1
+
+    # The slow endpoint now ranks last and is no longer tried first
+    assert rpc.ranked()[0].url == url(fast)
+
+
+def test_failing_endpoint_is_skipped(nodes):
+    broken, healthy = nodes(status=502), nodes()
+    rpc = RpcPool([url(broken), url(healthy)], hedge=False)
+
+    for _ in range(10):
+        assert rpc.block_number() == healthy.server_port
+
+    # Benched after a few failures instead of being retried every time
+    assert broken.requests <= 3
+    metrics = rpc.metrics()
+    assert [e["failures"] for e in metrics["endpoints"]] == [broken.requests, 0]
+    assert metrics["latency"][0.99] is not None
+
+
+def test_bulk_concurrency_adapts_to_throttling(nodes):
+    node = nodes(delay=0.02, max_in_flight=4)
+    rpc = RpcPool([url(node)], limiter=AdaptiveLimiter(initial=16, maximum=32))
+
+    batches = [[("eth_blockNumber", [])] * 5 for _ in range(100)]
+    results = rpc.map_batches(batches)
+
+    assert results == [[hex(node.server_port)] * 5] * 100
+    assert rpc.limiter.limit < 16
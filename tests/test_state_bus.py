@@ -0,0 +1,97 @@
+import multiprocessing
+
+import pytest
+
+from scripts.state_bus import StateBus
+
+STRATEGIES = [f"0x{i:040x}" for i in range(1, 6)]
+
+
+def make_data(i):
+    # Every field is derived from i so torn records are easy to spot
+    return {
+        "address": STRATEGIES[i % len(STRATEGIES)],
+        "block": 1000 + i,
+        "cdp_id": i,
+        "debt_ratio": i % 10_000,
+        "tend_trigger": i % 2 == 1,
+        "collateral": i * 10 ** 18,
+        "debt": i * 2 ** 200,
+        "shares": i,
+        "price_per_share": 2 ** 256 - 1 - i,
+        "spot_price": 3 * i,
+        "collateralization_ratio": 4 * i,
+        "current_ratio": 5 * i,
+        "liquidation_ratio": 6 * i,
+    }
+
+
+def consistent(record):
+    expected = make_data(record["cdp_id"])
+    return all(record[k] == v for k, v in expected.items() if k != "address") and (
+        record["address"].lower() == expected["address"]
+    )
+
+
+def publish(path, count):
+    bus = StateBus.create(path, capacity=64)
+    for i in range(count):
+        bus.publish(make_data(i), timestamp=1_600_000_000 + i)
+    bus.close()
+
+
+def test_records_round_trip(tmp_path):
+    path = tmp_path / "fleet.bus"
+    writer = StateBus.create(path, capacity=8)
+    reader = StateBus(path)
+
+    for i in range(20):
+        writer.publish(make_data(i), timestamp=i)
+
+    records, cursor = reader.since(0)
+    # Only the last `capacity` records survive the wrap around
+    assert cursor == 20
+    assert [r["seq"] for r in records] == list(range(12, 20))
+    assert all(consistent(r) for r in records)
+    assert reader.read(3) is None
+
+    latest = reader.latest()
+    assert len(latest) == len(STRATEGIES)
+    assert {r["seq"] for r in latest.values()} == set(range(15, 20))
+
+    with pytest.raises(RuntimeError):
+        StateBus.create(path, capacity=8)
+
+    # A restarted publisher continues the sequence
+    writer.close()
+    writer = StateBus.create(path, capacity=8)
+    assert writer.publish(make_data(20), timestamp=20) == 20
+    assert reader.since(cursor)[0][0]["seq"] == 20
+    writer.close()
+    reader.close()
+
+
+def test_concurrent_reader_never_sees_torn_records(tmp_path):
+    path = tmp_path / "fleet.bus"
+    StateBus.create(path, capacity=64).close()
+    reader = StateBus(path)
+
+    count = 20_000
+    writer = multiprocessing.get_context("spawn").Process(
+        target=publish, args=(path, count)
+    )
+    writer.start()
+
+    cursor, seen = 0, 0
+    while writer.is_alive() or cursor < count:
+        records, cursor = reader.since(cursor)
+        assert all(consistent(r) for r in records)
+        seen += len(records)
+        if not writer.is_alive() and reader.head == cursor:
+            break
+
+    writer.join()
+    assert writer.exitcode == 0
+    assert reader.head == count
+    assert seen > 0
+    reader.close()
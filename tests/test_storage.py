@@ -0,0 +1,73 @@
+from brownie import Strategy, web3
+
+from scripts import storage
+from scripts.rpc import JsonRpc
+from scripts.storage import CONFIG_FIELDS, read_config, storage_layout
+
+
+def test_storage_reads_match_getters(
+    vault, strategy, cloner, token, amount, user, gov, strategist, yvault
+):
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    strategy.harvest({"from": gov})
+
+    # Move every setting away from its default
+    strategy.setCollateralizationRatio(2.6 * 1e18, {"from": gov})
+    strategy.setRebalanceTolerance(0.07 * 1e18, {"from": gov})
+    strategy.setMaxLoss(17, {"from": gov})
+    strategy.setLeaveDebtBehind(True, {"from": gov})
+    strategy.setMaxAcceptableBaseFee(77 * 1e9, {"from": gov})
+
+    clone = Strategy.at(
+        cloner.cloneMakerDaiDelegate(
+            vault,
+            strategist,
+            strategist,
+            strategist,
+            yvault,
+            "Clone",
+            strategy.ilk(),
+            strategy.gemJoinAdapter(),
+            strategy.wantToUSDOSMProxy(),
+            strategy.chainlinkWantToETHPriceFeed(),
+            {"from": strategist},
+        ).return_value
+    )
+
+    rpc = JsonRpc(web3.provider.endpoint_uri)
+    config = read_config(rpc, [strategy.address, clone.address], web3.eth.block_number)
+    assert rpc.requests == 1
+
+    for s in [strategy, clone]:
+        for field in CONFIG_FIELDS:
+            assert config[s.address][field] == getattr(s, field)(), field
+
+
+def test_layout_packs_small_fields():
+    slots = {}
+    for entry in storage_layout()["storage"]:
+        slots.setdefault(entry["slot"], []).append(entry["label"])
+
+    # gemJoinAdapter shares its slot with at least one flag
+    slot = next(s for s, labels in slots.items() if "gemJoinAdapter" in labels)
+    assert len(slots[slot]) > 1
+
+
+def test_layout_cache_follows_the_sources(monkeypatch, tmp_path):
+    compiled = []
+
+    def compile_layout(contract):
+        compiled.append(contract)
+        return {"storage": [], "types": {}, "build": len(compiled)}
+
+    monkeypatch.setattr(storage, "LAYOUT_CACHE", tmp_path)
+    monkeypatch.setattr(storage, "compile_layout", compile_layout)
+    monkeypatch.setattr(storage, "sources_hash", lambda: "a")
+    assert storage_layout()["build"] == 1
+    assert storage_layout()["build"] == 1
+
+    # A source or compiler change compiles the layout again
+    monkeypatch.setattr(storage, "sources_hash", lambda: "b")
+    assert storage_layout()["build"] == 2
+    assert compiled == ["Strategy", "Strategy"]
@@ -0,0 +1,61 @@
+import pytest
+
+from scripts.alerts import check_alerts
+from scripts.store import SnapshotStore, snapshot_from_data
+
+
+def make_data(block, current_ratio=2.25, debt=1000, value=1000, tend=False):
+    return {
+        "address": "0xd33535e9F2E09485aC9cE8b27F865251161065E0",
+        "block": block,
+        "collateral": int(10 * 1e18),
+        "debt": int(debt * 1e18),
+        "shares": int(value * 1e18),
+        "price_per_share": int(1e18),
+        "spot_price": int(3000 * 1e18),
+        "collateralization_ratio": int(2.25 * 1e18),
+        "current_ratio": int(current_ratio * 1e18),
+        "liquidation_ratio": int(1.75 * 1e27),
+        "debt_ratio": 10_000,
+        "tend_trigger": tend,
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SnapshotStore(tmp_path / "monitor.db")
+    yield store
+    store.close()
+
+
+def test_drift_rates(store):
+    strategy = make_data(0)["address"]
+    for i in range(5):
+        data = make_data(100 + i, current_ratio=2.25 - 0.01 * i, value=1000 + 2 * i)
+        store.append(snapshot_from_data(data), 1_600_000_000 + 1800 * i)
+
+    assert store.last_block(strategy) == 104
+    assert store.latest(strategy, before_block=104)["block"] == 103
+    assert pytest.approx(store.rate(strategy, "current_ratio")) == -0.02
+    assert pytest.approx(store.rate(strategy, "profit")) == 4
+    assert store.rate(strategy, "profit", since=1_600_000_000 + 1800 * 4) is None
+
+
+def test_alerts_only_fire_on_crossings():
+    first = snapshot_from_data(make_data(1))
+    assert check_alerts(None, first) == ["First snapshot for this strategy"]
+
+    # Moving within the band is not worth a message
+    quiet = snapshot_from_data(make_data(2, current_ratio=2.2, value=1001))
+    assert check_alerts(first, quiet) == []
+
+    band_exit = snapshot_from_data(make_data(3, current_ratio=2.0, tend=True))
+    assert check_alerts(quiet, band_exit) == ["C-ratio left the tolerance band"]
+
+    near_liquidation = snapshot_from_data(
+        make_data(4, current_ratio=1.9, value=990, tend=True)
+    )
+    assert check_alerts(band_exit, near_liquidation) == [
+        "C-ratio moved below 2.00",
+        "Investment is now at a loss",
+    ]
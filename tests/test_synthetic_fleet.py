@@ -0,0 +1,33 @@
+from brownie import Strategy, chain
+
+from scripts.synthetic_fleet import (
+    COLLATERALIZATION_RATIO,
+    deploy_fleet,
+    load_manifest,
+    main,
+    save_manifest,
+)
+
+
+def test_fleet_is_deployed_and_reused(tmp_path):
+    path = tmp_path / "fleet.json"
+    manifest = deploy_fleet(12, seed=1)
+    save_manifest(manifest, path)
+
+    assert len(manifest["strategies"]) == 12
+    assert len(manifest["vaults"]) == 2
+    for s in manifest["strategies"]:
+        strategy = Strategy.at(s["address"])
+        assert strategy.balanceOfDebt() > 0
+        ratio = strategy.collateralizationRatio() / 1e18
+        assert COLLATERALIZATION_RATIO[0] <= ratio <= COLLATERALIZATION_RATIO[1]
+        assert ratio == s["collateralization_ratio"]
+
+    ratios = {s["collateralization_ratio"] for s in manifest["strategies"]}
+    assert len(ratios) == 12
+
+    # A second run finds the fleet instead of deploying it again
+    height = chain.height
+    assert load_manifest(path) == manifest
+    assert main(12, path) == manifest
+    assert chain.height == height
@@ -0,0 +1,160 @@
+import pytest
+
+from brownie import accounts, chain, web3
+from eth_account import Account
+
+from scripts.keeper import Keeper
+from scripts.rpc import JsonRpc, RPCError
+from scripts.tx_pipeline import PipelineSender, TxPipeline
+
+
+@pytest.fixture
+def signer(gov):
+    # A local key, the pipeline signs itself
+    account = accounts.add()
+    gov.transfer(account, "10 ether")
+    return account
+
+
+@pytest.fixture
+def automine():
+    # Transactions wait in the pool until chain.mine() once this is called
+    def stop():
+        web3.provider.make_request("miner_stop", [])
+
+    yield stop
+    web3.provider.make_request("miner_start", [])
+
+
+def new_pipeline(signer, **kwargs):
+    return TxPipeline(
+        JsonRpc(web3.provider.endpoint_uri),
+        Account.from_key(signer.private_key),
+        **kwargs
+    )
+
+
+def test_batch_lands_in_one_block(token, user, signer, automine):
+    pipeline = new_pipeline(signer)
+    spenders = [accounts.add() for _ in range(20)]
+    txs = [
+        {"to": token.address, "data": token.approve.encode_input(s, i + 1)}
+        for i, s in enumerate(spenders)
+    ]
+    # Reverts in eth_estimateGas and takes no nonce
+    txs.insert(5, {"to": token.address, "data": token.transfer.encode_input(user, 1)})
+
+    automine()
+    nonce = signer.nonce
+    results = pipeline.submit(txs)
+    assert isinstance(results.pop(5), RPCError)
+    assert all(isinstance(h, str) for h in results)
+    assert len(pipeline.inflight) == 20
+    assert web3.eth.get_transaction_count(signer.address) == nonce
+
+    chain.mine(1)
+    receipts = pipeline.poll()
+    assert len(receipts) == 20
+    assert {r["blockNumber"] for r in receipts} == {hex(chain.height)}
+    assert pipeline.inflight == {}
+    assert pipeline.stats["included"] == 20
+    assert web3.eth.get_transaction_count(signer.address) == nonce + 20
+    for i, s in enumerate(spenders):
+        assert token.allowance(signer, s) == i + 1
+
+
+def test_stuck_transaction_is_replaced(token, signer, automine):
+    # Every poll finds the transaction stuck
+    pipeline = new_pipeline(signer, stuck_blocks=0)
+    spender = accounts.add()
+
+    automine()
+    (first,) = pipeline.submit(
+        [{"to": token.address, "data": token.approve.encode_input(spender, 1)}]
+    )
+    fees = pipeline.inflight[signer.nonce]["tx"]
+    assert pipeline.poll() == []
+    assert pipeline.stats["replaced"] == 1
+
+    ((nonce, entry),) = pipeline.inflight.items()
+    assert entry["hashes"][0] == first
+    assert pipeline.latest(first) == entry["hashes"][1] != first
+    for k in ("maxFeePerGas", "maxPriorityFeePerGas"):
+        assert entry["tx"][k] >= fees[k] * 115 // 100
+
+    chain.mine(1)
+    (receipt,) = pipeline.poll()
+    # Only the replacement is mined
+    assert receipt["transactionHash"] == pipeline.latest(first)
+    assert web3.eth.get_transaction_receipt(receipt["transactionHash"]).status == 1
+    assert token.allowance(signer, spender) == 1
+    assert web3.eth.get_transaction_count(signer.address) == nonce + 1
+
+
+def test_replacements_stop_at_the_fee_cap(token, signer, automine):
+    # Dev chains may price gas at 0, which no bump moves
+    fees = {k: max(v, 10 ** 9) for k, v in new_pipeline(signer).fees().items()}
+    key = "maxFeePerGas" if "maxFeePerGas" in fees else "gasPrice"
+    # Room for one 15% bump, not for a second one
+    cap = fees[key] * 125 // 100
+    pipeline = new_pipeline(signer, stuck_blocks=0, max_fee_per_gas=cap)
+
+    automine()
+    (first,) = pipeline.submit(
+        [{"to": token.address, "data": token.approve.encode_input(accounts.add(), 1)}],
+        fees,
+    )
+    pipeline.poll()
+    assert pipeline.stats["replaced"] == 1
+    for _ in range(3):
+        pipeline.poll()
+    assert pipeline.stats["replaced"] == 1
+    assert pipeline.stats["capped"] == 1
+    ((_, entry),) = pipeline.inflight.items()
+    assert len(entry["hashes"]) == 2
+    assert all(
+        entry["tx"][k] <= cap for k in ("gasPrice", "maxFeePerGas") if k in entry["tx"]
+    )
+
+    chain.mine(1)
+    (receipt,) = pipeline.poll()
+    assert receipt["transactionHash"] == pipeline.latest(first)
+    assert pipeline.stats["included"] == 1
+
+
+def test_keeper_tends_through_the_pipeline(
+    test_strategy,
+    custom_osm,
+    strategist,
+    signer,
+    deposit_and_harvest,
+    setup_osm,
+    automine,
+    tmp_path,
+):
+    test_strategy.setKeeper(signer, {"from": strategist})
+    deposit_and_harvest(test_strategy)
+    spot = setup_osm(test_strategy)
+
+    rpc = JsonRpc(web3.provider.endpoint_uri)
+    k = Keeper(
+        rpc,
+        [test_strategy.address],
+        PipelineSender(new_pipeline(signer)),
+        state_path=tmp_path / "keeper.json",
+        confirmations=1,
+        actions=["tend"],
+    )
+    k.poll()
+    custom_osm.setFuturePrice(spot * 7 // 10, False)
+
+    automine()
+    k.poll()
+    assert k.pending[test_strategy.address]["action"] == "tend"
+    assert test_strategy.tendTrigger(1)
+
+    chain.mine(1)
+    k.poll()
+    assert k.stats["confirmed"] == 1
+    assert k.pending == {}
+    assert not test_strategy.tendTrigger(1)
@@ -0,0 +1,81 @@
+from brownie import Contract, Strategy, chain, web3
+
+from scripts.maker import JUG
+from scripts.rpc import JsonRpc
+from scripts.vat_reader import forget, read_positions
+
+
+def clone_strategy(cloner, strategy, vault, yvault, strategist):
+    return Strategy.at(
+        cloner.cloneMakerDaiDelegate(
+            vault,
+            strategist,
+            strategist,
+            strategist,
+            yvault,
+            "Clone",
+            strategy.ilk(),
+            strategy.gemJoinAdapter(),
+            strategy.wantToUSDOSMProxy(),
+            strategy.chainlinkWantToETHPriceFeed(),
+            {"from": strategist},
+        ).return_value
+    )
+
+
+def test_positions_match_strategy_views(
+    vault, strategy, cloner, token, amount, user, gov, strategist, yvault
+):
+    forget()
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+    # A clone without a position reads as zero collateral and debt
+    clone = clone_strategy(cloner, strategy, vault, yvault, strategist)
+
+    rpc = JsonRpc(web3.provider.endpoint_uri)
+    read_positions(rpc, [strategy, clone])
+
+    # Accrue stability fees so rate is not a round number
+    chain.sleep(30 * 24 * 3600)
+    Contract(JUG).drip(strategy.ilk(), {"from": user})
+    chain.mine(1)
+
+    block = web3.eth.block_number
+    requests = rpc.requests
+    positions = read_positions(rpc, [strategy, clone], block)
+    # Urns are cached, so everything comes in one batch
+    assert rpc.requests == requests + 1
+
+    for s in [strategy, clone]:
+        position = positions[s.address]
+        assert position["cdp_id"] == s.cdpId()
+        assert position["collateral"] == s.balanceOfMakerVault(block_identifier=block)
+        assert position["debt"] == s.balanceOfDebt(block_identifier=block)
+    assert positions[strategy.address]["debt"] > 0
+    assert positions[clone.address]["collateral"] == 0
+
+
+def test_positions_follow_shift_to_cdp(
+    vault, strategy, cloner, token, amount, user, gov, strategist, yvault, osmProxy
+):
+    forget()
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    new_strategy = clone_strategy(cloner, strategy, vault, yvault, strategist)
+    rpc = JsonRpc(web3.provider.endpoint_uri)
+    before = read_positions(rpc, [new_strategy])[new_strategy.address]
+    assert before["collateral"] == 0
+
+    vault.migrateStrategy(strategy, new_strategy, {"from": gov})
+    osmProxy.setAuthorized(new_strategy, {"from": gov})
+    new_strategy.shiftToCdp(strategy.cdpId(), {"from": gov})
+
+    after = read_positions(rpc, [new_strategy])[new_strategy.address]
+    assert after["cdp_id"] == strategy.cdpId() != before["cdp_id"]
+    assert after["collateral"] == new_strategy.balanceOfMakerVault() == amount
+    assert after["debt"] == new_strategy.balanceOfDebt()
@@ -0,0 +1,98 @@
+import pytest
+import requests
+
+from brownie import chain, web3
+
+from scripts import watch
+from scripts.rpc import JsonRpc, RPCError
+from scripts.store import SnapshotStore
+from scripts.watch import Watcher, in_bloom
+
+
+def test_block_bloom_contains_its_logs(vault, strategy, token, amount, user, gov):
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    tx = strategy.harvest({"from": gov})
+
+    bloom = web3.eth.get_block(tx.block_number)["logsBloom"]
+    for log in web3.eth.get_transaction_receipt(tx.txid)["logs"]:
+        assert in_bloom(bytes(bloom), bytes.fromhex(log["address"][2:]))
+        for topic in log["topics"]:
+            assert in_bloom(bytes(bloom), bytes(topic))
+
+
+def test_watch_only_refreshes_touched_strategies(
+    vault, strategy, token, amount, user, gov, tmp_path
+):
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    rpc = JsonRpc(web3.provider.endpoint_uri)
+    store = SnapshotStore(tmp_path / "monitor.db")
+    watcher = Watcher(rpc, [strategy.address], store=store)
+
+    # The first head refreshes everything
+    assert watcher.poll() == {strategy.address}
+    assert store.last_block(strategy.address) == chain.height
+
+    # Quiet blocks cost a couple of requests and no eth_call
+    chain.mine(5)
+    requests = rpc.requests
+    assert watcher.poll() == set()
+    assert rpc.requests - requests <= 2
+    assert watcher.stats["bloom_hits"] == 0
+
+    # Unrelated activity is filtered out by the bloom or by the logs
+    token.transfer(gov, 1, {"from": user})
+    assert watcher.poll() == set()
+
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+    assert watcher.poll() == {strategy.address}
+    assert store.last_block(strategy.address) == chain.height
+    store.close()
+
+
+def test_watch_resyncs_after_reorg(strategy, tmp_path):
+    store = SnapshotStore(tmp_path / "monitor.db")
+    watcher = Watcher(
+        JsonRpc(web3.provider.endpoint_uri), [strategy.address], store=store
+    )
+    watcher.poll()
+
+    chain.snapshot()
+    chain.mine(3)
+    watcher.poll()
+    chain.revert()
+    chain.mine(4)
+
+    assert watcher.poll() == {strategy.address}
+    assert watcher.stats["reorgs"] == 1
+    store.close()
+
+
+def test_run_survives_poll_errors(monkeypatch):
+    watcher = Watcher(None, [])
+    outcomes = [
+        RPCError({"code": -32000, "message": "header not found"}),
+        requests.Timeout(),
+        None,
+        KeyboardInterrupt(),
+    ]
+
+    def tick():
+        outcome = outcomes.pop(0)
+        if outcome is not None:
+            raise outcome
+
+    sleeps = []
+    monkeypatch.setattr(watcher, "_tick", tick)
+    monkeypatch.setattr(watch.time, "sleep", sleeps.append)
+    with pytest.raises(KeyboardInterrupt):
+        watcher.run(poll_interval=2)
+    # Backs off while polls fail, back to the interval after a success
+    assert sleeps == [4, 8, 2]
+    assert watcher.stats["errors"] == 2